@@ -0,0 +1,193 @@
+import asyncio
+import bisect
+import logging
+import multiprocessing
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# CPU-bound journal analytics. Inputs are packed as one newline-joined text buffer
+# plus start offsets so they pickle cheaply when sent to a worker process, and
+# results are small aggregates. The per-journal aggregates behind the stats,
+# achievements and pattern routes (streaks, tag counts, achievement progress,
+# month buckets) are pure functions over the fetched documents, so they can be
+# benchmarked on their own (tests/benchmarks).
+
+_WORD = re.compile(r'\b[a-z]{4,}\b')
+
+# Common dream symbols to detect
+DREAM_SYMBOLS = {
+    "water": ["water", "ocean", "sea", "river", "lake", "swimming", "drowning", "rain", "flood"],
+    "flying": ["flying", "fly", "floating", "soaring", "wings", "air"],
+    "falling": ["falling", "fall", "dropping", "cliff", "height"],
+    "chase": ["chase", "chasing", "running", "escape", "pursued", "following"],
+    "death": ["death", "dead", "dying", "funeral", "grave"],
+    "teeth": ["teeth", "tooth", "falling out", "broken teeth"],
+    "animals": ["animal", "dog", "cat", "snake", "bird", "spider", "wolf", "lion"],
+    "house": ["house", "home", "room", "door", "window", "building"],
+    "vehicle": ["car", "driving", "bus", "train", "plane", "crash"],
+    "people": ["stranger", "family", "friend", "crowd", "person", "people"]
+}
+
+STOP_WORDS = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by", "from", "i", "me", "my", "was", "were", "is", "it", "that", "this", "had", "have", "be", "been"}
+
+# Achievement definitions
+ACHIEVEMENTS = [
+    {"id": "first_dream", "name": "Dream Catcher", "description": "Record your first dream", "icon": "🌙", "category": "basics", "target": 1},
+    {"id": "dreams_10", "name": "Dreamer", "description": "Record 10 dreams", "icon": "✨", "category": "dreams", "target": 10},
+    {"id": "dreams_50", "name": "Dream Keeper", "description": "Record 50 dreams", "icon": "📚", "category": "dreams", "target": 50},
+    {"id": "dreams_100", "name": "Dream Master", "description": "Record 100 dreams", "icon": "🏆", "category": "dreams", "target": 100},
+    {"id": "streak_7", "name": "Week Warrior", "description": "Maintain a 7-day streak", "icon": "🔥", "category": "streaks", "target": 7},
+    {"id": "streak_30", "name": "Monthly Mystic", "description": "Maintain a 30-day streak", "icon": "⚡", "category": "streaks", "target": 30},
+    {"id": "streak_100", "name": "Century Dreamer", "description": "Maintain a 100-day streak", "icon": "💫", "category": "streaks", "target": 100},
+    {"id": "lucid_1", "name": "Awakened", "description": "Record your first lucid dream", "icon": "👁️", "category": "lucid", "target": 1},
+    {"id": "lucid_10", "name": "Lucid Explorer", "description": "Record 10 lucid dreams", "icon": "🔮", "category": "lucid", "target": 10},
+    {"id": "lucid_25", "name": "Dream Walker", "description": "Record 25 lucid dreams", "icon": "🌟", "category": "lucid", "target": 25},
+    {"id": "insight_1", "name": "Seeker", "description": "Get your first AI dream insight", "icon": "🔍", "category": "insights", "target": 1},
+    {"id": "insight_10", "name": "Enlightened", "description": "Get 10 AI dream insights", "icon": "💡", "category": "insights", "target": 10},
+    {"id": "share_1", "name": "Open Book", "description": "Share your first dream publicly", "icon": "📖", "category": "social", "target": 1},
+    {"id": "share_5", "name": "Storyteller", "description": "Share 5 dreams publicly", "icon": "📢", "category": "social", "target": 5},
+    {"id": "themes_5", "name": "Pattern Finder", "description": "Use 5 different themes", "icon": "🎭", "category": "exploration", "target": 5},
+    {"id": "tags_10", "name": "Tag Master", "description": "Create 10 unique tags", "icon": "🏷️", "category": "exploration", "target": 10},
+]
+
+# Achievement id prefix -> journal total its progress is measured in
+ACHIEVEMENT_TOTALS = {
+    "first": "dreams", "dreams": "dreams", "streak": "longest_streak", "lucid": "lucid",
+    "insight": "insights", "share": "shared", "themes": "themes", "tags": "tags",
+}
+
+
+def pack_texts(texts):
+    """Join texts into one buffer; text i is buffer[offsets[i]:offsets[i + 1] - 1]"""
+    offsets = [0]
+    for text in texts:
+        offsets.append(offsets[-1] + len(text) + 1)
+    return "\n".join(texts) + "\n", offsets
+
+
+def symbol_counts(buffer, offsets, symbols):
+    """Number of texts mentioning any keyword of each symbol"""
+    buffer = buffer.lower()
+    counts = {}
+    for symbol, keywords in symbols.items():
+        pattern = re.compile("|".join(re.escape(kw) for kw in keywords))
+        count = 0
+        match = pattern.search(buffer)
+        while match:
+            # Keywords never contain the newline separator, so a match belongs to one
+            # text; count it and resume the search at the start of the next text
+            count += 1
+            match = pattern.search(buffer, offsets[bisect.bisect_right(offsets, match.start())])
+        counts[symbol] = count
+    return counts
+
+
+def word_counts(buffer, stop_words, limit):
+    counts = Counter(w for w in _WORD.findall(buffer.lower()) if w not in stop_words)
+    return counts.most_common(limit)
+
+
+def unpack_texts(buffer, offsets):
+    return [buffer[start:end - 1] for start, end in zip(offsets, offsets[1:])]
+
+
+def text_patterns(descriptions, description_offsets, titles, title_offsets, symbols, stop_words, top_words):
+    """Symbol mentions across each dream's description and title, and the most common description words"""
+    texts, text_offsets = pack_texts([
+        f"{description} {title}"
+        for description, title in zip(unpack_texts(descriptions, description_offsets), unpack_texts(titles, title_offsets))
+    ])
+    return {
+        "symbol_counts": symbol_counts(texts, text_offsets, symbols),
+        "common_words": word_counts(descriptions, stop_words, top_words),
+    }
+
+
+def journal_streaks(dates, today, last_freeze_date=None):
+    """Current and longest runs of consecutive dream days
+
+    ``dates`` are ISO dates (or datetimes) of the user's dreams. The current
+    streak is alive if the latest dream is from ``today`` or yesterday, or a
+    freeze was used yesterday; a used freeze also lets it bridge one missed day.
+    """
+    # Day ordinals instead of parsed datetimes: one parse per distinct day, integer gaps
+    days = sorted({date.fromisoformat(d[:10]).toordinal() for d in dates}, reverse=True)
+    if not days:
+        return {"current": 0, "longest": 0}
+    today = today.toordinal()
+    yesterday = date.fromordinal(today - 1).isoformat()
+
+    current = 0
+    if days[0] in (today, today - 1) or last_freeze_date == yesterday:
+        check = days[0]
+        for day in days:
+            gap = check - day
+            if gap <= 1 or (gap == 2 and last_freeze_date):
+                current += 1
+                check = day
+            else:
+                break
+
+    longest = streak = 1
+    for prev, day in zip(days, days[1:]):
+        if prev - day == 1:
+            streak += 1
+        else:
+            longest = max(longest, streak)
+            streak = 1
+    return {"current": current, "longest": max(longest, streak)}
+
+
+def top_counts(dreams, field, limit):
+    """The ``limit`` most used values of a list field, ties in order of first use"""
+    return Counter(value for dream in dreams for value in dream[field]).most_common(limit)
+
+
+def distinct_count(dreams, field):
+    return len({value for dream in dreams for value in dream[field]})
+
+
+def achievement_progress(achievement_id, totals):
+    """Progress towards an achievement, from the user's journal totals (see ACHIEVEMENT_TOTALS)"""
+    return totals.get(ACHIEVEMENT_TOTALS.get(achievement_id.partition("_")[0]), 0)
+
+
+def month_buckets(dreams):
+    """Dream count and theme counts per YYYY-MM month, oldest month first"""
+    buckets = {}
+    for dream in dreams:
+        month = dream["date"][:7]
+        bucket = buckets.get(month)
+        if bucket is None:
+            bucket = buckets[month] = {"count": 0, "themes": {}}
+        bucket["count"] += 1
+        themes = bucket["themes"]
+        for theme in dream["themes"]:
+            themes[theme] = themes.get(theme, 0) + 1
+    return dict(sorted(buckets.items()))
+
+
+class AnalyticsExecutor:
+    """Runs analytics inline for small inputs and in a process pool above ``threshold`` characters"""
+
+    def __init__(self, workers=2, threshold=256 * 1024):
+        self.workers = workers
+        self.threshold = threshold
+        self._pool = None
+
+    async def run(self, size, fn, *args):
+        if not self.workers or size < self.threshold:
+            return fn(*args)
+        if self._pool is None:
+            # spawn keeps the workers clear of the server's threads and open sockets
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
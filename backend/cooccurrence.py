@@ -0,0 +1,70 @@
+import numpy as np
+
+# Co-occurrence of tags, themes and symbols across a user's dreams. The dream x item
+# incidence is held in coordinate form (sorted row/column arrays) and item pairs
+# are expanded within each row with array arithmetic, which is the sparse product
+# X^T X without materializing X or looping over dreams in Python.
+
+
+def dream_items(dream, symbols):
+    """The distinct items a dream mentions, labelled by kind"""
+    items = {f"tag:{t.strip().lower()}" for t in dream.get("tags", []) if t.strip()}
+    items.update(f"theme:{t}" for t in dream.get("themes", []))
+    text = (dream.get("description", "") + " " + dream.get("title", "")).lower()
+    items.update(f"symbol:{s}" for s, keywords in symbols.items() if any(kw in text for kw in keywords))
+    return items
+
+
+def cooccurrence(dreams, symbols, limit=20, min_count=2):
+    """Top item pairs by lift, with their counts and pointwise mutual information"""
+    vocabulary = {}
+    rows = []
+    cols = []
+    for row, dream in enumerate(dreams):
+        for item in dream_items(dream, symbols):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(item, len(vocabulary)))
+    total = len(dreams)
+    if not rows:
+        return {"total_analyzed": total, "pairs": []}
+    names = np.array(list(vocabulary), dtype=object)
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    item_counts = np.bincount(cols, minlength=len(names))
+
+    # For entry i in a row, pair it with every later entry j of the same row
+    row_end = np.cumsum(np.bincount(rows))[rows]
+    partners = row_end - np.arange(len(rows)) - 1
+    left = np.repeat(np.arange(len(rows)), partners)
+    first = np.cumsum(partners) - partners
+    right = left + 1 + (np.arange(len(left)) - np.repeat(first, partners))
+    a, b = cols[left], cols[right]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    keys, pair_counts = np.unique(a * len(names) + b, return_counts=True)
+
+    keep = pair_counts >= min_count
+    keys, pair_counts = keys[keep], pair_counts[keep]
+    a, b = keys // len(names), keys % len(names)
+    lift = pair_counts * total / (item_counts[a] * item_counts[b])
+    pmi = np.log2(lift)
+    top = np.lexsort((-pair_counts, -lift))[:limit]
+    return {
+        "total_analyzed": total,
+        "pairs": [
+            {
+                "a": _item(names[a[i]]),
+                "b": _item(names[b[i]]),
+                "count": int(pair_counts[i]),
+                "lift": round(float(lift[i]), 3),
+                "pmi": round(float(pmi[i]), 3)
+            }
+            for i in top
+        ]
+    }
+
+
+def _item(label):
+    kind, name = label.split(":", 1)
+    return {"kind": kind, "name": name}
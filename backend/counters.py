@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """Coalesces per-share_id view increments in memory and writes them out in one bulk_write"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def add(self, share_id, count=1):
+        self._pending[share_id] = self._pending.get(share_id, 0) + count
+
+    def pending(self, share_id):
+        return self._pending.get(share_id, 0)
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def flush(self, collection):
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            await collection.bulk_write([
+                UpdateOne({"share_id": share_id}, {"$inc": {"view_count": count}})
+                for share_id, count in pending.items()
+            ], ordered=False)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            for share_id, count in pending.items():
+                self.add(share_id, count)
+            raise
+        return len(pending)
+
+    async def run(self, collection, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(collection)
+            except Exception as e:
+                logger.error(f"Error flushing view counts: {str(e)}")
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import bcrypt
+from dotenv import load_dotenv
+
+from analytics import DREAM_SYMBOLS
+from dedup import signature, band_keys
+from sentiment import score_texts
+from storage import create_storage
+
+logger = logging.getLogger(__name__)
+
+# Synthetic journals for benchmarks and load tests. Everything is drawn from a
+# seeded RNG (one stream per user), so the same --seed and --end-date produce the
+# same dataset on every backend. Tags and themes follow a Zipf distribution,
+# dream dates come in streaks (a two-state active/idle chain over days),
+# descriptions are built around the symbol keywords the pattern analysis looks
+# for, and a share ratio makes some dreams public. Documents have the same shape
+# the API writes and go out through insert_many in chunks.
+#
+#   python datagen.py --users 1000 --dreams 200 --seed 7
+#   STORAGE_BACKEND=sqlite python datagen.py --users 50 --dreams 5000
+
+THEMES = [
+    "Flying", "Falling", "Being Chased", "Water", "Death", "Being Lost", "Being Late", "Teeth Falling Out",
+    "Being Naked", "Meeting Someone", "Animals", "School/Work", "Travel", "Family", "Supernatural",
+]
+EXTRA_TAGS = [
+    "night", "childhood", "school", "work", "ex", "mother", "father", "sister", "brother", "stairs", "forest",
+    "city", "beach", "mountain", "storm", "fire", "light", "darkness", "mirror", "music", "party", "exam",
+    "wedding", "hospital", "space", "moon", "sun", "snow", "desert", "island", "bridge", "tunnel", "elevator",
+    "phone", "money", "lost", "late", "naked", "monster", "ghost", "angel", "baby", "old friend", "celebrity",
+]
+OPENINGS = [
+    "It started in {place}.", "I found myself back in {place}.", "Everything happened at {place}.",
+    "The dream began somewhere like {place}.",
+]
+PLACES = [
+    "my childhood home", "an endless school hallway", "a city I did not recognise", "a beach at dusk",
+    "a forest with glowing paths", "an airport that kept changing", "my grandmother's kitchen", "a quiet train station",
+]
+SYMBOL_SENTENCES = [
+    "There was {kw} everywhere around me.", "I kept thinking about the {kw}.", "Suddenly the {kw} changed.",
+    "I noticed {kw} just before everything shifted.", "Someone pointed at the {kw} and laughed.",
+    "I could not stop looking at the {kw}.", "The {kw} felt strangely familiar.",
+]
+FILLER_SENTENCES = [
+    "I was trying to get somewhere important but kept getting distracted.",
+    "A voice I half knew was calling my name.", "Time moved strangely, fast and slow at once.",
+    "I felt calm and a little afraid at the same time.", "The colours were brighter than in real life.",
+    "I wanted to tell someone but could not find the words.", "Then the scene shifted without warning.",
+    "I realised I had been there before.", "Nothing made sense, yet it all felt normal.",
+]
+ENDINGS = [
+    "Then I woke up.", "I woke up with my heart racing.", "It faded before I could see how it ended.",
+    "I woke up feeling strangely peaceful.",
+]
+TITLES = [
+    "The {kw} dream", "Back to the {kw}", "Lost near the {kw}", "Night of the {kw}", "Following the {kw}",
+    "The strange {kw}", "Again, the {kw}",
+]
+PASSWORD = "seed-password"
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights for rank 1..count with P(rank) proportional to 1 / rank^exponent"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def seeded_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def streak_days(rng, count, end, p_stay=0.8, p_start=0.25):
+    """``count`` dream dates walking back from ``end``: active days cluster into streaks"""
+    days = []
+    day = end
+    active = True
+    while len(days) < count:
+        if active:
+            # Now and then two dreams on the same night
+            days.extend([day] * (2 if rng.random() < 0.08 else 1))
+        active = rng.random() < (p_stay if active else p_start)
+        day -= timedelta(days=1)
+    return days[:count]
+
+
+class JournalGenerator:
+    def __init__(self, seed, end, dreams_per_user, share_ratio=0.1, lucid_ratio=0.15, insight_ratio=0.1, zipf=1.1):
+        self.seed = seed
+        self.end = end
+        self.dreams_per_user = dreams_per_user
+        self.share_ratio = share_ratio
+        self.lucid_ratio = lucid_ratio
+        self.insight_ratio = insight_ratio
+        keywords = [kw for keywords in DREAM_SYMBOLS.values() for kw in keywords]
+        self.tags = keywords + EXTRA_TAGS
+        # Popularity ranks are a seeded shuffle, so the head of the distribution mixes symbols
+        random.Random(f"{seed}:tags").shuffle(self.tags)
+        self.tag_weights = zipf_weights(len(self.tags), zipf)
+        self.theme_weights = zipf_weights(len(THEMES), zipf)
+        self.symbols = list(DREAM_SYMBOLS)
+        # One bcrypt hash shared by every generated user; hashing per user would dominate the run
+        self.password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    def user(self, index, email_prefix):
+        rng = random.Random(f"{self.seed}:user:{index}")
+        user_id = seeded_uuid(rng)
+        created = datetime.combine(self.end, datetime.min.time(), timezone.utc) - timedelta(days=400)
+        user = {
+            "id": user_id,
+            "email": f"{email_prefix}{index}@example.com",
+            "password_hash": self.password_hash,
+            "name": f"Seed Dreamer {index}",
+            "created_at": created.isoformat(),
+        }
+        return user, self.dreams(rng, user_id)
+
+    def description(self, rng, symbols):
+        sentences = [rng.choice(OPENINGS).format(place=rng.choice(PLACES))]
+        # Log-normal sentence counts: mostly short entries, a long tail of detailed ones
+        for _ in range(max(1, min(60, int(rng.lognormvariate(1.6, 0.7))))):
+            if rng.random() < 0.45:
+                sentences.append(rng.choice(SYMBOL_SENTENCES).format(kw=rng.choice(DREAM_SYMBOLS[rng.choice(symbols)])))
+            else:
+                sentences.append(rng.choice(FILLER_SENTENCES))
+        sentences.append(rng.choice(ENDINGS))
+        return " ".join(sentences)
+
+    def dreams(self, rng, user_id):
+        # Each dreamer leans towards a few recurring symbols
+        favourites = rng.sample(self.symbols, 3)
+        dreams = []
+        for day in streak_days(rng, self.dreams_per_user, self.end):
+            symbols = favourites if rng.random() < 0.7 else self.symbols
+            title = rng.choice(TITLES).format(kw=rng.choice(DREAM_SYMBOLS[rng.choice(symbols)]))
+            description = self.description(rng, symbols)
+            moment = datetime.combine(day, datetime.min.time(), timezone.utc) + timedelta(hours=5 + rng.random() * 5)
+            is_public = rng.random() < self.share_ratio
+            dream = {
+                "id": seeded_uuid(rng),
+                "user_id": user_id,
+                "title": title,
+                "description": description,
+                "date": day.isoformat(),
+                "tags": list(dict.fromkeys(rng.choices(self.tags, cum_weights=self.tag_weights, k=rng.randint(0, 5)))),
+                "themes": list(dict.fromkeys(rng.choices(THEMES, cum_weights=self.theme_weights, k=rng.randint(0, 3)))),
+                "is_lucid": rng.random() < self.lucid_ratio,
+                "is_public": is_public,
+                "ai_insight": "A generated interpretation of recurring symbols." if rng.random() < self.insight_ratio else None,
+                "simhash": signature(title, description),
+                "view_count": int(rng.paretovariate(1.2)) - 1 if is_public else 0,
+                "shared_at": moment.isoformat() if is_public else None,
+                "created_at": moment.isoformat(),
+                "updated_at": moment.isoformat(),
+            }
+            if is_public:
+                dream["share_id"] = f"{rng.getrandbits(32):08x}"
+            dreams.append(dream)
+        for dream, sentiment in zip(dreams, score_texts([f"{d['title']}\n{d['description']}" for d in dreams])):
+            dream["sentiment"] = sentiment
+        return dreams
+
+
+async def write_chunks(collection, documents, chunk_size):
+    for i in range(0, len(documents), chunk_size):
+        await collection.insert_many(documents[i:i + chunk_size], ordered=False)
+
+
+async def generate(db, args):
+    end = date.fromisoformat(args.end_date) if args.end_date else date.today()
+    generator = JournalGenerator(args.seed, end, args.dreams, args.share_ratio, args.lucid_ratio, args.insight_ratio, args.zipf)
+    started = time.perf_counter()
+    users, dreams, signatures = [], [], []
+    totals = {"users": 0, "dreams": 0}
+
+    async def flush():
+        await write_chunks(db.users, users, args.chunk_size)
+        await write_chunks(db.dreams, dreams, args.chunk_size)
+        await write_chunks(db.dream_signatures, signatures, args.chunk_size)
+        totals["users"] += len(users)
+        totals["dreams"] += len(dreams)
+        users.clear()
+        dreams.clear()
+        signatures.clear()
+        logger.info(f"Wrote {totals['users']} users and {totals['dreams']} dreams")
+
+    for index in range(args.users):
+        user, user_dreams = generator.user(args.first_user + index, args.email_prefix)
+        users.append(user)
+        dreams.extend(user_dreams)
+        # Near-duplicate band keys, as update_dream_signatures would write them for new dreams
+        signatures.extend(
+            {"dream_id": dream["id"], "band": band, "user_id": dream["user_id"], "key": key, "simhash": dream["simhash"]}
+            for dream in user_dreams for band, key in enumerate(band_keys(int(dream["simhash"], 16)))
+        )
+        if len(dreams) >= args.chunk_size * 10:
+            await flush()
+    await flush()
+    return {**totals, "seconds": round(time.perf_counter() - started, 2), "password": PASSWORD}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the configured storage with synthetic dream journals")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--dreams", type=int, default=100, help="dreams per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end-date", help="date of the most recent dreams (YYYY-MM-DD, default today)")
+    parser.add_argument("--share-ratio", type=float, default=0.1)
+    parser.add_argument("--lucid-ratio", type=float, default=0.15)
+    parser.add_argument("--insight-ratio", type=float, default=0.1)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent for tag and theme popularity")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="documents per insert_many")
+    parser.add_argument("--first-user", type=int, default=0, help="index of the first user, to add more users to a dataset")
+    parser.add_argument("--email-prefix", default="seed")
+    parser.add_argument("--storage", help="storage backend (default STORAGE_BACKEND)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        db = create_storage(args.storage)
+        try:
+            return await generate(db, args)
+        finally:
+            db.close()
+
+    result = asyncio.run(run())
+    logger.info(f"Seeded {result['users']} users and {result['dreams']} dreams in {result['seconds']}s (password: {result['password']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import hashlib
+import re
+
+import numpy as np
+from pymongo import UpdateOne, DeleteMany
+
+# Near-duplicate detection with 64-bit SimHash. A signature is split into BANDS
+# equal slices; two signatures within MAX_DISTANCE bits of each other (with
+# MAX_DISTANCE < BANDS) must agree on at least one slice, so candidates come from
+# an exact lookup on band keys instead of a comparison against every dream.
+
+BITS = 64
+BANDS = 4
+MAX_DISTANCE = 3
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _features(text):
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def simhash(title, description):
+    features = _features(f"{title}\n{description}")
+    if not features:
+        return 0
+    digests = b"".join(hashlib.blake2b(f.encode(), digest_size=8).digest() for f in features)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    # Each feature votes +1/-1 on every bit; the signature keeps the sign of the tally
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(features)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+def signature(title, description):
+    """SimHash of a dream's text as the fixed-width hex string stored on the dream"""
+    return f"{simhash(title, description):0{BITS // 4}x}"
+
+
+def band_keys(value):
+    width = BITS // BANDS
+    mask = (1 << width) - 1
+    return [f"{band}:{(value >> (band * width)) & mask:0{width // 4}x}" for band in range(BANDS)]
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def signature_writes(before, after):
+    """dream_signatures writes that keep a dream's band keys in step with its text"""
+    if after is None:
+        return [DeleteMany({"dream_id": before["id"]})] if before else []
+    if before and before["simhash"] == after["simhash"]:
+        return []
+    return [
+        UpdateOne(
+            {"dream_id": after["id"], "band": band},
+            {"$set": {"user_id": after["user_id"], "key": key, "simhash": after["simhash"]}},
+            upsert=True
+        )
+        for band, key in enumerate(band_keys(int(after["simhash"], 16)))
+    ]
+
+
+async def find_near_duplicate(collection, user_id, hex_signature, exclude=None):
+    """Closest of the user's dreams within MAX_DISTANCE bits of ``hex_signature``, as (dream_id, distance)"""
+    value = int(hex_signature, 16)
+    candidates = await collection.find(
+        {"user_id": user_id, "key": {"$in": band_keys(value)}},
+        {"_id": 0, "dream_id": 1, "simhash": 1}
+    ).to_list(None)
+    best = None
+    for candidate in candidates:
+        if candidate["dream_id"] == exclude:
+            continue
+        d = distance(value, int(candidate["simhash"], 16))
+        if d <= MAX_DISTANCE and (best is None or d < best[1]):
+            best = (candidate["dream_id"], d)
+    return best
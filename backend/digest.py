@@ -0,0 +1,84 @@
+# Packing a period's dreams into one prompt under a token budget. Tokens are
+# estimated at four characters each, which is close enough for English prose to
+# keep a safety margin without a tokenizer dependency.
+
+CHARS_PER_TOKEN = 4
+MIN_DESCRIPTION_CHARS = 120
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate(text, limit):
+    """Cut ``text`` to at most ``limit`` characters at a word boundary"""
+    if len(text) <= limit:
+        return text
+    cut = text[:max(0, limit - 1)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def fair_shares(lengths, budget):
+    """Split ``budget`` characters so short texts keep everything and long ones get equal cuts"""
+    shares = [0] * len(lengths)
+    remaining = budget
+    pending = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if lengths[i] > share:
+            for j in pending:
+                shares[j] = share
+            break
+        shares[i] = lengths[i]
+        remaining -= lengths[i]
+        pending.pop(0)
+    return shares
+
+
+def dream_header(dream):
+    header = f"[{dream['date'][:10]}] {dream['title']}"
+    if dream["tags"]:
+        header += f" | tags: {', '.join(dream['tags'])}"
+    if dream["themes"]:
+        header += f" | themes: {', '.join(dream['themes'])}"
+    if dream["is_lucid"]:
+        header += " | lucid"
+    return header
+
+
+def build_digest_prompt(dreams, period_label, budget_tokens):
+    """One prompt covering ``dreams`` (oldest first) in roughly ``budget_tokens`` tokens
+
+    Every dream keeps its header line. Descriptions share what is left of the
+    budget; the most recent dreams are kept when even the headers do not fit.
+    """
+    intro = f"Here are the dreams I recorded over the {period_label}, oldest first.\n\n"
+    outro = (
+        "\n\nWrite a digest of this period covering:\n"
+        "1. Recurring symbols, settings and characters across the dreams\n"
+        "2. How the emotional tone shifted over the period\n"
+        "3. Possible connections between dreams and what they might reflect\n"
+        "4. One reflection prompt for the coming days"
+    )
+    budget = budget_tokens * CHARS_PER_TOKEN - len(intro) - len(outro)
+    headers = [dream_header(d) for d in dreams]
+
+    # Drop the oldest dreams while the headers alone (plus a minimal description) overflow
+    kept = len(dreams)
+    while kept > 1 and sum(len(h) + MIN_DESCRIPTION_CHARS for h in headers[-kept:]) > budget:
+        kept -= 1
+    omitted = len(dreams) - kept
+    dreams, headers = dreams[-kept:], headers[-kept:]
+    if omitted:
+        intro += f"({omitted} earlier dreams from this period are left out.)\n\n"
+
+    separators = 4 * len(dreams)
+    room = max(0, budget - sum(len(h) for h in headers) - separators)
+    shares = fair_shares([len(d["description"]) for d in dreams], room)
+    if any(s < len(d["description"]) for s, d in zip(shares, dreams)):
+        intro += "(Longer descriptions are shortened.)\n\n"
+    entries = [f"{h}\n{truncate(d['description'], s)}" for h, d, s in zip(headers, dreams, shares)]
+    return intro + "\n\n".join(entries) + outro
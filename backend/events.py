@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Per-user live events. Handlers publish from their write paths; the bus fans each
+# event out to that user's open streams in this process, and a broker carries it
+# to the other processes serving the app.
+
+
+class EventBus:
+    def __init__(self, broker=None, queue_size=100):
+        self.broker = broker or LocalBroker()
+        self.queue_size = queue_size
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id, event_type, data):
+        event = {"id": str(uuid.uuid4()), "user_id": user_id, "type": event_type, "data": data}
+        self.deliver(event)
+        self.broker.forward(event)
+
+    def deliver(self, event):
+        for queue in self._subscribers.get(event["user_id"], ()):
+            if queue.full():
+                # A stalled client loses its oldest events rather than holding up the publisher
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def run(self):
+        await self.broker.run(self)
+
+
+class LocalBroker:
+    """Single-process deployments: nothing to forward"""
+
+    def forward(self, event):
+        pass
+
+    async def run(self, bus):
+        pass
+
+
+class StorageBroker:
+    """Shares events between processes through an ``events`` collection in the app's storage
+
+    Outgoing events are written in batches and each process polls for events
+    written by the others. Polled events overlap by a few seconds so late inserts
+    are not missed; ids already delivered are skipped.
+    """
+
+    def __init__(self, collection, interval=0.5, retention=300, overlap=5):
+        self.collection = collection
+        self.interval = interval
+        self.retention = retention
+        self.overlap = overlap
+        self.origin = str(uuid.uuid4())
+        self._outbox = []
+        self._seen = deque()
+        self._seen_ids = set()
+
+    def forward(self, event):
+        self._outbox.append({**event, "origin": self.origin, "ts": time.time()})
+
+    def _remember(self, event_id, now):
+        self._seen.append((now, event_id))
+        self._seen_ids.add(event_id)
+        # Anything older than this can no longer fall inside a poll's overlap
+        while self._seen and self._seen[0][0] < now - 3 * self.overlap:
+            self._seen_ids.discard(self._seen.popleft()[1])
+
+    async def run(self, bus):
+        last_poll = time.time()
+        last_cleanup = 0
+        while True:
+            try:
+                if self._outbox:
+                    outbox, self._outbox = self._outbox, []
+                    try:
+                        await self.collection.insert_many(outbox, ordered=False)
+                    except Exception:
+                        self._outbox = outbox + self._outbox
+                        raise
+                now = time.time()
+                events = await self.collection.find(
+                    {"ts": {"$gt": last_poll - self.overlap}, "origin": {"$ne": self.origin}},
+                    {"_id": 0}
+                ).sort("ts", 1).to_list(None)
+                last_poll = now
+                for event in events:
+                    if event["id"] in self._seen_ids:
+                        continue
+                    self._remember(event["id"], now)
+                    bus.deliver({k: event[k] for k in ("id", "user_id", "type", "data")})
+                if now - last_cleanup > self.retention:
+                    last_cleanup = now
+                    await self.collection.delete_many({"ts": {"$lt": last_cleanup - self.retention}})
+            except Exception as e:
+                logger.error(f"Error relaying events: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+def create_broker(db, name=None):
+    name = name or os.environ.get('EVENT_BROKER', 'local')
+    if name == "local":
+        return LocalBroker()
+    if name == "storage":
+        return StorageBroker(db.events, interval=float(os.environ.get('EVENT_POLL_SECONDS', 0.5)))
+    raise ValueError(f"Unknown event broker: {name}")
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -0,0 +1,31 @@
+import asyncio
+import hashlib
+import os
+
+# Offline stand-in for emergentintegrations' LlmChat, selected with LLM_PROVIDER=fake.
+# Replies are deterministic per prompt and arrive after FAKE_LLM_LATENCY_MS, so load
+# tests exercise the insight and digest paths without network access or cost.
+
+
+class UserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+class LlmChat:
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.session_id = session_id
+        self.system_message = system_message
+        self.latency = float(os.environ.get('FAKE_LLM_LATENCY_MS', 800)) / 1000
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.latency)
+        digest = hashlib.sha1(message.text.encode()).hexdigest()[:8]
+        return (
+            f"[fake interpretation {digest}] This dream weaves familiar symbols into a story about change. "
+            "The settings suggest a search for safety, and the figures you met may stand for parts of yourself. "
+            "Reflection: what in your waking life feels like the moment you woke?"
+        )
@@ -0,0 +1,86 @@
+import base64
+import bisect
+
+
+def encode_cursor(key):
+    created_at, dream_id = key
+    return base64.urlsafe_b64encode(f"{created_at}|{dream_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, dream_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid feed cursor")
+    return created_at, dream_id
+
+
+class PublicFeed:
+    """Bounded, newest-first buffer of pre-serialized public dreams for the Explore page
+
+    Entries are keyed by (created_at, dream id) and kept in ascending key order so a
+    page is a slice ending just before the cursor. When the buffer is full the oldest
+    entry is dropped and ``truncated`` records that older public dreams exist that
+    only the database can serve.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.truncated = False
+        self._keys = []
+        self._payloads = []
+        self._key_by_id = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, entries, truncated):
+        """Replace the contents with (key, payload) pairs, e.g. when rebuilding from the database"""
+        entries = sorted(entries)[-self.capacity:] if self.capacity else []
+        self._keys = [key for key, _ in entries]
+        self._payloads = [payload for _, payload in entries]
+        self._key_by_id = {key[1]: key for key in self._keys}
+        self.truncated = truncated
+
+    def upsert(self, key, payload):
+        self.remove(key[1])
+        if len(self._keys) >= self.capacity:
+            if not self._keys or key < self._keys[0]:
+                # Older than everything retained; the database serves it
+                self.truncated = True
+                return
+            evicted = self._keys.pop(0)
+            self._payloads.pop(0)
+            del self._key_by_id[evicted[1]]
+            self.truncated = True
+        index = bisect.bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._payloads.insert(index, payload)
+        self._key_by_id[key[1]] = key
+
+    def remove(self, dream_id):
+        key = self._key_by_id.pop(dream_id, None)
+        if key is None:
+            return False
+        index = bisect.bisect_left(self._keys, key)
+        del self._keys[index]
+        del self._payloads[index]
+        return True
+
+    def page(self, before=None, skip=0, limit=20):
+        """Return up to ``limit`` (key, payload) pairs older than ``before``, newest first
+
+        Also returns how much of ``skip`` the buffer could not satisfy, so a caller can
+        continue in the database from the oldest buffered key.
+        """
+        end = bisect.bisect_left(self._keys, before) if before else len(self._keys)
+        end -= skip
+        remaining_skip = max(0, -end)
+        end = max(0, end)
+        start = max(0, end - limit)
+        page = list(zip(self._keys[start:end], self._payloads[start:end]))
+        page.reverse()
+        return page, remaining_skip
+
+    def oldest_key(self):
+        return self._keys[0] if self._keys else None
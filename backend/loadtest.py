@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# Load generator for the API. Virtual users run weighted scenarios concurrently
+# against the app in-process (ASGI transport), against a local uvicorn this script
+# starts, or against any URL. In-process and spawned servers default to in-memory
+# storage and the fake LLM, so runs need no network; pass --storage mongo with
+# MONGO_URL/DB_NAME set to measure a local MongoDB. Results are printed (or
+# written with --output) as JSON; --baseline compares them to an earlier run.
+#
+#   python loadtest.py --users 20 --duration 30 --output run.json
+#   python loadtest.py --target spawn --scenarios dashboard,explore --baseline run.json
+
+ROOT_DIR = Path(__file__).parent
+# Unless already set, load test servers run without admission control or rate limits
+ADMISSION_OFF = {"ADMISSION_CONTROL": "0", "RATE_LIMIT_USER_PER_MINUTE": "0", "RATE_LIMIT_IP_PER_MINUTE": "0"}
+SCENARIOS = {}
+
+TAGS = ["flying", "water", "family", "school", "chase", "ocean", "forest", "city", "teeth", "exam", "cat", "house"]
+THEMES = ["Flying", "Falling", "Water", "Animals", "Adventure", "Nightmare", "Romance", "Travel"]
+SENTENCES = [
+    "I was flying over a dark ocean at night.",
+    "Someone was chasing me through an old house with endless stairs.",
+    "My teeth started falling out while I gave a speech at school.",
+    "A gentle cat led me through a forest full of glowing doors.",
+    "I was late for an exam in a building that kept changing shape.",
+    "My family was having dinner on a train that never stopped.",
+    "The water rose slowly until the whole city was quiet and blue.",
+]
+
+
+def scenario(name, weight):
+    def register(fn):
+        SCENARIOS[name] = (fn, weight)
+        return fn
+    return register
+
+
+class Recorder:
+    """Latencies and failures per request name"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, name, seconds, ok):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed):
+        requests = {
+            name: summarize(latencies, self.errors.get(name, 0), elapsed)
+            for name, latencies in sorted(self.latencies.items())
+        }
+        everything = [s for latencies in self.latencies.values() for s in latencies]
+        return {"elapsed_seconds": round(elapsed, 3), "total": summarize(everything, sum(self.errors.values()), elapsed), "requests": requests}
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, rng, index):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.index = index
+        self.token = None
+        self.dream_ids = []
+        # dream id -> share id of the dreams this user shared
+        self.shares = {}
+
+    async def call(self, name, method, url, **kwargs):
+        """Send one request and record it under ``name``; returns the response or None on failure"""
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.add(name, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def dream(self):
+        rng = self.rng
+        return {
+            "title": rng.choice(["Night flight", "The endless house", "Blue city", "Lost exam", "Forest doors"]),
+            "description": " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 8))),
+            "date": time.strftime("%Y-%m-%d", time.gmtime(time.time() - rng.randint(0, 60) * 86400)),
+            "tags": rng.sample(TAGS, rng.randint(1, 4)),
+            "themes": rng.sample(THEMES, rng.randint(0, 2)),
+            "is_lucid": rng.random() < 0.2,
+        }
+
+    async def sign_up(self, run_id):
+        email = f"load-{run_id}-{self.index}-{self.rng.getrandbits(32):08x}@example.com"
+        response = await self.call("POST /auth/register", "POST", "/api/auth/register",
+                                   json={"email": email, "password": "loadtest-password", "name": f"Load User {self.index}"})
+        if response is not None:
+            self.token = response.json()["access_token"]
+        return email
+
+    async def seed(self, dreams, share_ratio):
+        for _ in range(dreams):
+            response = await self.call("POST /dreams", "POST", "/api/dreams", json=self.dream())
+            if response is None:
+                continue
+            dream_id = response.json()["id"]
+            self.dream_ids.append(dream_id)
+            if self.rng.random() < share_ratio:
+                shared = await self.call("POST /dreams/{id}/share", "POST", f"/api/dreams/{dream_id}/share")
+                if shared is not None:
+                    self.shares[dream_id] = shared.json()["share_id"]
+
+
+@scenario("register_login", weight=1)
+async def register_login(user, run_id):
+    """A new account: register, log in again, load the profile"""
+    visitor = VirtualUser(user.client, user.recorder, user.rng, f"{user.index}-new")
+    email = await visitor.sign_up(run_id)
+    if visitor.token is None:
+        return
+    visitor.token = None
+    response = await visitor.call("POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": "loadtest-password"})
+    if response is not None:
+        visitor.token = response.json()["access_token"]
+        await visitor.call("GET /auth/me", "GET", "/api/auth/me")
+
+
+@scenario("dashboard", weight=4)
+async def dashboard(user, run_id):
+    """The requests the dashboard issues together on load"""
+    await asyncio.gather(
+        user.call("GET /stats", "GET", "/api/stats"),
+        user.call("GET /dreams", "GET", "/api/dreams"),
+        user.call("GET /achievements", "GET", "/api/achievements"),
+        user.call("GET /settings", "GET", "/api/settings"),
+    )
+
+
+@scenario("journal_writes", weight=3)
+async def journal_writes(user, run_id):
+    """Record a dream, edit it, and now and then delete one"""
+    response = await user.call("POST /dreams", "POST", "/api/dreams", json=user.dream())
+    if response is None:
+        return
+    dream_id = response.json()["id"]
+    user.dream_ids.append(dream_id)
+    await user.call("PUT /dreams/{id}", "PUT", f"/api/dreams/{dream_id}", json={"tags": user.rng.sample(TAGS, 3)})
+    if len(user.dream_ids) > 5 and user.rng.random() < 0.3:
+        victim = user.dream_ids.pop(user.rng.randrange(len(user.dream_ids)))
+        if await user.call("DELETE /dreams/{id}", "DELETE", f"/api/dreams/{victim}") is not None:
+            # Its share link is gone too; explore would count the 404 as an error
+            user.shares.pop(victim, None)
+
+
+@scenario("explore", weight=3)
+async def explore(user, run_id):
+    """Browse the public feed a few pages deep, check trending and open a shared dream"""
+    cursor = None
+    for _ in range(user.rng.randint(1, 3)):
+        params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+        response = await user.call("GET /public/dreams", "GET", "/api/public/dreams", params=params)
+        if response is None:
+            break
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    await user.call("GET /public/trending", "GET", "/api/public/trending")
+    if user.shares:
+        share_id = user.rng.choice(list(user.shares.values()))
+        await user.call("GET /public/dream/{share_id}", "GET", f"/api/public/dream/{share_id}")
+
+
+@scenario("insight_burst", weight=1)
+async def insight_burst(user, run_id):
+    """Ask for insights on several dreams at once"""
+    if not user.dream_ids:
+        return
+    picks = user.rng.sample(user.dream_ids, min(3, len(user.dream_ids)))
+    await asyncio.gather(*(
+        user.call("POST /dreams/{id}/insight", "POST", f"/api/dreams/{dream_id}/insight") for dream_id in picks
+    ))
+
+
+async def run_users(client, args):
+    rng = random.Random(args.seed)
+    run_id = f"{args.seed}-{int(time.time())}"
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+    weights = [SCENARIOS[name][1] for name in scenarios]
+
+    # Setup (accounts and seed dreams) is recorded separately from the measured run
+    setup = Recorder()
+    setup_start = time.perf_counter()
+    users = [VirtualUser(client, setup, random.Random(rng.getrandbits(64)), i) for i in range(args.users)]
+    for i in range(0, len(users), args.setup_concurrency):
+        batch = users[i:i + args.setup_concurrency]
+        await asyncio.gather(*(user.sign_up(run_id) for user in batch))
+        await asyncio.gather(*(user.seed(args.seed_dreams, args.share_ratio) for user in batch if user.token))
+    users = [user for user in users if user.token]
+    setup_elapsed = time.perf_counter() - setup_start
+    if not users:
+        raise SystemExit("No virtual user could register; is the server up?")
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    runs = {name: 0 for name in scenarios}
+
+    async def loop(user):
+        user.recorder = recorder
+        while time.perf_counter() < deadline:
+            name = user.rng.choices(scenarios, weights)[0]
+            runs[name] += 1
+            await SCENARIOS[name][0](user, run_id)
+            if args.think_ms:
+                await asyncio.sleep(user.rng.expovariate(1000 / args.think_ms))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(user) for user in users))
+    report = recorder.report(time.perf_counter() - start)
+    report["scenarios"] = runs
+    report["setup"] = setup.report(setup_elapsed)["total"]
+    report["config"] = {
+        "target": args.target, "users": len(users), "duration": args.duration, "scenarios": scenarios,
+        "seed": args.seed, "seed_dreams": args.seed_dreams, "think_ms": args.think_ms, "storage": args.storage,
+    }
+    return report
+
+
+async def run_in_process(args):
+    os.environ['STORAGE_BACKEND'] = args.storage
+    os.environ.setdefault('LLM_PROVIDER', 'fake')
+    os.environ.setdefault('RUN_MIGRATIONS', '1')
+    # Measure the server itself: rate limits and shedding would turn load into 429/503s
+    for name, value in ADMISSION_OFF.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, str(ROOT_DIR))
+    import server
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_users(client, args)
+
+
+async def run_against(base_url, args):
+    limits = httpx.Limits(max_connections=args.users * 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        return await run_users(client, args)
+
+
+async def wait_until_up(base_url, timeout=30):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not come up")
+
+
+async def run_spawned(args):
+    env = {
+        **os.environ, "STORAGE_BACKEND": args.storage, "LLM_PROVIDER": os.environ.get('LLM_PROVIDER', 'fake'),
+        **{name: os.environ.get(name, value) for name, value in ADMISSION_OFF.items()},
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_until_up(base_url)
+        return await run_against(base_url, args)
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def compare(report, baseline, tolerance):
+    """Requests whose p95 or error rate got worse than ``baseline`` by more than ``tolerance``"""
+    regressions = []
+    for name, current in report["requests"].items():
+        before = baseline.get("requests", {}).get(name)
+        if before is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance) and current["p95_ms"] - before["p95_ms"] > 1:
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Dream Journal API")
+    parser.add_argument("--target", default="inprocess", help="inprocess, spawn (local uvicorn) or a base URL")
+    parser.add_argument("--storage", default="memory", choices=["memory", "sqlite", "mongo"], help="storage for inprocess/spawn targets")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between scenarios per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--seed-dreams", type=int, default=10, help="dreams each virtual user records during setup")
+    parser.add_argument("--share-ratio", type=float, default=0.3)
+    parser.add_argument("--setup-concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95 increase over the baseline")
+    args = parser.parse_args()
+
+    if args.target == "inprocess":
+        report = asyncio.run(run_in_process(args))
+    elif args.target == "spawn":
+        report = asyncio.run(run_spawned(args))
+    else:
+        report = asyncio.run(run_against(args.target.rstrip("/"), args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    total = report["total"]
+    print(
+        f"{total['count']} requests in {report['elapsed_seconds']}s: {total['throughput_rps']} req/s, "
+        f"p50 {total['p50_ms']} ms, p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, errors {total['error_rate']:.2%}",
+        file=sys.stderr
+    )
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
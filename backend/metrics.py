@@ -0,0 +1,274 @@
+import bisect
+import logging
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+from storage.ops import track_db_ops
+
+logger = logging.getLogger(__name__)
+
+# Prometheus-style metrics kept in plain dicts. Request and LLM metrics are updated
+# on the event loop, which is single-threaded, so they need no locks. Mongo
+# commands are reported on Motor's worker threads; those observations go through
+# a deque (whose append and popleft are thread-safe) and are folded into the
+# histograms on the event loop when /metrics is scraped.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DB_OPS_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> per-bucket counts (the last one is +Inf), not yet cumulative
+        self.counts = {}
+        self.sums = {}
+
+    def observe(self, value, *labels):
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def samples(self):
+        for labels, counts in sorted(self.counts.items()):
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {total}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(self.sums[labels])}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {total}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class CommandTimer(monitoring.CommandListener):
+    """pymongo command listener timing each command per collection"""
+
+    def __init__(self, maxlen=100000):
+        self._collections = {}
+        # Bounded so a server that is never scraped does not grow without limit
+        self.finished = deque(maxlen=maxlen)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.finished.append((collection, event.command_name, event.duration_micros / 1e6, outcome))
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+class AppMetrics:
+    """The app's metrics: HTTP requests, Mongo commands, LLM calls and startup phases"""
+
+    def __init__(self):
+        self.registry = Registry()
+        register = self.registry.register
+        self.http_requests = register(Counter(
+            "http_requests_total", "HTTP requests by route template, method and status", ("route", "method", "status")
+        ))
+        self.http_duration = register(Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route template", ("route", "method")
+        ))
+        self.http_in_progress = register(Gauge("http_requests_in_progress", "HTTP requests being handled"))
+        self.http_rejected = register(Counter(
+            "http_requests_rejected_total", "Requests turned away by rate limits or load shedding, by route template and reason",
+            ("route", "reason")
+        ))
+        self.http_db_ops = register(Histogram(
+            "http_request_db_round_trips", "Database round trips per HTTP request by route template",
+            ("route", "method"), DB_OPS_BUCKETS
+        ))
+        self.db_duration = register(Histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency by collection and command",
+            ("collection", "command"), DB_BUCKETS
+        ))
+        self.db_errors = register(Counter(
+            "mongo_command_errors_total", "Failed MongoDB commands by collection and command", ("collection", "command")
+        ))
+        self.llm_duration = register(Histogram(
+            "llm_request_duration_seconds", "LLM call latency by purpose and outcome", ("purpose", "outcome"), LLM_BUCKETS
+        ))
+        self.llm_tokens = register(Counter(
+            "llm_tokens_total", "Estimated LLM tokens by purpose and direction", ("purpose", "direction")
+        ))
+        self.startup_seconds = register(Gauge(
+            "app_startup_seconds", "Duration of each startup phase (import, db_ping, indexes, ...)", ("phase",)
+        ))
+        self.mongo_listener = CommandTimer()
+        self.registry.collectors.append(self.collect_mongo)
+
+    def collect_mongo(self):
+        finished = self.mongo_listener.finished
+        while finished:
+            collection, command, seconds, outcome = finished.popleft()
+            self.db_duration.observe(seconds, collection, command)
+            if outcome == "error":
+                self.db_errors.inc(collection, command)
+
+    def render(self):
+        return self.registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests by their route template"""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.http_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.http_in_progress.dec()
+            # The router records the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.metrics.http_requests.inc(path, scope["method"], str(status))
+            self.metrics.http_duration.observe(elapsed, path, scope["method"])
+
+
+def parse_budgets(value):
+    """Per-route budgets from "route=limit,route=limit" """
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.rpartition("=")
+        budgets[route] = int(limit)
+    return budgets
+
+
+class DbBudgetMiddleware:
+    """ASGI middleware counting each request's database round trips
+
+    The count and time go out as ``X-DB-Ops`` and ``Server-Timing`` headers (as
+    of the moment the response starts), and requests over their route's budget
+    are logged with a breakdown by command.
+    """
+
+    def __init__(self, app, metrics, default_budget=25, budgets=None):
+        self.app = app
+        self.metrics = metrics
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_db_ops() as ops:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-ops", str(ops.count).encode()))
+                    headers.append((b"server-timing", f'db;dur={ops.seconds * 1000:.1f};desc="{ops.count} ops"'.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        self.metrics.http_db_ops.observe(ops.count, route, scope["method"])
+        budget = self.budgets.get(route, self.default_budget)
+        if ops.count > budget:
+            logger.warning(
+                f"{scope['method']} {route} made {ops.count} database round trips "
+                f"(budget {budget}, {ops.seconds * 1000:.1f} ms): {ops.summary()}"
+            )
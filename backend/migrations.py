@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from dedup import signature, signature_writes
+from sentiment import score_texts
+from reminders import reminder_bucket
+
+logger = logging.getLogger(__name__)
+
+# Versioned data migrations. Each one walks a collection in _id order in bounded
+# batches, writes each batch with one bulk_write and checkpoints the last _id it
+# finished, so an interrupted run resumes where it stopped.
+
+MIGRATIONS = []
+
+LEASE_SECONDS = 120
+
+
+class LeaseLost(Exception):
+    """Another worker took over a migration whose lease this one let expire"""
+
+
+class Migration:
+    def __init__(self, version, name, collection, transform, query=None, after_batch=None, batched=False):
+        self.version = version
+        self.name = name
+        self.collection = collection
+        self.transform = transform
+        self.query = query or {}
+        self.after_batch = after_batch
+        self.batched = batched
+
+
+def migration(version, name, collection, query=None, after_batch=None, batched=False):
+    """Register a document transform returning an update document (or None to skip)
+
+    With ``batched`` the transform takes the whole batch and returns one update per
+    document, for work that is cheaper done over many documents at once.
+    ``after_batch(db, docs)``, if given, runs once a batch is written and before it is
+    checkpointed, for derived data kept in other collections. It must be idempotent.
+    """
+    def register(transform):
+        MIGRATIONS.append(Migration(version, name, collection, transform, query, after_batch, batched))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return transform
+    return register
+
+
+# ============== MIGRATIONS ==============
+
+DREAM_DEFAULTS = {
+    "tags": [],
+    "themes": [],
+    "is_lucid": False,
+    "is_public": False,
+    "ai_insight": None,
+}
+
+
+@migration(1, "dream_defaults", "dreams", query={"$or": [{field: {"$exists": False}} for field in DREAM_DEFAULTS]})
+def backfill_dream_defaults(dream):
+    missing = {field: value for field, value in DREAM_DEFAULTS.items() if field not in dream}
+    return {"$set": missing} if missing else None
+
+
+@migration(2, "dream_view_count", "dreams", query={"view_count": {"$exists": False}})
+def backfill_dream_view_count(dream):
+    return {"$set": {"view_count": 0}}
+
+
+@migration(3, "public_dream_shared_at", "dreams", query={"is_public": True, "shared_at": {"$exists": False}})
+def backfill_public_dream_shared_at(dream):
+    return {"$set": {"shared_at": dream["updated_at"]}}
+
+
+async def write_dream_signatures(db, dreams):
+    writes = []
+    for dream in dreams:
+        dream = {**dream, "simhash": signature(dream["title"], dream["description"])}
+        writes += signature_writes(None, dream)
+    if writes:
+        await db.dream_signatures.bulk_write(writes, ordered=False)
+
+
+@migration(4, "dream_simhash", "dreams", query={"simhash": {"$exists": False}}, after_batch=write_dream_signatures)
+def backfill_dream_simhash(dream):
+    return {"$set": {"simhash": signature(dream["title"], dream["description"])}}
+
+
+@migration(5, "dream_sentiment", "dreams", query={"sentiment": {"$exists": False}}, batched=True)
+def backfill_dream_sentiment(dreams):
+    scores = score_texts([f"{dream['title']}\n{dream['description']}" for dream in dreams])
+    return [{"$set": {"sentiment": score}} for score in scores]
+
+
+@migration(6, "reminder_bucket", "user_settings", query={"reminder_enabled": True, "reminder_bucket": {"$exists": False}})
+def backfill_reminder_bucket(settings):
+    try:
+        return {"$set": {"reminder_bucket": reminder_bucket(settings, datetime.now(timezone.utc))}}
+    except ValueError as e:
+        logger.error(f"Skipping reminder for user {settings.get('user_id')}: {str(e)}")
+        return None
+
+
+# ============== RUNNER ==============
+
+class MigrationRunner:
+    def __init__(self, db, batch_size=500, pause=0.05):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+        self.owner = str(uuid.uuid4())
+
+    async def pending(self):
+        done = await self.db.migrations.find({"completed_at": {"$ne": None}}, {"_id": 0, "version": 1}).to_list(None)
+        done_versions = {m["version"] for m in done}
+        return [m for m in MIGRATIONS if m.version not in done_versions]
+
+    async def run(self):
+        applied = []
+        for m in await self.pending():
+            while True:
+                if await self._acquire(m):
+                    try:
+                        await self._apply(m)
+                        applied.append(m.version)
+                        break
+                    except LeaseLost:
+                        logger.warning(f"Migration {m.version} ({m.name}) was taken over by another worker; stopped applying it here")
+                # Another worker holds the lease; wait for it so reads never see unmigrated data
+                state = await self.db.migrations.find_one({"version": m.version}, {"_id": 0, "completed_at": 1})
+                if state and state.get("completed_at"):
+                    break
+                logger.info(f"Waiting for migration {m.version} ({m.name}) running elsewhere")
+                await asyncio.sleep(1)
+        return applied
+
+    async def _acquire(self, m):
+        now = datetime.now(timezone.utc)
+        try:
+            await self.db.migrations.update_one(
+                {"version": m.version, "completed_at": None, "$or": [
+                    {"lease_until": {"$lt": now.isoformat()}},
+                    {"owner": self.owner}
+                ]},
+                {
+                    "$set": {"owner": self.owner, "lease_until": (now + timedelta(seconds=LEASE_SECONDS)).isoformat()},
+                    "$setOnInsert": {"name": m.name, "started_at": now.isoformat(), "processed": 0, "modified": 0}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def _apply(self, m):
+        state = await self.db.migrations.find_one({"version": m.version}, {"_id": 0})
+        last_id = state.get("last_id")
+        if last_id is not None:
+            logger.info(f"Resuming migration {m.version} ({m.name}) after _id {last_id}")
+        collection = self.db[m.collection]
+
+        while True:
+            query = dict(m.query)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = await collection.find(query).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not docs:
+                break
+
+            updates = m.transform(docs) if m.batched else [m.transform(doc) for doc in docs]
+            writes = [UpdateOne({"_id": doc["_id"]}, update) for doc, update in zip(docs, updates) if update]
+            modified = 0
+            if writes:
+                result = await collection.bulk_write(writes, ordered=False)
+                modified = result.modified_count
+            if m.after_batch:
+                await m.after_batch(self.db, docs)
+
+            last_id = docs[-1]["_id"]
+            # Checkpointing also renews the lease, but only while this worker still owns it
+            renewed = await self.db.migrations.update_one(
+                {"version": m.version, "owner": self.owner},
+                {
+                    "$set": {
+                        "last_id": last_id,
+                        "lease_until": (datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)).isoformat()
+                    },
+                    "$inc": {"processed": len(docs), "modified": modified}
+                }
+            )
+            if not renewed.matched_count:
+                raise LeaseLost(m.version)
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+        completed = await self.db.migrations.update_one(
+            {"version": m.version, "owner": self.owner},
+            {"$set": {"completed_at": datetime.now(timezone.utc).isoformat()}, "$unset": {"lease_until": ""}}
+        )
+        if not completed.matched_count:
+            raise LeaseLost(m.version)
+        logger.info(f"Migration {m.version} ({m.name}) complete")
+
+
+async def run_migrations(db):
+    await db.migrations.create_index("version", unique=True)
+    runner = MigrationRunner(
+        db,
+        batch_size=int(os.environ.get('MIGRATION_BATCH_SIZE', 500)),
+        pause=float(os.environ.get('MIGRATION_BATCH_PAUSE', 0.05))
+    )
+    return await runner.run()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from storage import create_storage
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def main():
+        db = create_storage()
+        try:
+            applied = await run_migrations(db)
+            print(f"Applied migrations: {applied or 'none'}")
+        finally:
+            db.close()
+
+    asyncio.run(main())
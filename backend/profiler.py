@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Opt-in sampling profiler for single requests. A request is profiled when it
+# carries a valid signed X-Debug-Profile header or is picked by the sample rate;
+# every other request only pays for that check. While a request is profiled, a
+# thread samples the event loop thread's stack and keeps the samples taken while
+# that request's coroutine was running; the rest are counted as "(not running)",
+# which is time spent awaiting I/O or running other requests.
+
+PROFILE_HEADER = b"x-debug-profile"
+NOT_RUNNING = ("(not running)", "", 0)
+_PROFILE_ID = re.compile(r"^[0-9A-Za-z_-]+$")
+
+
+def sign_profile_token(secret, expires):
+    """Value for the X-Debug-Profile header, valid until the ``expires`` Unix time"""
+    signature = hmac.new(secret.encode(), str(int(expires)).encode(), hashlib.sha256).hexdigest()
+    return f"{int(expires)}.{signature}"
+
+
+def verify_profile_token(secret, token, now=None):
+    expires = token.partition(".")[0]
+    if not expires.isdigit() or int(expires) < (now or time.time()):
+        return False
+    return hmac.compare_digest(sign_profile_token(secret, int(expires)), token)
+
+
+class StackSampler:
+    """Samples one thread's stack, attributing samples to the part below ``anchor``"""
+
+    def __init__(self, thread_id, anchor, interval):
+        self.thread_id = thread_id
+        self.anchor = anchor
+        self.interval = interval
+        # stack -> [samples, seconds]; samples come further apart than ``interval`` while
+        # the profiled thread holds the GIL, so each one is weighted by the time it covers
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self.sample(sys._current_frames().get(self.thread_id), now - last)
+            last = now
+
+    def sample(self, frame, seconds):
+        stack = []
+        while frame is not None and frame is not self.anchor:
+            code = frame.f_code
+            stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        key = tuple(reversed(stack)) if frame is not None else (NOT_RUNNING,)
+        totals = self.counts.setdefault(key, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+
+def collapsed_stacks(counts):
+    """Brendan Gregg's collapsed format: one "frame;frame;frame count" line per stack"""
+    lines = []
+    for stack, (count, _) in sorted(counts.items(), key=lambda item: -item[1][0]):
+        names = [f"{name} ({os.path.basename(file)}:{line})" if file else name for name, file, line in stack]
+        lines.append(f"{';'.join(names) or '(request)'} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(counts, name):
+    """A speedscope "sampled" profile; identical stacks are merged and weighted by duration"""
+    frame_ids = {}
+    samples = []
+    weights = []
+    for stack, (_, seconds) in counts.items():
+        samples.append([frame_ids.setdefault(frame, len(frame_ids)) for frame in stack])
+        weights.append(round(seconds * 1000, 3))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [
+            {"name": name_, "file": file, "line": line} if file else {"name": name_}
+            for name_, file, line in frame_ids
+        ]},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "dream-journal-profiler",
+    }
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their profiles in ``directory``"""
+
+    def __init__(self, directory, sample_rate=0.0, secret="", interval=0.005, keep=50):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.interval = interval
+        self.keep = keep
+
+    def wants(self, headers):
+        if self.secret:
+            for key, value in headers:
+                if key == PROFILE_HEADER:
+                    return verify_profile_token(self.secret, value.decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, profile_id, meta, counts):
+        """Write the profile files and drop the oldest beyond ``keep`` (blocking)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{meta['method']} {meta['route']} ({meta['duration_ms']} ms)"
+        (self.directory / f"{profile_id}.speedscope.json").write_text(
+            json.dumps(speedscope_profile(counts, name))
+        )
+        (self.directory / f"{profile_id}.collapsed.txt").write_text(collapsed_stacks(counts))
+        (self.directory / f"{profile_id}.meta.json").write_text(json.dumps(meta))
+        for old in self.list()[self.keep:]:
+            for suffix in (".speedscope.json", ".collapsed.txt", ".meta.json"):
+                (self.directory / f"{old['id']}{suffix}").unlink(missing_ok=True)
+
+    def list(self):
+        """Stored profiles' metadata, newest first"""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in self.directory.glob("*.meta.json"):
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda meta: meta["created_at"], reverse=True)
+
+    def path(self, profile_id, fmt):
+        """File of a stored profile in ``fmt`` (speedscope or collapsed), or None"""
+        suffix = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}.get(fmt)
+        if suffix is None or not _PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.is_file() else None
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling the requests RequestProfiler picks; the id goes out as X-Profile-Id"""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        # This coroutine's frame sits on the loop thread's stack exactly while this request runs
+        sampler = StackSampler(threading.get_ident(), sys._getframe(), self.profiler.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "route": route,
+                "path": scope["path"],
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "samples": sum(count for count, _ in sampler.counts.values()),
+                "created_at": time.time(),
+            }
+            try:
+                await asyncio.to_thread(self.profiler.save, profile_id, meta, sampler.counts)
+            except Exception as e:
+                logger.error(f"Error saving profile {profile_id}: {str(e)}")
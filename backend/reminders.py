@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Server-side dream reminders. Every enabled reminder carries ``reminder_bucket``,
+# the UTC minute of day its next occurrence falls on. The scheduler only ever
+# loads the buckets about to come due (one indexed query per minute), keeps those
+# due times in a min-heap and hands due reminders to a notifier in batches.
+# Buckets drift when a time zone changes its UTC offset; they are corrected as
+# reminders are loaded and sent.
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_reminder_time(value):
+    """Minutes since local midnight for an HH:MM string"""
+    try:
+        hours, minutes = (int(part) for part in value.split(":"))
+    except (ValueError, AttributeError):
+        raise ValueError("reminder_time must be HH:MM")
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("reminder_time must be HH:MM")
+    return hours * 60 + minutes
+
+
+def parse_timezone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+
+def next_occurrence(reminder_time, tz_name, now):
+    """The next UTC instant after ``now`` at which it is ``reminder_time`` in ``tz_name``"""
+    minute = parse_reminder_time(reminder_time)
+    tz = parse_timezone(tz_name)
+    local_now = now.astimezone(tz)
+    day = local_now.date()
+    for _ in range(3):
+        candidate = datetime(day.year, day.month, day.day, minute // 60, minute % 60, tzinfo=tz)
+        if candidate > local_now:
+            return candidate.astimezone(timezone.utc)
+        day += timedelta(days=1)
+    raise ValueError("No upcoming reminder time")
+
+
+def utc_bucket(moment):
+    return moment.hour * 60 + moment.minute
+
+
+def reminder_bucket(settings, now):
+    """``reminder_bucket`` for a settings document, or None when its reminder is off"""
+    if not settings.get("reminder_enabled"):
+        return None
+    due = next_occurrence(settings.get("reminder_time", "08:00"), settings.get("reminder_timezone", "UTC"), now)
+    return utc_bucket(due)
+
+
+class Reminder:
+    def __init__(self, user_id, due, reminder_time, tz_name):
+        self.user_id = user_id
+        self.due = due
+        self.reminder_time = reminder_time
+        self.tz_name = tz_name
+
+
+class LogNotifier:
+    """Local stand-in that logs reminders instead of delivering them"""
+
+    async def send(self, reminders):
+        for reminder in reminders:
+            logger.info(f"Reminder for user {reminder.user_id} ({reminder.reminder_time} {reminder.tz_name})")
+
+
+NOTIFIERS = {"log": LogNotifier}
+
+
+def create_notifier(name=None):
+    name = name or os.environ.get('REMINDER_NOTIFIER', 'log')
+    if name not in NOTIFIERS:
+        raise ValueError(f"Unknown reminder notifier: {name}")
+    return NOTIFIERS[name]()
+
+
+class ReminderScheduler:
+    def __init__(self, settings_collection, notifier, lookahead_minutes=2, batch_size=500):
+        self.settings = settings_collection
+        self.notifier = notifier
+        self.lookahead = timedelta(minutes=lookahead_minutes)
+        self.batch_size = batch_size
+        self.running = False
+        self._heap = []
+        self._versions = {}
+        self._counter = 0
+        self._loaded_until = None
+
+    def __len__(self):
+        return len(self._versions)
+
+    def _schedule(self, reminder):
+        # Only the latest entry per user is live; older heap entries are skipped when popped
+        self._counter += 1
+        self._versions[reminder.user_id] = self._counter
+        heapq.heappush(self._heap, (reminder.due, reminder.user_id, self._counter, reminder))
+
+    def update(self, user_id, settings, now=None):
+        """Apply a settings change: drop any queued reminder and requeue it if due in the loaded window"""
+        if not self.running:
+            return
+        self._versions.pop(user_id, None)
+        if not settings.get("reminder_enabled") or self._loaded_until is None:
+            return
+        now = now or datetime.now(timezone.utc)
+        reminder_time = settings.get("reminder_time", "08:00")
+        tz_name = settings.get("reminder_timezone", "UTC")
+        due = next_occurrence(reminder_time, tz_name, now)
+        if due <= self._loaded_until:
+            self._schedule(Reminder(user_id, due, reminder_time, tz_name))
+
+    async def load(self, now):
+        """Queue reminders whose bucket falls between the loaded edge and now + lookahead"""
+        start = self._loaded_until or now.replace(second=0, microsecond=0) - timedelta(minutes=1)
+        end = now + self.lookahead
+        minutes = []
+        moment = start + timedelta(minutes=1)
+        while moment <= end and len(minutes) < MINUTES_PER_DAY:
+            minutes.append(utc_bucket(moment))
+            moment += timedelta(minutes=1)
+        if not minutes:
+            return 0
+        loaded_until = start + timedelta(minutes=len(minutes))
+        loaded_until = loaded_until.replace(second=59, microsecond=999999)
+
+        docs = await self.settings.find(
+            {"reminder_enabled": True, "reminder_bucket": {"$in": minutes}},
+            {"_id": 0, "user_id": 1, "reminder_time": 1, "reminder_timezone": 1, "reminder_bucket": 1}
+        ).to_list(None)
+        fixes = []
+        queued = 0
+        for doc in docs:
+            # One malformed document must not hold back everyone else's reminders
+            try:
+                reminder_time = doc.get("reminder_time", "08:00")
+                tz_name = doc.get("reminder_timezone", "UTC")
+                due = next_occurrence(reminder_time, tz_name, start)
+                if due <= loaded_until:
+                    self._schedule(Reminder(doc["user_id"], due, reminder_time, tz_name))
+                    queued += 1
+                if utc_bucket(due) != doc.get("reminder_bucket"):
+                    fixes.append(UpdateOne({"user_id": doc["user_id"]}, {"$set": {"reminder_bucket": utc_bucket(due)}}))
+            except Exception as e:
+                logger.error(f"Skipping reminder for user {doc.get('user_id')}: {str(e)}")
+        if fixes:
+            await self.settings.bulk_write(fixes, ordered=False)
+        self._loaded_until = loaded_until
+        return queued
+
+    def due(self, now):
+        reminders = []
+        while self._heap and self._heap[0][0] <= now:
+            _, user_id, version, reminder = heapq.heappop(self._heap)
+            if self._versions.get(user_id) == version:
+                del self._versions[user_id]
+                reminders.append(reminder)
+        return reminders
+
+    async def dispatch(self, now):
+        reminders = self.due(now)
+        for i in range(0, len(reminders), self.batch_size):
+            batch = reminders[i:i + self.batch_size]
+            try:
+                await self.notifier.send(batch)
+            except Exception as e:
+                logger.error(f"Error sending {len(batch)} reminders: {str(e)}")
+        # Move each sent reminder's bucket to its next occurrence, which differs
+        # from today's only across a UTC offset change
+        fixes = []
+        for reminder in reminders:
+            next_due = next_occurrence(reminder.reminder_time, reminder.tz_name, reminder.due)
+            if utc_bucket(next_due) != utc_bucket(reminder.due):
+                fixes.append(UpdateOne({"user_id": reminder.user_id}, {"$set": {"reminder_bucket": utc_bucket(next_due)}}))
+        if fixes:
+            await self.settings.bulk_write(fixes, ordered=False)
+        return len(reminders)
+
+    async def run(self, interval=5):
+        self.running = True
+        try:
+            while True:
+                now = datetime.now(timezone.utc)
+                try:
+                    await self.load(now)
+                    await self.dispatch(now)
+                except Exception as e:
+                    logger.error(f"Error in reminder scheduler: {str(e)}")
+                await asyncio.sleep(interval)
+        finally:
+            self.running = False
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from storage import create_storage
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def main():
+        db = create_storage()
+        scheduler = ReminderScheduler(
+            db.user_settings,
+            create_notifier(),
+            lookahead_minutes=int(os.environ.get('REMINDER_LOOKAHEAD_MINUTES', 2)),
+            batch_size=int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+        )
+        try:
+            await scheduler.run()
+        finally:
+            db.close()
+
+    asyncio.run(main())
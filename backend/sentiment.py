@@ -0,0 +1,128 @@
+import numpy as np
+
+# Offline lexicon scorer for dream tone. Every lexicon word has a token id; the
+# valence weights and emotion memberships are arrays indexed by that id, so a
+# batch of dreams is scored by flattening all tokens into one id array and
+# summing per dream with bincount. Id 0 is every word outside the lexicon.
+
+EMOTIONS = ["joy", "fear", "sadness", "anger", "surprise", "calm"]
+
+# word: (valence in [-1, 1], emotions)
+LEXICON = {
+    "happy": (0.8, ["joy"]), "joy": (0.9, ["joy"]), "joyful": (0.9, ["joy"]), "love": (0.8, ["joy"]),
+    "loved": (0.8, ["joy"]), "laugh": (0.7, ["joy"]), "laughing": (0.7, ["joy"]), "smile": (0.6, ["joy"]),
+    "smiling": (0.6, ["joy"]), "fun": (0.6, ["joy"]), "beautiful": (0.7, ["joy"]), "wonderful": (0.8, ["joy"]),
+    "amazing": (0.7, ["joy", "surprise"]), "excited": (0.6, ["joy", "surprise"]), "free": (0.6, ["joy"]),
+    "freedom": (0.7, ["joy"]), "flying": (0.3, ["joy"]), "soaring": (0.5, ["joy"]), "celebrate": (0.7, ["joy"]),
+    "party": (0.5, ["joy"]), "hug": (0.6, ["joy", "calm"]), "friend": (0.4, ["joy"]), "friends": (0.4, ["joy"]),
+    "warm": (0.4, ["calm"]), "bright": (0.4, ["joy"]), "sunny": (0.5, ["joy", "calm"]), "gift": (0.5, ["joy"]),
+    "peaceful": (0.7, ["calm"]), "peace": (0.7, ["calm"]), "calm": (0.6, ["calm"]), "quiet": (0.3, ["calm"]),
+    "safe": (0.6, ["calm"]), "relaxed": (0.6, ["calm"]), "gentle": (0.5, ["calm"]), "floating": (0.3, ["calm"]),
+    "serene": (0.7, ["calm"]), "comfort": (0.5, ["calm"]), "home": (0.3, ["calm"]), "garden": (0.3, ["calm"]),
+    "afraid": (-0.7, ["fear"]), "scared": (-0.7, ["fear"]), "fear": (-0.7, ["fear"]), "terrified": (-0.9, ["fear"]),
+    "terror": (-0.9, ["fear"]), "panic": (-0.8, ["fear"]), "nightmare": (-0.8, ["fear"]), "monster": (-0.6, ["fear"]),
+    "chased": (-0.6, ["fear"]), "chasing": (-0.5, ["fear"]), "hiding": (-0.4, ["fear"]), "trapped": (-0.7, ["fear"]),
+    "falling": (-0.4, ["fear"]), "fell": (-0.3, ["fear"]), "drowning": (-0.8, ["fear"]), "dark": (-0.3, ["fear"]),
+    "darkness": (-0.4, ["fear"]), "lost": (-0.5, ["fear", "sadness"]), "anxious": (-0.6, ["fear"]),
+    "danger": (-0.6, ["fear"]), "dangerous": (-0.6, ["fear"]), "creepy": (-0.6, ["fear"]), "ghost": (-0.4, ["fear"]),
+    "screaming": (-0.6, ["fear", "anger"]), "scream": (-0.6, ["fear"]), "attack": (-0.7, ["fear", "anger"]),
+    "attacked": (-0.7, ["fear"]), "blood": (-0.6, ["fear"]), "crash": (-0.6, ["fear"]), "late": (-0.3, ["fear"]),
+    "sad": (-0.7, ["sadness"]), "crying": (-0.6, ["sadness"]), "cried": (-0.6, ["sadness"]), "tears": (-0.5, ["sadness"]),
+    "alone": (-0.5, ["sadness"]), "lonely": (-0.6, ["sadness"]), "death": (-0.7, ["sadness", "fear"]),
+    "dead": (-0.7, ["sadness", "fear"]), "dying": (-0.7, ["sadness", "fear"]), "funeral": (-0.6, ["sadness"]),
+    "grief": (-0.8, ["sadness"]), "miss": (-0.3, ["sadness"]), "missed": (-0.3, ["sadness"]), "gone": (-0.3, ["sadness"]),
+    "broken": (-0.5, ["sadness"]), "empty": (-0.4, ["sadness"]), "regret": (-0.6, ["sadness"]), "hurt": (-0.6, ["sadness"]),
+    "angry": (-0.7, ["anger"]), "anger": (-0.7, ["anger"]), "furious": (-0.8, ["anger"]), "fight": (-0.5, ["anger"]),
+    "fighting": (-0.5, ["anger"]), "argued": (-0.5, ["anger"]), "argument": (-0.5, ["anger"]), "yelling": (-0.6, ["anger"]),
+    "hate": (-0.8, ["anger"]), "annoyed": (-0.4, ["anger"]), "frustrated": (-0.5, ["anger"]), "betrayed": (-0.7, ["anger", "sadness"]),
+    "surprised": (0.2, ["surprise"]), "suddenly": (0.0, ["surprise"]), "strange": (-0.1, ["surprise"]),
+    "weird": (-0.1, ["surprise"]), "unexpected": (0.0, ["surprise"]), "shocked": (-0.3, ["surprise"]),
+    "magic": (0.5, ["surprise", "joy"]), "magical": (0.6, ["surprise", "joy"]), "mysterious": (0.0, ["surprise"]),
+}
+
+NEGATIONS = {"not", "no", "never", "wasn't", "didn't", "couldn't", "don't", "without", "nothing"}
+
+# Lowercased text keeps letters and apostrophes; every other ASCII character splits words
+_SPLIT = {i: " " for i in range(128) if not (chr(i).isalpha() or chr(i) == "'")}
+_SPLIT[ord("\u2019")] = "'"
+
+_WORD_IDS = {word: i + 1 for i, word in enumerate(LEXICON)}
+# Negations get negative ids so they can be spotted without another lookup
+_TOKEN_IDS = {**_WORD_IDS, **{word: -(i + 1) for i, word in enumerate(NEGATIONS)}}
+VALENCE = np.zeros(len(LEXICON) + 1)
+EMOTION_WEIGHTS = np.zeros((len(LEXICON) + 1, len(EMOTIONS)))
+for _word, (_valence, _emotions) in LEXICON.items():
+    VALENCE[_WORD_IDS[_word]] = _valence
+    for _emotion in _emotions:
+        EMOTION_WEIGHTS[_WORD_IDS[_word], EMOTIONS.index(_emotion)] = 1.0
+
+
+def _token_ids(text, lookup=_TOKEN_IDS.get):
+    return [lookup(t, 0) for t in text.lower().translate(_SPLIT).split()]
+
+
+def score_texts(texts):
+    """Valence and dominant emotion for each text, scored as one vectorized batch"""
+    ids = []
+    lengths = []
+    for text in texts:
+        tokens = _token_ids(text)
+        ids.extend(tokens)
+        lengths.append(len(tokens))
+    if not texts:
+        return []
+    ids = np.asarray(ids, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    docs = np.repeat(np.arange(len(texts)), lengths)
+
+    # A negation flips the polarity of the next token in the same text
+    negated = np.zeros(len(ids), dtype=bool)
+    if len(ids) > 1:
+        negated[1:] = (ids[:-1] < 0) & (docs[1:] == docs[:-1])
+    ids = np.maximum(ids, 0)
+    valence = np.where(negated, -VALENCE[ids], VALENCE[ids])
+    hits = np.bincount(docs, weights=(ids > 0), minlength=len(texts))
+    totals = np.bincount(docs, weights=valence, minlength=len(texts))
+    # Negated emotion words ("not afraid") count towards no emotion
+    emotions = EMOTION_WEIGHTS[ids] * ~negated[:, None]
+    emotion_totals = np.column_stack([
+        np.bincount(docs, weights=emotions[:, e], minlength=len(texts)) for e in range(len(EMOTIONS))
+    ])
+
+    scores = []
+    for i in range(len(texts)):
+        if hits[i] == 0:
+            scores.append({"valence": 0.0, "emotion": None, "words": 0})
+            continue
+        dominant = int(emotion_totals[i].argmax())
+        scores.append({
+            "valence": round(float(totals[i] / hits[i]), 3),
+            "emotion": EMOTIONS[dominant] if emotion_totals[i, dominant] > 0 else None,
+            "words": int(hits[i])
+        })
+    return scores
+
+
+def score_dream(title, description):
+    return score_texts([f"{title}\n{description}"])[0]
+
+
+def monthly_tone(dreams, months=12):
+    """Average valence and most frequent emotion per month, for dreams carrying a sentiment"""
+    by_month = {}
+    for dream in dreams:
+        month = by_month.setdefault(dream["date"][:7], {"valence": 0.0, "scored": 0, "emotions": {}})
+        sentiment = dream["sentiment"]
+        if sentiment["words"]:
+            month["valence"] += sentiment["valence"]
+            month["scored"] += 1
+        if sentiment["emotion"]:
+            month["emotions"][sentiment["emotion"]] = month["emotions"].get(sentiment["emotion"], 0) + 1
+    return [
+        {
+            "month": m,
+            "valence": round(t["valence"] / t["scored"], 3) if t["scored"] else 0.0,
+            "dominant_emotion": max(t["emotions"], key=t["emotions"].get) if t["emotions"] else None
+        }
+        for m, t in sorted(by_month.items())
+    ][-months:]
@@ -1,39 +1,225 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+import time
+# Importing this module is the first startup phase (see startup_timings at the bottom)
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import importlib
 import logging
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import List, Optional, Literal
 import uuid
-from datetime import datetime, timezone
+import hashlib
+from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from pymongo import InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+from storage import create_storage
+from migrations import run_migrations
+from feed import PublicFeed, encode_cursor, decode_cursor
+from cache import LRUCache
+from counters import ViewCounterBuffer
+from trending import TrendingService, WINDOWS as TRENDING_WINDOWS
+from vocab import VocabularyCache, KINDS as VOCAB_KINDS
+from dedup import signature, signature_writes, find_near_duplicate
+from cooccurrence import cooccurrence
+from sentiment import score_dream, monthly_tone
+from analytics import (
+    AnalyticsExecutor, pack_texts, text_patterns, journal_streaks, top_counts, distinct_count,
+    achievement_progress, month_buckets, ACHIEVEMENTS, DREAM_SYMBOLS, STOP_WORDS
+)
+from digest import build_digest_prompt, estimate_tokens
+from reminders import ReminderScheduler, create_notifier, reminder_bucket, parse_reminder_time, parse_timezone
+from events import EventBus, create_broker, format_sse
+from metrics import AppMetrics, MetricsMiddleware, DbBudgetMiddleware, parse_budgets
+from profiler import RequestProfiler, ProfilerMiddleware, sign_profile_token
+from slowqueries import SlowQueryLog
+from shedding import AdmissionMiddleware, CostClass, check_rate_limits, create_rate_limit_store, bearer_token
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# The LLM SDK is imported on first use (see load_llm): it is slow to import and most
+# workers' requests never reach it. LLM_PROVIDER=fake is an offline stand-in for
+# load tests and local runs.
+LLM_MODULE = 'fakellm' if os.environ.get('LLM_PROVIDER', 'emergent') == 'fake' else 'emergentintegrations.llm.chat'
+llm_module = None
+
+# Request, database and LLM metrics, served at /metrics
+metrics = AppMetrics()
+
+# Mongo commands slower than SLOW_QUERY_MS, grouped by shape and explained in the background
+slow_queries = SlowQueryLog(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', 100)),
+    max_shapes=int(os.environ.get('SLOW_QUERY_SHAPES', 500))
+)
+
+# Storage engine (MongoDB by default; STORAGE_BACKEND=sqlite|memory for single-node and CI runs).
+# Motor connects lazily: the pool is opened and warmed by the ping at startup, and
+# keeps MONGO_MIN_POOL_SIZE connections open from then on.
+db = create_storage(
+    event_listeners=[metrics.mongo_listener, slow_queries.listener],
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 10)),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+)
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'default_secret')
 JWT_ALGORITHM = "HS256"
+# Event stream tokens travel in the URL, so they only open /api/events and expire quickly
+STREAM_TOKEN_SCOPE = "events"
+STREAM_TOKEN_TTL_SECONDS = int(os.environ.get('STREAM_TOKEN_TTL_SECONDS', 60))
+
+# Sync cursors overlap by this much so writes committed just after a sync are not missed
+SYNC_CURSOR_OVERLAP_SECONDS = 5
+
+# Startup phase durations in milliseconds, logged once started and served by /ready
+startup_timings = {}
+app_ready = False
+READY_PING_TIMEOUT_SECONDS = float(os.environ.get('READY_PING_TIMEOUT_SECONDS', 2))
+started_at = time.time()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_app()
+    try:
+        yield
+    finally:
+        await stop_app()
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create router with /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Explore feed of recent public dreams, served from memory
+public_feed = PublicFeed(int(os.environ.get('PUBLIC_FEED_SIZE', 1000)))
+PUBLIC_FEED_REFRESH_SECONDS = int(os.environ.get('PUBLIC_FEED_REFRESH_SECONDS', 60))
+
+# Pre-serialized payloads for shared dream links, keyed by share_id. The TTL bounds how
+# long another worker's unshare can go unnoticed here.
+share_cache = LRUCache(
+    maxsize=int(os.environ.get('SHARE_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('SHARE_CACHE_TTL_SECONDS', 30))
+)
+SHARE_CACHE_CONTROL = f"public, max-age={os.environ.get('SHARE_CACHE_MAX_AGE', 60)}"
+
+# Shared dream views are counted in memory and flushed periodically in one bulk write
+view_counter = ViewCounterBuffer()
+VIEW_COUNT_FLUSH_SECONDS = int(os.environ.get('VIEW_COUNT_FLUSH_SECONDS', 10))
+# Most viewed pages; dropped on any public dream write here, the TTL covers view counts and other workers
+most_viewed_cache = LRUCache(maxsize=64, ttl=int(os.environ.get('MOST_VIEWED_CACHE_TTL_SECONDS', 10)))
+
+# Trending tags and themes across shared dreams, kept as in-memory sketches
+trending = TrendingService()
+TRENDING_REBUILD_SECONDS = int(os.environ.get('TRENDING_REBUILD_SECONDS', 300))
+
+# Per-user tag/theme prefix indexes for autocomplete. Writes on this worker update them
+# in place; the TTL bounds how long writes handled by another worker go unseen.
+vocabularies = VocabularyCache(
+    maxsize=int(os.environ.get('VOCAB_CACHE_SIZE', 1000)),
+    ttl=int(os.environ.get('VOCAB_CACHE_TTL_SECONDS', 300))
+)
+
+# Analysis results keyed by user and the version of their dream data they were built from
+analysis_cache = LRUCache(maxsize=int(os.environ.get('ANALYSIS_CACHE_SIZE', 1000)))
+ANALYSIS_THREAD_THRESHOLD = int(os.environ.get('ANALYSIS_THREAD_THRESHOLD', 500))
+
+# Text analytics over journals above ANALYTICS_OFFLOAD_CHARS run in worker processes
+analytics_executor = AnalyticsExecutor(
+    workers=int(os.environ.get('ANALYTICS_WORKERS', 2)),
+    threshold=int(os.environ.get('ANALYTICS_OFFLOAD_CHARS', 256 * 1024))
+)
+
+# Cross-dream digests: one LLM call per user and period, stored until the period's dreams change
+DIGEST_PERIODS = {"week": 7, "month": 30}
+DIGEST_PROMPT_TOKENS = int(os.environ.get('DIGEST_PROMPT_TOKENS', 6000))
+digests_in_flight = {}
+
+# Server-side reminders; run the scheduler in exactly one process (REMINDER_SCHEDULER=1)
+# or as its own service with `python reminders.py`
+reminder_scheduler = ReminderScheduler(
+    db.user_settings,
+    create_notifier(),
+    lookahead_minutes=int(os.environ.get('REMINDER_LOOKAHEAD_MINUTES', 2)),
+    batch_size=int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+)
+
+# Live per-user events pushed over /api/events. EVENT_BROKER=storage relays them
+# between workers through the storage backend; the default only serves this process.
+event_bus = EventBus(create_broker(db), queue_size=int(os.environ.get('EVENT_QUEUE_SIZE', 100)))
+EVENT_HEARTBEAT_SECONDS = int(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+
+# Achievements are recalculated once per burst of dream writes, this long after the first
+ACHIEVEMENT_CHECK_DELAY_SECONDS = float(os.environ.get('ACHIEVEMENT_CHECK_DELAY_SECONDS', 1))
+achievement_checks = {}
+
+# Request profiles: requests carrying a valid signed X-Debug-Profile header, plus a
+# PROFILE_SAMPLE_RATE fraction of all requests. Admins (ADMIN_EMAILS) can fetch them.
+profiler = RequestProfiler(
+    os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    secret=os.environ.get('PROFILE_SECRET', ''),
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+    keep=int(os.environ.get('PROFILE_KEEP', 50))
+)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Admission control (off unless ADMISSION_CONTROL=1). Each route's cost class has its own
+# concurrency limit, so heavy routes queue among themselves and shed with 503 + Retry-After
+# once waits pass the class's max_wait; COST_CLASS_CONCURRENCY overrides the limits, e.g.
+# "heavy=16,llm=8". Each request also takes its class's tokens from the caller's per-user
+# and per-address buckets (429 when empty). RATE_LIMIT_STORE=storage shares the buckets
+# between workers. Client addresses come from uvicorn, which honours X-Forwarded-For only
+# from --forwarded-allow-ips proxies; behind any other proxy every client shares the proxy's
+# address bucket, so set RATE_LIMIT_IP_PER_MINUTE=0 there.
+cost_class_concurrency = parse_budgets(os.environ.get('COST_CLASS_CONCURRENCY', ''))
+COST_CLASSES = {
+    "default": CostClass(cost_class_concurrency.get("default", 256), max_wait=1.0, tokens=1),
+    "heavy": CostClass(cost_class_concurrency.get("heavy", 8), max_wait=2.0, tokens=5),
+    "auth": CostClass(cost_class_concurrency.get("auth", 4), max_wait=2.0, tokens=10),
+    "llm": CostClass(cost_class_concurrency.get("llm", 4), max_wait=5.0, tokens=20),
+    # Event streams stay open for the whole session; they are only rate limited
+    "stream": CostClass(0, tokens=1),
+}
+ROUTE_COST_CLASSES = {
+    "POST /api/auth/register": "auth",
+    "POST /api/auth/login": "auth",
+    "POST /api/dreams/{dream_id}/insight": "llm",
+    "POST /api/insights/digest": "llm",
+    "GET /api/analysis/patterns": "heavy",
+    "GET /api/analysis/cooccurrence": "heavy",
+    "GET /api/achievements": "heavy",
+    "GET /api/achievements/check": "heavy",
+    "GET /api/dreams/search": "heavy",
+    "POST /api/dreams/batch": "heavy",
+    "GET /api/events": "stream",
+}
+RATE_LIMIT_USER = (
+    float(os.environ.get('RATE_LIMIT_USER_PER_MINUTE', 600)) / 60,
+    int(os.environ.get('RATE_LIMIT_USER_BURST', 120))
+)
+RATE_LIMIT_IP = (
+    float(os.environ.get('RATE_LIMIT_IP_PER_MINUTE', 1200)) / 60,
+    int(os.environ.get('RATE_LIMIT_IP_BURST', 300))
+)
+rate_limit_store = create_rate_limit_store(db)
+
+background_tasks = []
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -93,17 +279,60 @@ class DreamResponse(BaseModel):
     created_at: str
     updated_at: str
 
+class DreamCreateResponse(DreamResponse):
+    possible_duplicate_of: Optional[str] = None
+
+class DreamBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    idempotency_key: str
+    dream_id: Optional[str] = None
+    data: Optional[dict] = None
+
+class DreamBatchRequest(BaseModel):
+    operations: List[DreamBatchOperation] = Field(..., max_length=500)
+
+class DreamBatchResult(BaseModel):
+    idempotency_key: str
+    op: str
+    status: str  # applied, duplicate, not_found, invalid or conflict (not applied, retry)
+    dream_id: Optional[str] = None
+    error: Optional[str] = None
+
+class DreamBatchResponse(BaseModel):
+    results: List[DreamBatchResult]
+    newly_unlocked: List[str] = []
+
+class DreamTombstone(BaseModel):
+    id: str
+    deleted_at: str
+
+class StoredAchievement(BaseModel):
+    achievement_id: str
+    unlocked: bool = False
+    unlocked_at: Optional[str] = None
+    progress: int = 0
+
 class UserSettingsUpdate(BaseModel):
     reminder_enabled: Optional[bool] = None
     reminder_time: Optional[str] = None  # HH:MM format
+    reminder_timezone: Optional[str] = None  # IANA name, e.g. Europe/Paris
     streak_freeze_count: Optional[int] = None
 
 class UserSettingsResponse(BaseModel):
     reminder_enabled: bool = False
     reminder_time: str = "08:00"
+    reminder_timezone: str = "UTC"
     streak_freeze_count: int = 0
     streak_freezes_used: int = 0
 
+class SyncResponse(BaseModel):
+    dreams: List[DreamResponse]
+    deleted_dreams: List[DreamTombstone]
+    settings: Optional[UserSettingsResponse] = None
+    achievements: List[StoredAchievement]
+    cursor: str
+    full_sync: bool = False
+
 class ShareDreamRequest(BaseModel):
     dream_id: str
 
@@ -119,6 +348,7 @@ class PublicDreamResponse(BaseModel):
     ai_insight: Optional[str] = None
     author_name: str
     created_at: str
+    view_count: int = 0
 
 class Achievement(BaseModel):
     id: str
@@ -136,26 +366,6 @@ class AchievementsResponse(BaseModel):
     total_unlocked: int
     total_achievements: int
 
-# Achievement definitions
-ACHIEVEMENTS = [
-    {"id": "first_dream", "name": "Dream Catcher", "description": "Record your first dream", "icon": "🌙", "category": "basics", "target": 1},
-    {"id": "dreams_10", "name": "Dreamer", "description": "Record 10 dreams", "icon": "✨", "category": "dreams", "target": 10},
-    {"id": "dreams_50", "name": "Dream Keeper", "description": "Record 50 dreams", "icon": "📚", "category": "dreams", "target": 50},
-    {"id": "dreams_100", "name": "Dream Master", "description": "Record 100 dreams", "icon": "🏆", "category": "dreams", "target": 100},
-    {"id": "streak_7", "name": "Week Warrior", "description": "Maintain a 7-day streak", "icon": "🔥", "category": "streaks", "target": 7},
-    {"id": "streak_30", "name": "Monthly Mystic", "description": "Maintain a 30-day streak", "icon": "⚡", "category": "streaks", "target": 30},
-    {"id": "streak_100", "name": "Century Dreamer", "description": "Maintain a 100-day streak", "icon": "💫", "category": "streaks", "target": 100},
-    {"id": "lucid_1", "name": "Awakened", "description": "Record your first lucid dream", "icon": "👁️", "category": "lucid", "target": 1},
-    {"id": "lucid_10", "name": "Lucid Explorer", "description": "Record 10 lucid dreams", "icon": "🔮", "category": "lucid", "target": 10},
-    {"id": "lucid_25", "name": "Dream Walker", "description": "Record 25 lucid dreams", "icon": "🌟", "category": "lucid", "target": 25},
-    {"id": "insight_1", "name": "Seeker", "description": "Get your first AI dream insight", "icon": "🔍", "category": "insights", "target": 1},
-    {"id": "insight_10", "name": "Enlightened", "description": "Get 10 AI dream insights", "icon": "💡", "category": "insights", "target": 10},
-    {"id": "share_1", "name": "Open Book", "description": "Share your first dream publicly", "icon": "📖", "category": "social", "target": 1},
-    {"id": "share_5", "name": "Storyteller", "description": "Share 5 dreams publicly", "icon": "📢", "category": "social", "target": 5},
-    {"id": "themes_5", "name": "Pattern Finder", "description": "Use 5 different themes", "icon": "🎭", "category": "exploration", "target": 5},
-    {"id": "tags_10", "name": "Tag Master", "description": "Create 10 unique tags", "icon": "🏷️", "category": "exploration", "target": 10},
-]
-
 class InsightRequest(BaseModel):
     dream_id: str
 
@@ -163,6 +373,14 @@ class InsightResponse(BaseModel):
     dream_id: str
     insight: str
 
+class DigestResponse(BaseModel):
+    period: str
+    start_date: str
+    end_date: str
+    dream_count: int
+    digest: str
+    generated_at: str
+
 # ============== HELPER FUNCTIONS ==============
 
 def hash_password(password: str) -> str:
@@ -178,12 +396,36 @@ def create_token(user_id: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def create_stream_token(user_id: str) -> str:
+    payload = {
+        "user_id": user_id,
+        "scope": STREAM_TOKEN_SCOPE,
+        "exp": datetime.now(timezone.utc).timestamp() + STREAM_TOKEN_TTL_SECONDS
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await user_from_token(credentials.credentials)
+
+async def get_stream_user(token: Optional[str] = None, credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Like get_current_user, but also takes a stream token as ?token= since EventSource cannot send headers"""
+    if credentials:
+        return await user_from_token(credentials.credentials)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await user_from_token(token, scope=STREAM_TOKEN_SCOPE)
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def user_from_token(token: str, scope: Optional[str] = None) -> dict:
+    """The user a token belongs to; tokens with a scope are only accepted where that scope is asked for"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
-        if not user_id:
+        if not user_id or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Invalid token")
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if not user:
@@ -194,6 +436,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def request_user_id(scope) -> Optional[str]:
+    """User id in the request's token without the database lookup, for rate limiting; None if absent or invalid"""
+    token = bearer_token(scope)
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("user_id")
+    except jwt.InvalidTokenError:
+        return None
+
 # ============== AUTH ROUTES ==============
 
 @api_router.post("/auth/register", response_model=TokenResponse)
@@ -208,7 +460,8 @@ async def register(user_data: UserCreate):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        # bcrypt is slow on purpose; in a thread it does not hold up every other request
+        "password_hash": await asyncio.to_thread(hash_password, user_data.password),
         "name": user_data.name,
         "created_at": now
     }
@@ -224,7 +477,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(login_data: UserLogin):
     user = await db.users.find_one({"email": login_data.email}, {"_id": 0})
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user or not await asyncio.to_thread(verify_password, login_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     token = create_token(user["id"])
@@ -252,6 +505,7 @@ async def get_settings(current_user: dict = Depends(get_current_user)):
     return UserSettingsResponse(
         reminder_enabled=settings.get("reminder_enabled", False),
         reminder_time=settings.get("reminder_time", "08:00"),
+        reminder_timezone=settings.get("reminder_timezone", "UTC"),
         streak_freeze_count=settings.get("streak_freeze_count", 0),
         streak_freezes_used=settings.get("streak_freezes_used", 0)
     )
@@ -260,7 +514,21 @@ async def get_settings(current_user: dict = Depends(get_current_user)):
 async def update_settings(settings_data: UserSettingsUpdate, current_user: dict = Depends(get_current_user)):
     update_data = {k: v for k, v in settings_data.model_dump().items() if v is not None}
     
+    reminder_changed = bool(update_data.keys() & {"reminder_enabled", "reminder_time", "reminder_timezone"})
+    if reminder_changed:
+        try:
+            if "reminder_time" in update_data:
+                parse_reminder_time(update_data["reminder_time"])
+            if "reminder_timezone" in update_data:
+                parse_timezone(update_data["reminder_timezone"])
+            # Index the reminder under the UTC minute of its next occurrence for the scheduler
+            existing = await db.user_settings.find_one({"user_id": current_user["id"]}, {"_id": 0}) or {}
+            update_data["reminder_bucket"] = reminder_bucket({**existing, **update_data}, datetime.now(timezone.utc))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     if update_data:
+        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
         await db.user_settings.update_one(
             {"user_id": current_user["id"]},
             {"$set": update_data},
@@ -268,9 +536,12 @@ async def update_settings(settings_data: UserSettingsUpdate, current_user: dict
         )
     
     settings = await db.user_settings.find_one({"user_id": current_user["id"]}, {"_id": 0})
+    if reminder_changed:
+        reminder_scheduler.update(current_user["id"], settings)
     return UserSettingsResponse(
         reminder_enabled=settings.get("reminder_enabled", False),
         reminder_time=settings.get("reminder_time", "08:00"),
+        reminder_timezone=settings.get("reminder_timezone", "UTC"),
         streak_freeze_count=settings.get("streak_freeze_count", 0),
         streak_freezes_used=settings.get("streak_freezes_used", 0)
     )
@@ -288,7 +559,10 @@ async def use_streak_freeze(current_user: dict = Depends(get_current_user)):
         {"user_id": current_user["id"]},
         {
             "$inc": {"streak_freeze_count": -1, "streak_freezes_used": 1},
-            "$set": {"last_freeze_date": datetime.now(timezone.utc).strftime("%Y-%m-%d")}
+            "$set": {
+                "last_freeze_date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
         },
         upsert=True
     )
@@ -300,7 +574,7 @@ async def add_streak_freeze(current_user: dict = Depends(get_current_user)):
     """Add a streak freeze (earned by reaching milestones or purchased)"""
     await db.user_settings.update_one(
         {"user_id": current_user["id"]},
-        {"$inc": {"streak_freeze_count": 1}},
+        {"$inc": {"streak_freeze_count": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
         upsert=True
     )
     
@@ -309,14 +583,11 @@ async def add_streak_freeze(current_user: dict = Depends(get_current_user)):
 
 # ============== DREAM ROUTES ==============
 
-@api_router.post("/dreams", response_model=DreamResponse)
-async def create_dream(dream_data: DreamCreate, current_user: dict = Depends(get_current_user)):
-    dream_id = str(uuid.uuid4())
+def build_dream_doc(user_id: str, dream_data: DreamCreate, dream_id: Optional[str] = None) -> dict:
     now = datetime.now(timezone.utc).isoformat()
-    
-    dream_doc = {
-        "id": dream_id,
-        "user_id": current_user["id"],
+    return {
+        "id": dream_id or str(uuid.uuid4()),
+        "user_id": user_id,
         "title": dream_data.title,
         "description": dream_data.description,
         "date": dream_data.date,
@@ -325,13 +596,199 @@ async def create_dream(dream_data: DreamCreate, current_user: dict = Depends(get
         "is_lucid": dream_data.is_lucid,
         "is_public": dream_data.is_public,
         "ai_insight": None,
+        "simhash": signature(dream_data.title, dream_data.description),
+        "sentiment": score_dream(dream_data.title, dream_data.description),
+        "view_count": 0,
+        "shared_at": now if dream_data.is_public else None,
         "created_at": now,
         "updated_at": now
     }
+
+@api_router.post("/dreams", response_model=DreamCreateResponse)
+async def create_dream(dream_data: DreamCreate, strict: bool = False, current_user: dict = Depends(get_current_user)):
+    dream_doc = build_dream_doc(current_user["id"], dream_data)
+    
+    # Retries and copy-paste produce near-identical text; strict clients refuse those outright
+    duplicate = await find_near_duplicate(db.dream_signatures, current_user["id"], dream_doc["simhash"])
+    if duplicate and strict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "A very similar dream already exists", "possible_duplicate_of": duplicate[0]}
+        )
     
     await db.dreams.insert_one(dream_doc)
+    await update_dream_signatures(None, dream_doc)
+    dream_changed(None, dream_doc, current_user["name"])
     
-    return DreamResponse(**{k: v for k, v in dream_doc.items() if k != "_id"})
+    return DreamCreateResponse(
+        **{k: v for k, v in dream_doc.items() if k != "_id"},
+        possible_duplicate_of=duplicate[0] if duplicate else None
+    )
+
+@api_router.post("/dreams/batch", response_model=DreamBatchResponse)
+async def batch_dreams(batch: DreamBatchRequest, current_user: dict = Depends(get_current_user)):
+    """Apply an ordered list of offline-queued creates, edits and deletes in one round trip"""
+    user_id = current_user["id"]
+    operations = batch.operations
+    
+    # Keys already applied by an earlier (possibly interrupted) replay of this queue
+    keys = [op.idempotency_key for op in operations]
+    applied = await db.dream_mutations.find(
+        {"user_id": user_id, "idempotency_key": {"$in": keys}},
+        {"_id": 0, "idempotency_key": 1, "op": 1, "dream_id": 1}
+    ).to_list(None)
+    seen = {m["idempotency_key"]: m for m in applied}
+    
+    referenced = [op.dream_id for op in operations if op.dream_id]
+    existing = await db.dreams.find(
+        {"user_id": user_id, "id": {"$in": referenced}},
+        {"_id": 0}
+    ).to_list(None) if referenced else []
+    before = {d["id"]: d for d in existing}
+    is_public = {d["id"]: d["is_public"] for d in existing}
+    text = {d["id"]: (d["title"], d["description"]) for d in existing}
+    known_ids = set(before)
+    client_ids = {op.dream_id for op in operations if op.op == "create" and op.dream_id}
+    # Client-chosen ids for new dreams must not collide with another user's dream
+    create_ids = [op.dream_id for op in operations if op.op == "create" and op.dream_id and op.dream_id not in known_ids]
+    foreign_ids = {d["id"] for d in await db.dreams.find(
+        {"id": {"$in": create_ids}, "user_id": {"$ne": user_id}},
+        {"_id": 0, "id": 1}
+    ).to_list(None)} if create_ids else set()
+    
+    # One write per applied result, in operation order, with the dream it targets
+    writes = []
+    targets = []
+    results = []
+    now = datetime.now(timezone.utc).isoformat()
+    
+    for op in operations:
+        key = op.idempotency_key
+        if key in seen:
+            prior = seen[key]
+            results.append(DreamBatchResult(idempotency_key=key, op=prior.get("op", op.op), status="duplicate", dream_id=prior.get("dream_id")))
+            continue
+        
+        try:
+            if op.op == "create":
+                if op.dream_id and (op.dream_id in known_ids or op.dream_id in foreign_ids):
+                    raise ValueError("Dream id already exists")
+                dream_doc = build_dream_doc(user_id, DreamCreate(**(op.data or {})), op.dream_id)
+                writes.append(InsertOne(dream_doc))
+                targets.append((dream_doc["id"], op.op))
+                known_ids.add(dream_doc["id"])
+                is_public[dream_doc["id"]] = dream_doc["is_public"]
+                text[dream_doc["id"]] = (dream_doc["title"], dream_doc["description"])
+                result = DreamBatchResult(idempotency_key=key, op=op.op, status="applied", dream_id=dream_doc["id"])
+            elif op.dream_id not in known_ids:
+                result = DreamBatchResult(idempotency_key=key, op=op.op, status="not_found", dream_id=op.dream_id)
+            elif op.op == "update":
+                update_data = {k: v for k, v in DreamUpdate(**(op.data or {})).model_dump().items() if v is not None}
+                update_data["updated_at"] = now
+                if update_data.get("is_public") and not is_public[op.dream_id]:
+                    update_data["shared_at"] = now
+                is_public[op.dream_id] = update_data.get("is_public", is_public[op.dream_id])
+                if "title" in update_data or "description" in update_data:
+                    title, description = text[op.dream_id]
+                    text[op.dream_id] = (update_data.get("title", title), update_data.get("description", description))
+                    update_data["simhash"] = signature(*text[op.dream_id])
+                    update_data["sentiment"] = score_dream(*text[op.dream_id])
+                writes.append(UpdateOne({"id": op.dream_id, "user_id": user_id}, {"$set": update_data}))
+                targets.append((op.dream_id, op.op))
+                result = DreamBatchResult(idempotency_key=key, op=op.op, status="applied", dream_id=op.dream_id)
+            else:
+                writes.append(DeleteOne({"id": op.dream_id, "user_id": user_id}))
+                targets.append((op.dream_id, op.op))
+                known_ids.discard(op.dream_id)
+                result = DreamBatchResult(idempotency_key=key, op=op.op, status="applied", dream_id=op.dream_id)
+        except ValueError as e:
+            # Pydantic's ValidationError is a ValueError too
+            result = DreamBatchResult(idempotency_key=key, op=op.op, status="invalid", dream_id=op.dream_id, error=str(e))
+        
+        seen[key] = {"op": op.op, "dream_id": result.dream_id}
+        results.append(result)
+    
+    applied_at = [i for i, r in enumerate(results) if r.status == "applied"]
+    
+    def hold_back(start: int, error: str):
+        """Operations from results[start] on were planned on writes that did not happen; the client retries them"""
+        for i in range(start, len(results)):
+            if results[i].status in ("applied", "not_found"):
+                # Ids generated for creates that did not happen are not handed out
+                results[i] = results[i].model_copy(update={"status": "conflict", "error": error, "dream_id": operations[i].dream_id})
+    
+    # Claim the keys before writing: the unique (user_id, idempotency_key) index lets only one
+    # replay of a queue apply each operation. Claims go in order, so what we hold is a prefix.
+    claimed = len(writes)
+    if writes:
+        try:
+            await db.dream_mutations.insert_many([
+                {"user_id": user_id, "idempotency_key": results[i].idempotency_key, "op": results[i].op,
+                 "dream_id": results[i].dream_id, "created_at": now}
+                for i in applied_at
+            ], ordered=True)
+        except BulkWriteError as e:
+            claimed = e.details["writeErrors"][0]["index"]
+            position = applied_at[claimed]
+            hold_back(position + 1, "Another request is applying this queue, retry")
+            # A concurrent replay holds this key, so it has applied (or is applying) the operation
+            prior = await db.dream_mutations.find_one(
+                {"user_id": user_id, "idempotency_key": results[position].idempotency_key},
+                {"_id": 0, "op": 1, "dream_id": 1}
+            ) or {}
+            results[position] = DreamBatchResult(
+                idempotency_key=results[position].idempotency_key, op=prior.get("op", results[position].op),
+                status="duplicate", dream_id=prior.get("dream_id")
+            )
+    
+    written = claimed
+    if claimed:
+        try:
+            await db.dreams.bulk_write(writes[:claimed], ordered=True)
+        except BulkWriteError as e:
+            # Writes before the failed one stay applied; a concurrent request took one of the ids first
+            written = e.details["writeErrors"][0]["index"]
+            hold_back(applied_at[written], "Dream id conflict, retry")
+            await db.dream_mutations.delete_many({
+                "user_id": user_id,
+                "idempotency_key": {"$in": [results[i].idempotency_key for i in applied_at[written:claimed]]}
+            })
+    
+    touched_ids = {dream_id for dream_id, _ in targets[:written]}
+    after = {}
+    
+    if touched_ids:
+        # Net effect of the whole batch per dream, from its state before to its state after
+        after = await db.dreams.find({"user_id": user_id, "id": {"$in": list(touched_ids)}}, {"_id": 0}).to_list(None)
+        after = {d["id"]: d for d in after}
+        signature_updates = []
+        for dream_id in touched_ids:
+            signature_updates += signature_writes(before.get(dream_id), after.get(dream_id))
+            # Achievements are checked once below, for the response
+            dream_changed(before.get(dream_id), after.get(dream_id), current_user["name"], check_achievements=False)
+        if signature_updates:
+            await db.dream_signatures.bulk_write(signature_updates, ordered=False)
+    
+    # Tombstones follow each dream's final state: a client-chosen id created again is live,
+    # and delta syncs must not list it as both changed and deleted
+    deleted_ids = {dream_id for dream_id, kind in targets[:written] if kind == "delete" and dream_id not in after}
+    revived_ids = {dream_id for dream_id, kind in targets[:written] if kind == "create" and dream_id in client_ids}
+    tombstone_writes = [
+        UpdateOne(
+            {"user_id": user_id, "dream_id": dream_id},
+            {"$set": {"deleted_at": now, "updated_at": now}},
+            upsert=True
+        )
+        for dream_id in deleted_ids
+    ] + [DeleteOne({"user_id": user_id, "dream_id": dream_id}) for dream_id in revived_ids if dream_id in after]
+    if tombstone_writes:
+        await db.deleted_dreams.bulk_write(tombstone_writes, ordered=False)
+    
+    newly_unlocked = []
+    if written:
+        _, newly_unlocked = await calculate_achievements(user_id)
+    
+    return DreamBatchResponse(results=results, newly_unlocked=newly_unlocked)
 
 @api_router.get("/dreams", response_model=List[DreamResponse])
 async def get_dreams(current_user: dict = Depends(get_current_user)):
@@ -339,10 +796,12 @@ async def get_dreams(current_user: dict = Depends(get_current_user)):
         {"user_id": current_user["id"]}, 
         {"_id": 0}
     ).sort("date", -1).to_list(1000)
-    # Ensure defaults for new fields
-    for dream in dreams:
-        dream.setdefault("is_lucid", False)
-        dream.setdefault("is_public", False)
+    return [DreamResponse(**dream) for dream in dreams]
+
+@api_router.get("/dreams/search", response_model=List[DreamResponse])
+async def search_dreams(q: str, limit: int = 20, current_user: dict = Depends(get_current_user)):
+    """Full-text search over the user's dream titles and descriptions"""
+    dreams = await db.search_dreams(current_user["id"], q, min(limit, 100))
     return [DreamResponse(**dream) for dream in dreams]
 
 @api_router.get("/dreams/{dream_id}", response_model=DreamResponse)
@@ -353,9 +812,6 @@ async def get_dream(dream_id: str, current_user: dict = Depends(get_current_user
     )
     if not dream:
         raise HTTPException(status_code=404, detail="Dream not found")
-    # Ensure defaults for new fields
-    dream.setdefault("is_lucid", False)
-    dream.setdefault("is_public", False)
     return DreamResponse(**dream)
 
 @api_router.put("/dreams/{dream_id}", response_model=DreamResponse)
@@ -366,19 +822,98 @@ async def update_dream(dream_id: str, dream_data: DreamUpdate, current_user: dic
     
     update_data = {k: v for k, v in dream_data.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    await db.dreams.update_one({"id": dream_id}, {"$set": update_data})
-    
-    updated_dream = await db.dreams.find_one({"id": dream_id}, {"_id": 0})
+    if update_data.get("is_public") and not dream["is_public"]:
+        update_data["shared_at"] = update_data["updated_at"]
+    if "title" in update_data or "description" in update_data:
+        text = (update_data.get("title", dream["title"]), update_data.get("description", dream["description"]))
+        update_data["simhash"] = signature(*text)
+        update_data["sentiment"] = score_dream(*text)
+    
+    await db.dreams.update_one({"id": dream_id, "user_id": current_user["id"]}, {"$set": update_data})
+    
+    updated_dream = await db.dreams.find_one({"id": dream_id, "user_id": current_user["id"]}, {"_id": 0})
+    await update_dream_signatures(dream, updated_dream)
+    dream_changed(dream, updated_dream, current_user["name"])
     return DreamResponse(**updated_dream)
 
 @api_router.delete("/dreams/{dream_id}")
 async def delete_dream(dream_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.dreams.delete_one({"id": dream_id, "user_id": current_user["id"]})
-    if result.deleted_count == 0:
+    dream = await db.dreams.find_one_and_delete({"id": dream_id, "user_id": current_user["id"]}, {"_id": 0})
+    if dream is None:
         raise HTTPException(status_code=404, detail="Dream not found")
+    await record_dream_tombstone(current_user["id"], dream_id)
+    await update_dream_signatures(dream, None)
+    dream_changed(dream, None, current_user["name"])
     return {"message": "Dream deleted successfully"}
 
+async def update_dream_signatures(before: Optional[dict], after: Optional[dict]):
+    writes = signature_writes(before, after)
+    if writes:
+        await db.dream_signatures.bulk_write(writes, ordered=False)
+
+async def record_dream_tombstone(user_id: str, dream_id: str):
+    """Remember a deleted dream so delta syncs can tell clients to drop it"""
+    now = datetime.now(timezone.utc).isoformat()
+    await db.deleted_dreams.update_one(
+        {"user_id": user_id, "dream_id": dream_id},
+        {"$set": {"deleted_at": now, "updated_at": now}},
+        upsert=True
+    )
+
+# ============== SYNC ROUTE ==============
+
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync_changes(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Return dreams, settings and achievements changed since the given cursor"""
+    user_id = current_user["id"]
+    now = datetime.now(timezone.utc)
+    
+    if since:
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid sync cursor")
+        if since_dt.tzinfo is None:
+            since_dt = since_dt.replace(tzinfo=timezone.utc)
+        changed = {"$gt": (since_dt - timedelta(seconds=SYNC_CURSOR_OVERLAP_SECONDS)).isoformat()}
+        dream_query = {"user_id": user_id, "updated_at": changed}
+    else:
+        changed = None
+        dream_query = {"user_id": user_id}
+    
+    dreams = await db.dreams.find(dream_query, {"_id": 0}).sort("updated_at", 1).to_list(None)
+    
+    # A full sync already reflects every deletion, so tombstones only matter for deltas
+    tombstones = []
+    if changed:
+        tombstones = await db.deleted_dreams.find(
+            {"user_id": user_id, "updated_at": changed},
+            {"_id": 0, "dream_id": 1, "deleted_at": 1}
+        ).to_list(None)
+    
+    settings = await db.user_settings.find_one({"user_id": user_id}, {"_id": 0})
+    settings_response = None
+    if settings and (not changed or settings.get("updated_at", "") > changed["$gt"]):
+        settings_response = UserSettingsResponse(
+            reminder_enabled=settings.get("reminder_enabled", False),
+            reminder_time=settings.get("reminder_time", "08:00"),
+            reminder_timezone=settings.get("reminder_timezone", "UTC"),
+            streak_freeze_count=settings.get("streak_freeze_count", 0),
+            streak_freezes_used=settings.get("streak_freezes_used", 0)
+        )
+    
+    achievement_query = {"user_id": user_id, "updated_at": changed} if changed else {"user_id": user_id}
+    achievements = await db.achievements.find(achievement_query, {"_id": 0}).to_list(None)
+    
+    return SyncResponse(
+        dreams=[DreamResponse(**dream) for dream in dreams],
+        deleted_dreams=[DreamTombstone(id=t["dream_id"], deleted_at=t["deleted_at"]) for t in tombstones],
+        settings=settings_response,
+        achievements=[StoredAchievement(**a) for a in achievements],
+        cursor=now.isoformat(),
+        full_sync=not since
+    )
+
 # ============== PUBLIC SHARING ROUTES ==============
 
 @api_router.post("/dreams/{dream_id}/share")
@@ -389,81 +924,209 @@ async def share_dream(dream_id: str, current_user: dict = Depends(get_current_us
         raise HTTPException(status_code=404, detail="Dream not found")
     
     share_id = str(uuid.uuid4())[:8]  # Short shareable ID
+    now = datetime.now(timezone.utc).isoformat()
+    update_data = {"is_public": True, "share_id": share_id, "updated_at": now}
+    if not dream["is_public"]:
+        update_data["shared_at"] = now
     
-    await db.dreams.update_one(
-        {"id": dream_id},
-        {"$set": {"is_public": True, "share_id": share_id, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
+    await db.dreams.update_one({"id": dream_id, "user_id": current_user["id"]}, {"$set": update_data})
+    dream_changed(dream, {**dream, **update_data}, current_user["name"])
     
     return {"share_id": share_id, "message": "Dream is now public"}
 
 @api_router.post("/dreams/{dream_id}/unshare")
 async def unshare_dream(dream_id: str, current_user: dict = Depends(get_current_user)):
     """Make a dream private again"""
-    result = await db.dreams.update_one(
-        {"id": dream_id, "user_id": current_user["id"]},
-        {"$set": {"is_public": False, "updated_at": datetime.now(timezone.utc).isoformat()}, "$unset": {"share_id": ""}}
-    )
-    if result.matched_count == 0:
+    dream = await db.dreams.find_one({"id": dream_id, "user_id": current_user["id"]}, {"_id": 0})
+    if dream is None:
         raise HTTPException(status_code=404, detail="Dream not found")
     
+    update_data = {"is_public": False, "updated_at": datetime.now(timezone.utc).isoformat()}
+    await db.dreams.update_one({"id": dream_id, "user_id": current_user["id"]}, {"$set": update_data, "$unset": {"share_id": ""}})
+    unshared = {k: v for k, v in dream.items() if k != "share_id"}
+    dream_changed(dream, {**unshared, **update_data}, current_user["name"])
+    
     return {"message": "Dream is now private"}
 
 @api_router.get("/public/dream/{share_id}")
-async def get_public_dream(share_id: str):
+async def get_public_dream(share_id: str, request: Request):
     """Get a publicly shared dream (no auth required)"""
-    dream = await db.dreams.find_one({"share_id": share_id, "is_public": True}, {"_id": 0})
-    if not dream:
-        raise HTTPException(status_code=404, detail="Dream not found or not public")
-    
-    # Get author name
-    user = await db.users.find_one({"id": dream["user_id"]}, {"_id": 0, "name": 1})
-    author_name = user.get("name", "Anonymous") if user else "Anonymous"
+    cached = share_cache.get(share_id)
+    if cached is None:
+        dream = await db.dreams.find_one({"share_id": share_id, "is_public": True}, {"_id": 0})
+        if not dream:
+            raise HTTPException(status_code=404, detail="Dream not found or not public")
+        
+        # Get author name
+        user = await db.users.find_one({"id": dream["user_id"]}, {"_id": 0, "name": 1})
+        author_name = user.get("name", "Anonymous") if user else "Anonymous"
+        
+        payload = public_dream_payload(dream, author_name)
+        cached = (payload, f'"{hashlib.sha256(payload).hexdigest()[:32]}"')
+        share_cache.set(share_id, cached)
+    
+    payload, etag = cached
+    view_counter.add(share_id)
+    headers = {"ETag": etag, "Cache-Control": SHARE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+def forget_shared_dream(dream: dict):
+    """Drop a dream's cached share-link payload after it changes"""
+    if dream.get("share_id"):
+        share_cache.pop(dream["share_id"])
+
+@api_router.get("/public/dreams")
+async def get_public_dreams(limit: int = 20, skip: int = 0, cursor: Optional[str] = None, sort: Literal["recent", "views"] = "recent"):
+    """Get recent or most viewed public dreams (explore/discover feature)"""
+    limit = max(1, min(limit, 100))
+    if sort == "views":
+        return await get_most_viewed_dreams(limit, skip)
     
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    page, remaining_skip = public_feed.page(before, skip, limit)
+    if len(page) < limit and public_feed.truncated:
+        # Past the end of the in-memory feed; continue from its oldest entry in the database
+        if page:
+            older_than = page[-1][0]
+        else:
+            oldest = public_feed.oldest_key()
+            older_than = min(k for k in (before, oldest) if k) if (before or oldest) else None
+        page += await fetch_public_feed_entries(older_than, remaining_skip, limit - len(page))
+    
+    headers = {"X-Next-Cursor": encode_cursor(page[-1][0])} if len(page) == limit else {}
+    body = b"[" + b",".join(payload for _, payload in page) + b"]"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def get_most_viewed_dreams(limit: int, skip: int):
+    # Counts only move when the view buffer flushes, so pages are cached briefly
+    body = most_viewed_cache.get((limit, skip))
+    if body is None:
+        dreams = await db.dreams.find({"is_public": True}, {"_id": 0}).sort([("view_count", -1), ("id", -1)]).skip(skip).limit(limit).to_list(limit)
+        body = b"[" + b",".join(await public_dream_payloads(dreams)) + b"]"
+        most_viewed_cache.set((limit, skip), body)
+    return Response(content=body, media_type="application/json")
+
+def public_dream_payload(dream: dict, author_name: str) -> bytes:
     return PublicDreamResponse(
         id=dream["id"],
         share_id=dream.get("share_id"),
         title=dream["title"],
         description=dream["description"],
         date=dream["date"],
-        tags=dream.get("tags", []),
-        themes=dream.get("themes", []),
-        is_lucid=dream.get("is_lucid", False),
-        ai_insight=dream.get("ai_insight"),
+        tags=dream["tags"],
+        themes=dream["themes"],
+        is_lucid=dream["is_lucid"],
+        ai_insight=dream["ai_insight"],
         author_name=author_name,
-        created_at=dream["created_at"]
-    )
-
-@api_router.get("/public/dreams")
-async def get_public_dreams(limit: int = 20, skip: int = 0):
-    """Get recent public dreams (explore/discover feature)"""
+        created_at=dream["created_at"],
+        view_count=dream["view_count"]
+    ).model_dump_json().encode()
+
+def publish_to_feed(dream: dict, author_name: str):
+    """Keep the Explore feed in step with a dream's current public state"""
+    if dream["is_public"]:
+        public_feed.upsert((dream["created_at"], dream["id"]), public_dream_payload(dream, author_name))
+    else:
+        public_feed.remove(dream["id"])
+
+def dream_changed(before: Optional[dict], after: Optional[dict], author_name: str, check_achievements: bool = True):
+    """Bring the in-memory views (feed, share links, trending, vocabularies) in line with a dream write"""
+    user_id = (after or before)["user_id"]
+    vocabularies.apply(user_id, before, after)
+    action = "updated" if before and after else "created" if after else "deleted"
+    event_bus.publish(user_id, "dream_changed", {"id": (after or before)["id"], "action": action})
+    if check_achievements:
+        schedule_achievement_check(user_id)
+    if (before and before["is_public"]) or (after and after["is_public"]):
+        most_viewed_cache.clear()
+    if before:
+        forget_shared_dream(before)
+        if before["is_public"]:
+            trending.record(before, -1)
+    if after:
+        if after["is_public"]:
+            trending.record(after)
+        publish_to_feed(after, author_name)
+    elif before:
+        public_feed.remove(before["id"])
+
+async def fetch_public_feed_entries(older_than, skip: int, limit: int):
+    query = {"is_public": True}
+    if older_than:
+        created_at, dream_id = older_than
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": dream_id}}
+        ]
+    dreams = await db.dreams.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).skip(skip).limit(limit).to_list(limit)
+    payloads = await public_dream_payloads(dreams)
+    return [((dream["created_at"], dream["id"]), payload) for dream, payload in zip(dreams, payloads)]
+
+async def public_dream_payloads(dreams: List[dict]) -> List[bytes]:
+    """Serialize public dreams, resolving all author names with one query"""
+    user_ids = list({dream["user_id"] for dream in dreams})
+    users = await db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    names = {user["id"]: user.get("name", "Anonymous") for user in users}
+    return [public_dream_payload(dream, names.get(dream["user_id"], "Anonymous")) for dream in dreams]
+
+async def rebuild_public_feed():
+    entries = await fetch_public_feed_entries(None, 0, public_feed.capacity + 1)
+    public_feed.load(entries, truncated=len(entries) > public_feed.capacity)
+
+@api_router.get("/public/trending")
+async def get_trending(window: str = "24h", limit: int = 10):
+    """Tags and themes trending across recently shared dreams"""
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of: {', '.join(TRENDING_WINDOWS)}")
+    return {"window": window, **trending.top(window, max(1, min(limit, 20)))}
+
+async def rebuild_trending():
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=max(TRENDING_WINDOWS.values()))).isoformat()
     dreams = await db.dreams.find(
-        {"is_public": True},
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    results = []
-    for dream in dreams:
-        user = await db.users.find_one({"id": dream["user_id"]}, {"_id": 0, "name": 1})
-        author_name = user.get("name", "Anonymous") if user else "Anonymous"
-        results.append(PublicDreamResponse(
-            id=dream["id"],
-            share_id=dream.get("share_id"),
-            title=dream["title"],
-            description=dream["description"],
-            date=dream["date"],
-            tags=dream.get("tags", []),
-            themes=dream.get("themes", []),
-            is_lucid=dream.get("is_lucid", False),
-            ai_insight=dream.get("ai_insight"),
-            author_name=author_name,
-            created_at=dream["created_at"]
-        ))
-    
-    return results
+        {"is_public": True, "shared_at": {"$gte": cutoff}},
+        {"_id": 0, "tags": 1, "themes": 1, "shared_at": 1}
+    ).to_list(None)
+    trending.rebuild(dreams)
+
+async def rebuild_trending_periodically():
+    while True:
+        await asyncio.sleep(TRENDING_REBUILD_SECONDS)
+        try:
+            await rebuild_trending()
+        except Exception as e:
+            logger.error(f"Error rebuilding trending: {str(e)}")
+
+async def refresh_public_feed_periodically():
+    # Other workers' writes only reach this worker's feed through a rebuild
+    while True:
+        await asyncio.sleep(PUBLIC_FEED_REFRESH_SECONDS)
+        try:
+            await rebuild_public_feed()
+        except Exception as e:
+            logger.error(f"Error refreshing public feed: {str(e)}")
 
 # ============== ACHIEVEMENTS ROUTES ==============
 
+def schedule_achievement_check(user_id: str):
+    """Recalculate a user's achievements shortly after their dreams change; unlocks go out as events"""
+    if user_id not in achievement_checks:
+        achievement_checks[user_id] = asyncio.create_task(run_achievement_check(user_id))
+
+async def run_achievement_check(user_id: str):
+    try:
+        await asyncio.sleep(ACHIEVEMENT_CHECK_DELAY_SECONDS)
+        # Writes from here on need a fresh check
+        del achievement_checks[user_id]
+        await calculate_achievements(user_id)
+    except Exception as e:
+        logger.error(f"Error checking achievements: {str(e)}")
+
 async def calculate_achievements(user_id: str) -> List[Achievement]:
     """Calculate user's achievements based on their activity"""
     
@@ -475,15 +1138,19 @@ async def calculate_achievements(user_id: str) -> List[Achievement]:
     
     # Get unique themes and tags
     dreams = await db.dreams.find({"user_id": user_id}, {"_id": 0, "themes": 1, "tags": 1}).to_list(1000)
-    unique_themes = set()
-    unique_tags = set()
-    for dream in dreams:
-        unique_themes.update(dream.get("themes", []))
-        unique_tags.update(dream.get("tags", []))
     
     # Calculate streak
     streak_data = await calculate_streak(user_id)
-    longest_streak = streak_data["longest"]
+    
+    totals = {
+        "dreams": total_dreams,
+        "longest_streak": streak_data["longest"],
+        "lucid": lucid_dreams,
+        "insights": dreams_with_insight,
+        "shared": shared_dreams,
+        "themes": distinct_count(dreams, "themes"),
+        "tags": distinct_count(dreams, "tags"),
+    }
     
     # Get stored achievements
     stored_achievements = await db.achievements.find({"user_id": user_id}, {"_id": 0}).to_list(100)
@@ -497,21 +1164,7 @@ async def calculate_achievements(user_id: str) -> List[Achievement]:
         stored = stored_dict.get(ach_id, {})
         
         # Calculate progress based on achievement type
-        progress = 0
-        if ach_id == "first_dream" or ach_id.startswith("dreams_"):
-            progress = total_dreams
-        elif ach_id.startswith("streak_"):
-            progress = longest_streak
-        elif ach_id.startswith("lucid_"):
-            progress = lucid_dreams
-        elif ach_id.startswith("insight_"):
-            progress = dreams_with_insight
-        elif ach_id.startswith("share_"):
-            progress = shared_dreams
-        elif ach_id == "themes_5":
-            progress = len(unique_themes)
-        elif ach_id == "tags_10":
-            progress = len(unique_tags)
+        progress = achievement_progress(ach_id, totals)
         
         target = ach_def["target"]
         was_unlocked = stored.get("unlocked", False)
@@ -520,19 +1173,23 @@ async def calculate_achievements(user_id: str) -> List[Achievement]:
         # Track newly unlocked achievements
         if is_unlocked and not was_unlocked:
             newly_unlocked.append(ach_id)
+            event_bus.publish(user_id, "achievement_unlocked", {
+                "id": ach_id, "name": ach_def["name"], "icon": ach_def["icon"], "description": ach_def["description"]
+            })
             await db.achievements.update_one(
                 {"user_id": user_id, "achievement_id": ach_id},
                 {"$set": {
                     "unlocked": True,
                     "unlocked_at": datetime.now(timezone.utc).isoformat(),
-                    "progress": progress
+                    "progress": progress,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
                 }},
                 upsert=True
             )
         elif progress != stored.get("progress", 0):
             await db.achievements.update_one(
                 {"user_id": user_id, "achievement_id": ach_id},
-                {"$set": {"progress": progress}},
+                {"$set": {"progress": progress, "updated_at": datetime.now(timezone.utc).isoformat()}},
                 upsert=True
             )
         
@@ -580,6 +1237,29 @@ async def check_new_achievements(current_user: dict = Depends(get_current_user))
 
 # ============== AI INSIGHT ROUTE ==============
 
+async def load_llm():
+    """The LLM SDK module (LlmChat, UserMessage), imported off the event loop on first use"""
+    global llm_module
+    if llm_module is None:
+        with startup_phase("llm_import"):
+            llm_module = await asyncio.to_thread(importlib.import_module, LLM_MODULE)
+        logger.info(f"Loaded {LLM_MODULE} in {startup_timings['llm_import']} ms")
+    return llm_module
+
+async def send_llm_message(chat, prompt: str, purpose: str) -> str:
+    """Send one prompt, recording latency and estimated token counts"""
+    llm = await load_llm()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        reply = await chat.send_message(llm.UserMessage(text=prompt))
+        outcome = "ok"
+        metrics.llm_tokens.inc(purpose, "completion", amount=estimate_tokens(reply))
+        return reply
+    finally:
+        metrics.llm_duration.observe(time.perf_counter() - start, purpose, outcome)
+        metrics.llm_tokens.inc(purpose, "prompt", amount=estimate_tokens(prompt))
+
 @api_router.post("/dreams/{dream_id}/insight", response_model=InsightResponse)
 async def generate_insight(dream_id: str, current_user: dict = Depends(get_current_user)):
     dream = await db.dreams.find_one({"id": dream_id, "user_id": current_user["id"]}, {"_id": 0})
@@ -588,8 +1268,9 @@ async def generate_insight(dream_id: str, current_user: dict = Depends(get_curre
     
     try:
         api_key = os.environ.get('EMERGENT_LLM_KEY')
+        llm = await load_llm()
         
-        chat = LlmChat(
+        chat = llm.LlmChat(
             api_key=api_key,
             session_id=f"dream-insight-{dream_id}",
             system_message="""You are a mystical dream interpreter with deep knowledge of dream symbolism, psychology, and mythology. 
@@ -605,22 +1286,21 @@ async def generate_insight(dream_id: str, current_user: dict = Depends(get_curre
 
 Title: {dream['title']}
 Description: {dream['description']}
-Tags: {', '.join(dream.get('tags', []))}
-Themes: {', '.join(dream.get('themes', []))}
+Tags: {', '.join(dream['tags'])}
+Themes: {', '.join(dream['themes'])}
 
 Provide a thoughtful interpretation covering:
 1. Key symbols and their potential meanings
 2. Possible emotional themes or subconscious messages
 3. A brief reflection prompt for the dreamer"""
 
-        user_message = UserMessage(text=prompt)
-        insight = await chat.send_message(user_message)
+        insight = await send_llm_message(chat, prompt, "insight")
         
         # Save insight to dream
-        await db.dreams.update_one(
-            {"id": dream_id},
-            {"$set": {"ai_insight": insight, "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
+        update_data = {"ai_insight": insight, "updated_at": datetime.now(timezone.utc).isoformat()}
+        await db.dreams.update_one({"id": dream_id, "user_id": current_user["id"]}, {"$set": update_data})
+        dream_changed(dream, {**dream, **update_data}, current_user["name"])
+        event_bus.publish(current_user["id"], "insight_ready", {"dream_id": dream_id, "insight": insight})
         
         return InsightResponse(dream_id=dream_id, insight=insight)
         
@@ -628,12 +1308,108 @@ Provide a thoughtful interpretation covering:
         logger.error(f"Error generating insight: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate insight: {str(e)}")
 
+# ============== EVENT STREAM ROUTE ==============
+
+@api_router.post("/events/token")
+async def issue_stream_token(current_user: dict = Depends(get_current_user)):
+    """Short-lived token for opening /api/events?token=, keeping the login token out of URLs"""
+    return {"token": create_stream_token(current_user["id"]), "expires_in": STREAM_TOKEN_TTL_SECONDS}
+
+@api_router.get("/events")
+async def stream_events(request: Request, current_user: dict = Depends(get_stream_user)):
+    """Server-sent events for the current user: achievement_unlocked, insight_ready, dream_changed"""
+    user_id = current_user["id"]
+    queue = event_bus.subscribe(user_id)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============== DREAM DIGEST ROUTE ==============
+
+@api_router.post("/insights/digest", response_model=DigestResponse)
+async def generate_digest(period: Literal["week", "month"] = "week", current_user: dict = Depends(get_current_user)):
+    """Interpret all of a week's or month's dreams together in a single LLM call"""
+    user_id = current_user["id"]
+    today = datetime.now(timezone.utc).date()
+    start_date = (today - timedelta(days=DIGEST_PERIODS[period] - 1)).isoformat()
+    end_date = today.isoformat()
+    in_period = {"date": {"$gte": start_date}}
+    
+    version = await dream_data_version(user_id, in_period)
+    key = {"user_id": user_id, "period": period, "start_date": start_date}
+    cached = await db.dream_digests.find_one(key, {"_id": 0})
+    if cached and cached["version"] == version:
+        return DigestResponse(**cached)
+    
+    # Concurrent requests for the same digest share one LLM call
+    flight_key = (user_id, period, start_date, version)
+    if flight_key not in digests_in_flight:
+        digests_in_flight[flight_key] = asyncio.ensure_future(
+            build_digest(key, version, end_date, in_period)
+        )
+        digests_in_flight[flight_key].add_done_callback(lambda _: digests_in_flight.pop(flight_key, None))
+    return DigestResponse(**await asyncio.shield(digests_in_flight[flight_key]))
+
+async def build_digest(key: dict, version: str, end_date: str, in_period: dict) -> dict:
+    dreams = await db.dreams.find(
+        {"user_id": key["user_id"], **in_period},
+        {"_id": 0, "date": 1, "title": 1, "description": 1, "tags": 1, "themes": 1, "is_lucid": 1}
+    ).sort("date", 1).to_list(None)
+    if not dreams:
+        raise HTTPException(status_code=404, detail=f"No dreams recorded in the past {key['period']}")
+    
+    try:
+        llm = await load_llm()
+        chat = llm.LlmChat(
+            api_key=os.environ.get('EMERGENT_LLM_KEY'),
+            session_id=f"dream-digest-{key['user_id']}-{key['period']}-{key['start_date']}",
+            system_message="""You are a mystical dream interpreter with deep knowledge of dream symbolism, psychology, and mythology.
+            You are reading a dreamer's journal for a whole period rather than a single dream. Look for:
+            - Symbols, places and people that recur or evolve from dream to dream
+            - Shifts in emotional tone across the period
+            - Threads that connect otherwise separate dreams
+            Be mystical yet grounded, encouraging self-reflection without being prescriptive.
+            Keep the digest concise (3-4 paragraphs max)."""
+        ).with_model("anthropic", "claude-sonnet-4-5-20250929")
+        prompt = build_digest_prompt(dreams, f"past {key['period']}", DIGEST_PROMPT_TOKENS)
+        digest = await send_llm_message(chat, prompt, "digest")
+    except Exception as e:
+        logger.error(f"Error generating digest: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate digest: {str(e)}")
+    
+    doc = {
+        **key,
+        "end_date": end_date,
+        "version": version,
+        "dream_count": len(dreams),
+        "digest": digest,
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.dream_digests.replace_one(key, doc, upsert=True)
+    return doc
+
 # ============== STATS ROUTE ==============
 
 @api_router.get("/stats")
 async def get_stats(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
-    from datetime import timedelta
     
     # Get total dreams count
     total_dreams = await db.dreams.count_documents({"user_id": user_id})
@@ -644,18 +1420,9 @@ async def get_stats(current_user: dict = Depends(get_current_user)):
     # Get all dreams for tag/theme analysis
     dreams = await db.dreams.find({"user_id": user_id}, {"_id": 0, "tags": 1, "themes": 1, "date": 1}).to_list(1000)
     
-    # Count tags
-    tag_counts = {}
-    theme_counts = {}
-    for dream in dreams:
-        for tag in dream.get("tags", []):
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        for theme in dream.get("themes", []):
-            theme_counts[theme] = theme_counts.get(theme, 0) + 1
-    
     # Get top tags and themes
-    top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    top_themes = sorted(theme_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    top_tags = top_counts(dreams, "tags", 5)
+    top_themes = top_counts(dreams, "themes", 5)
     
     # Dreams this week
     week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
@@ -671,6 +1438,9 @@ async def get_stats(current_user: dict = Depends(get_current_user)):
     settings = await db.user_settings.find_one({"user_id": user_id}, {"_id": 0})
     streak_freezes = settings.get("streak_freeze_count", 0) if settings else 0
     
+    # Stored unlocks only; recalculation happens after writes and is pushed over /api/events
+    achievements_unlocked = await db.achievements.count_documents({"user_id": user_id, "unlocked": True})
+    
     return {
         "total_dreams": total_dreams,
         "lucid_dreams": lucid_dreams,
@@ -679,12 +1449,12 @@ async def get_stats(current_user: dict = Depends(get_current_user)):
         "top_themes": [{"name": t[0], "count": t[1]} for t in top_themes],
         "current_streak": streak["current"],
         "longest_streak": streak["longest"],
-        "streak_freezes": streak_freezes
+        "streak_freezes": streak_freezes,
+        "achievements_unlocked": achievements_unlocked,
+        "total_achievements": len(ACHIEVEMENTS)
     }
 
 async def calculate_streak(user_id: str):
-    from datetime import timedelta
-    
     # Get all dream dates sorted descending
     dreams = await db.dreams.find(
         {"user_id": user_id}, 
@@ -694,54 +1464,25 @@ async def calculate_streak(user_id: str):
     if not dreams:
         return {"current": 0, "longest": 0}
     
-    # Get unique dates
-    dates = sorted(set(d["date"][:10] for d in dreams), reverse=True)
-    
     # Check for active freeze
     settings = await db.user_settings.find_one({"user_id": user_id}, {"_id": 0})
     last_freeze_date = settings.get("last_freeze_date") if settings else None
     
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
-    
-    # Calculate current streak (with freeze consideration)
-    current_streak = 0
-    if dates:
-        # Check if most recent dream is today, yesterday, or freeze was used yesterday
-        can_continue_streak = (
-            dates[0] == today or 
-            dates[0] == yesterday or 
-            last_freeze_date == yesterday
-        )
-        
-        if can_continue_streak:
-            check_date = datetime.strptime(dates[0], "%Y-%m-%d")
-            for i, date_str in enumerate(dates):
-                date = datetime.strptime(date_str, "%Y-%m-%d")
-                gap = (check_date - date).days
-                
-                # Allow gap of 1 day normally, or 2 if freeze was used
-                if gap <= 1 or (gap == 2 and last_freeze_date):
-                    current_streak += 1
-                    check_date = date
-                else:
-                    break
-    
-    # Calculate longest streak
-    longest_streak = 0
-    if dates:
-        streak = 1
-        for i in range(1, len(dates)):
-            prev = datetime.strptime(dates[i-1], "%Y-%m-%d")
-            curr = datetime.strptime(dates[i], "%Y-%m-%d")
-            if (prev - curr).days == 1:
-                streak += 1
-            else:
-                longest_streak = max(longest_streak, streak)
-                streak = 1
-        longest_streak = max(longest_streak, streak)
-    
-    return {"current": current_streak, "longest": longest_streak}
+    return journal_streaks([d["date"] for d in dreams], datetime.now(timezone.utc).date(), last_freeze_date)
+
+# ============== TAG SUGGESTION ROUTE ==============
+
+@api_router.get("/tags/suggest")
+async def suggest_tags(prefix: str = "", kind: str = "tag", limit: int = 10, current_user: dict = Depends(get_current_user)):
+    """Autocomplete the user's own tags or themes, most used first"""
+    if kind not in VOCAB_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(VOCAB_KINDS)}")
+    user_id = current_user["id"]
+    vocabulary = await vocabularies.get(
+        user_id,
+        lambda: db.dreams.find({"user_id": user_id}, {"_id": 0, "tags": 1, "themes": 1}).to_list(None)
+    )
+    return {"kind": kind, "suggestions": vocabulary.suggest(kind, prefix.strip(), max(1, min(limit, 50)))}
 
 # ============== CALENDAR ROUTE ==============
 
@@ -771,22 +1512,39 @@ async def get_dreams_calendar(year: int, month: int, current_user: dict = Depend
         by_date[date].append({
             "id": dream["id"],
             "title": dream["title"],
-            "themes": dream.get("themes", [])
+            "themes": dream["themes"]
         })
     
     return {"dreams_by_date": by_date}
 
 # ============== PATTERN ANALYSIS ROUTE ==============
 
+async def dream_data_version(user_id: str, query: Optional[dict] = None) -> str:
+    """Changes whenever one of the user's dreams (matching ``query``) is created, edited or deleted"""
+    query = {"user_id": user_id, **(query or {})}
+    count = await db.dreams.count_documents(query)
+    latest = await db.dreams.find(query, {"_id": 0, "updated_at": 1}).sort("updated_at", -1).limit(1).to_list(1)
+    return f"{count}:{latest[0]['updated_at'] if latest else ''}"
+
+async def cached_analysis(key: tuple, version: str, compute):
+    """Return the cached result for ``key`` if it was built from ``version``, else recompute it"""
+    cached = analysis_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    result = await compute()
+    analysis_cache.set(key, (version, result))
+    return result
+
 @api_router.get("/analysis/patterns")
 async def get_pattern_analysis(current_user: dict = Depends(get_current_user)):
     """Analyze dream patterns - recurring symbols, themes over time"""
     user_id = current_user["id"]
     
+    # The whole journal: large ones are what the worker processes below are for
     dreams = await db.dreams.find(
         {"user_id": user_id}, 
-        {"_id": 0, "description": 1, "tags": 1, "themes": 1, "date": 1, "title": 1}
-    ).sort("date", -1).to_list(1000)
+        {"_id": 0, "description": 1, "tags": 1, "themes": 1, "date": 1, "title": 1, "sentiment": 1}
+    ).sort("date", -1).to_list(None)
     
     if not dreams:
         return {
@@ -794,86 +1552,99 @@ async def get_pattern_analysis(current_user: dict = Depends(get_current_user)):
             "recurring_symbols": [],
             "theme_trends": [],
             "common_words": [],
-            "monthly_activity": []
+            "monthly_activity": [],
+            "emotional_tone": []
         }
     
-    # Common dream symbols to detect
-    symbols = {
-        "water": ["water", "ocean", "sea", "river", "lake", "swimming", "drowning", "rain", "flood"],
-        "flying": ["flying", "fly", "floating", "soaring", "wings", "air"],
-        "falling": ["falling", "fall", "dropping", "cliff", "height"],
-        "chase": ["chase", "chasing", "running", "escape", "pursued", "following"],
-        "death": ["death", "dead", "dying", "funeral", "grave"],
-        "teeth": ["teeth", "tooth", "falling out", "broken teeth"],
-        "animals": ["animal", "dog", "cat", "snake", "bird", "spider", "wolf", "lion"],
-        "house": ["house", "home", "room", "door", "window", "building"],
-        "vehicle": ["car", "driving", "bus", "train", "plane", "crash"],
-        "people": ["stranger", "family", "friend", "crowd", "person", "people"]
-    }
-    
-    # Count symbol occurrences
-    symbol_counts = {s: 0 for s in symbols}
-    for dream in dreams:
-        text = (dream.get("description", "") + " " + dream.get("title", "")).lower()
-        for symbol, keywords in symbols.items():
-            if any(kw in text for kw in keywords):
-                symbol_counts[symbol] += 1
+    # Symbol detection and word frequency are the CPU-heavy part; large journals go to a worker process
+    descriptions, description_offsets = pack_texts([dream["description"] for dream in dreams])
+    titles, title_offsets = pack_texts([dream["title"] for dream in dreams])
+    text_analysis = await analytics_executor.run(
+        len(descriptions) + len(titles), text_patterns,
+        descriptions, description_offsets, titles, title_offsets, DREAM_SYMBOLS, STOP_WORDS, 15
+    )
     
     recurring_symbols = [
         {"symbol": s, "count": c, "percentage": round(c/len(dreams)*100, 1)}
-        for s, c in sorted(symbol_counts.items(), key=lambda x: x[1], reverse=True)
+        for s, c in sorted(text_analysis["symbol_counts"].items(), key=lambda x: x[1], reverse=True)
         if c > 0
     ][:8]
     
-    # Theme trends over time
-    theme_by_month = {}
-    for dream in dreams:
-        month = dream["date"][:7]  # YYYY-MM
-        if month not in theme_by_month:
-            theme_by_month[month] = {}
-        for theme in dream.get("themes", []):
-            theme_by_month[month][theme] = theme_by_month[month].get(theme, 0) + 1
+    # Theme trends and activity by month (YYYY-MM)
+    months = month_buckets(dreams)
     
     theme_trends = [
-        {"month": m, "themes": [{"name": t, "count": c} for t, c in themes.items()]}
-        for m, themes in sorted(theme_by_month.items())
+        {"month": m, "themes": [{"name": t, "count": c} for t, c in bucket["themes"].items()]}
+        for m, bucket in months.items()
     ][-6:]  # Last 6 months
     
-    # Monthly activity
-    monthly_counts = {}
-    for dream in dreams:
-        month = dream["date"][:7]
-        monthly_counts[month] = monthly_counts.get(month, 0) + 1
-    
     monthly_activity = [
-        {"month": m, "count": c}
-        for m, c in sorted(monthly_counts.items())
+        {"month": m, "count": bucket["count"]}
+        for m, bucket in months.items()
     ][-12:]  # Last 12 months
     
-    # Word frequency (simple)
-    import re
-    stop_words = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by", "from", "i", "me", "my", "was", "were", "is", "it", "that", "this", "had", "have", "be", "been"}
-    word_counts = {}
-    for dream in dreams:
-        text = dream.get("description", "").lower()
-        words = re.findall(r'\b[a-z]{4,}\b', text)
-        for word in words:
-            if word not in stop_words:
-                word_counts[word] = word_counts.get(word, 0) + 1
-    
-    common_words = [
-        {"word": w, "count": c}
-        for w, c in sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
-    ][:15]
+    common_words = [{"word": w, "count": c} for w, c in text_analysis["common_words"]]
     
     return {
         "total_analyzed": len(dreams),
         "recurring_symbols": recurring_symbols,
         "theme_trends": theme_trends,
         "common_words": common_words,
-        "monthly_activity": monthly_activity
+        "monthly_activity": monthly_activity,
+        "emotional_tone": monthly_tone(dreams)  # Last 12 months
     }
 
+@api_router.get("/analysis/cooccurrence")
+async def get_cooccurrence(limit: int = 20, min_count: int = 2, current_user: dict = Depends(get_current_user)):
+    """Tags, themes and symbols that tend to appear in the same dreams, ranked by lift"""
+    user_id = current_user["id"]
+    limit = max(1, min(limit, 100))
+    min_count = max(1, min_count)
+    
+    async def compute():
+        dreams = await db.dreams.find(
+            {"user_id": user_id},
+            {"_id": 0, "description": 1, "tags": 1, "themes": 1, "title": 1}
+        ).to_list(None)
+        if len(dreams) < ANALYSIS_THREAD_THRESHOLD:
+            return cooccurrence(dreams, DREAM_SYMBOLS, limit, min_count)
+        # Large journals would stall every other request on this worker
+        return await asyncio.to_thread(cooccurrence, dreams, DREAM_SYMBOLS, limit, min_count)
+    
+    version = await dream_data_version(user_id)
+    return await cached_analysis(("cooccurrence", user_id, limit, min_count), version, compute)
+
+# ============== ADMIN ROUTES ==============
+
+@api_router.get("/admin/profiles")
+async def list_profiles(admin: dict = Depends(get_admin_user)):
+    """Recent request profiles, newest first"""
+    return await asyncio.to_thread(profiler.list)
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: Literal["speedscope", "collapsed"] = "speedscope", admin: dict = Depends(get_admin_user)):
+    """A stored profile as speedscope JSON or collapsed stacks (for flamegraph.pl)"""
+    path = profiler.path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return Response(await asyncio.to_thread(path.read_bytes), media_type=media_type)
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = 20, admin: dict = Depends(get_admin_user)):
+    """Slow Mongo query shapes by total time, with their plans and collection scans flagged"""
+    if db.name != "mongo":
+        raise HTTPException(status_code=404, detail="Slow query log needs the mongo storage backend")
+    return {"threshold_ms": slow_queries.listener.threshold * 1000, "queries": slow_queries.report(max(1, min(limit, 100)))}
+
+@api_router.post("/admin/profiles/token")
+async def create_profile_token(minutes: int = 10, admin: dict = Depends(get_admin_user)):
+    """Signed X-Debug-Profile header value that profiles requests until it expires"""
+    if not profiler.secret:
+        raise HTTPException(status_code=400, detail="PROFILE_SECRET is not configured")
+    expires = int(time.time()) + max(1, min(minutes, 60)) * 60
+    return {"header": "X-Debug-Profile", "value": sign_profile_token(profiler.secret, expires), "expires_at": expires}
+
 # ============== ROOT ==============
 
 @api_router.get("/")
@@ -883,14 +1654,156 @@ async def root():
 # Include router and add middleware
 app.include_router(api_router)
 
+# Added first so it runs inside CORS: 429 and 503 responses still carry CORS headers
+if os.environ.get('ADMISSION_CONTROL', '0') == '1':
+    check_rate_limits(COST_CLASSES, [RATE_LIMIT_USER, RATE_LIMIT_IP])
+    app.add_middleware(
+        AdmissionMiddleware,
+        router=app.router,
+        classes=COST_CLASSES,
+        route_classes=ROUTE_COST_CLASSES,
+        store=rate_limit_store,
+        identify=request_user_id,
+        user_limit=RATE_LIMIT_USER,
+        ip_limit=RATE_LIMIT_IP,
+        exempt=("/health", "/ready", "/metrics"),
+        metrics=metrics
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-DB-Ops", "Server-Timing", "X-Profile-Id", "Retry-After"],
 )
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+# Round trips per request; DB_OPS_ROUTE_BUDGETS overrides the default per route template,
+# e.g. "/api/stats=8,/api/achievements=12"
+app.add_middleware(
+    DbBudgetMiddleware,
+    metrics=metrics,
+    default_budget=int(os.environ.get('DB_OPS_BUDGET', 25)),
+    budgets=parse_budgets(os.environ.get('DB_OPS_ROUTE_BUDGETS', ''))
+)
+# Outermost, so the timing covers CORS handling and error responses too
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving (no dependencies checked)"""
+    return {"status": "ok", "uptime_seconds": round(time.time() - started_at, 1)}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: startup has finished and the database answers a ping"""
+    if not app_ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        await asyncio.wait_for(db.ping(), READY_PING_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.error(f"Readiness ping failed: {str(e)}")
+        return JSONResponse({"status": "unavailable", "storage": db.name}, status_code=503)
+    return {"status": "ready", "storage": db.name, "startup_ms": startup_timings}
+
+# ============== LIFECYCLE ==============
+
+@contextmanager
+def startup_phase(name: str):
+    """Time a startup phase into startup_timings and the app_startup_seconds gauge"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        startup_timings[name] = round(elapsed * 1000, 1)
+        metrics.startup_seconds.set(elapsed, name)
+
+async def ensure_indexes():
+    if db.name == "mongo":
+        # Dream ids used to have a plain index; Mongo refuses a second index on the same key
+        indexes = await db.dreams.index_information()
+        if "id_1" in indexes:
+            await db.dreams.drop_index("id_1")
+    # Independent round trips, so they are sent together
+    await asyncio.gather(
+        db.users.create_index("id"),
+        db.users.create_index("email"),
+        # Unique: batch creates may carry client-chosen ids
+        db.dreams.create_index("id", unique=True, name="id_unique"),
+        db.dreams.create_index([("user_id", 1), ("date", -1)]),
+        db.dreams.create_index("share_id"),
+        db.dreams.create_index([("is_public", 1), ("created_at", -1), ("id", -1)]),
+        db.dreams.create_index([("is_public", 1), ("view_count", -1), ("id", -1)]),
+        db.dreams.create_index([("is_public", 1), ("shared_at", 1)]),
+        db.dream_signatures.create_index([("user_id", 1), ("key", 1)]),
+        db.dream_signatures.create_index([("dream_id", 1), ("band", 1)], unique=True),
+        db.user_settings.create_index("user_id"),
+        db.achievements.create_index([("user_id", 1), ("achievement_id", 1)]),
+        # Delta sync reads everything changed for one user after a cursor
+        db.dreams.create_index([("user_id", 1), ("updated_at", 1)]),
+        db.deleted_dreams.create_index([("user_id", 1), ("updated_at", 1)]),
+        db.deleted_dreams.create_index([("user_id", 1), ("dream_id", 1)], unique=True),
+        db.achievements.create_index([("user_id", 1), ("updated_at", 1)]),
+        db.dream_mutations.create_index([("user_id", 1), ("idempotency_key", 1)], unique=True),
+        db.user_settings.create_index([("reminder_enabled", 1), ("reminder_bucket", 1)]),
+        db.dream_digests.create_index([("user_id", 1), ("period", 1), ("start_date", 1)], unique=True),
+        db.events.create_index("ts"),
+        db.rate_limits.create_index([("origin", 1), ("key", 1)]),
+        db.rate_limits.create_index("ts"),
+    )
+
+async def start_app():
+    global app_ready
+    startup_started = time.perf_counter()
+    metrics.startup_seconds.set(startup_timings["import"] / 1000, "import")
+    
+    # Opens the connection pool, so a bad MONGO_URL fails startup instead of the first request
+    with startup_phase("db_ping"):
+        await db.ping()
+    with startup_phase("indexes"):
+        await ensure_indexes()
+    if os.environ.get('RUN_MIGRATIONS', '1') == '1':
+        with startup_phase("migrations"):
+            await run_migrations(db)
+    with startup_phase("warm_caches"):
+        await asyncio.gather(rebuild_public_feed(), rebuild_trending())
+    
+    if PUBLIC_FEED_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(refresh_public_feed_periodically()))
+    if TRENDING_REBUILD_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(rebuild_trending_periodically()))
+    if VIEW_COUNT_FLUSH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(view_counter.run(db.dreams, VIEW_COUNT_FLUSH_SECONDS)))
+    if os.environ.get('REMINDER_SCHEDULER', '0') == '1':
+        background_tasks.append(asyncio.create_task(reminder_scheduler.run()))
+    background_tasks.append(asyncio.create_task(event_bus.run()))
+    background_tasks.append(asyncio.create_task(rate_limit_store.run()))
+    if db.name == "mongo":
+        background_tasks.append(asyncio.create_task(slow_queries.run(db.client)))
+    
+    startup_timings["startup"] = round((time.perf_counter() - startup_started) * 1000, 1)
+    metrics.startup_seconds.set(startup_timings["startup"] / 1000, "startup")
+    app_ready = True
+    logger.info(f"Started in {startup_timings['startup']} ms ({db.name} storage): {startup_timings}")
+
+async def stop_app():
+    global app_ready
+    # Fail readiness first so load balancers stop routing here while we drain
+    app_ready = False
+    for task in background_tasks + list(achievement_checks.values()):
+        task.cancel()
+    try:
+        await view_counter.flush(db.dreams)
+    except Exception as e:
+        logger.error(f"Error flushing view counts on shutdown: {str(e)}")
+    analytics_executor.shutdown()
+    db.close()
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Everything above runs when the module is imported
+startup_timings["import"] = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
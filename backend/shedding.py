@@ -0,0 +1,328 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from pymongo import UpdateOne
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# Admission control in front of the routes. Each route belongs to a cost class
+# (cheap reads, heavy analysis, bcrypt auth, LLM calls, ...) with its own
+# concurrency limit, so a spike on one class queues inside that class instead of
+# starving the others. Requests wait for a slot for at most the class's max_wait;
+# once recent waits run over that, new requests are turned away straight away
+# with 503 and a Retry-After instead of joining a queue they would time out in.
+# Before that, token buckets per user and per client address charge each
+# request its class's cost and answer 429 when a bucket is empty.
+
+
+class CostClass:
+    def __init__(self, concurrency=0, max_wait=1.0, max_queue=None, tokens=1):
+        # concurrency 0 means unlimited (long-lived streams, health checks)
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.max_queue = max_queue if max_queue is not None else concurrency * 4
+        self.tokens = tokens
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` holders; waiters are served first in, first out"""
+
+    def __init__(self, limit, max_wait, max_queue, smoothing=0.2):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.active = 0
+        # Moving average of how long admitted requests waited for their slot
+        self.queue_delay = 0.0
+        self._waiters = deque()
+
+    def _observe(self, waited):
+        self.queue_delay += self.smoothing * (waited - self.queue_delay)
+
+    def retry_after(self):
+        return max(1, math.ceil(max(self.queue_delay, self.max_wait)))
+
+    async def acquire(self):
+        if not self.limit:
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._observe(0.0)
+            return
+        # Shed instead of queueing when the queue is full or waits already run past max_wait
+        if len(self._waiters) >= self.max_queue or self.queue_delay >= self.max_wait:
+            raise Overloaded(self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            # release() hands its slot straight to the waiter, so ``active`` is already counted
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._observe(time.perf_counter() - start)
+            raise Overloaded(self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._observe(time.perf_counter() - start)
+
+    def release(self):
+        if not self.limit:
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class MemoryRateLimitStore:
+    """Token buckets in this process, the least recently used dropped beyond ``max_keys``"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # key -> [tokens, monotonic time of the last refill, rate, burst]
+        self._buckets = OrderedDict()
+
+    def _refill(self, bucket, now):
+        tokens, updated, rate, burst = bucket
+        bucket[0] = min(burst, tokens + (now - updated) * rate)
+        bucket[1] = now
+
+    def _bucket(self, key, rate, burst, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now, rate, burst]
+            while len(self._buckets) > self.max_keys:
+                # An evicted bucket comes back full, which only errs on the lenient side
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[2], bucket[3] = rate, burst
+            self._refill(bucket, now)
+        return bucket
+
+    def wait(self, key, rate, burst, cost=1, now=None):
+        """Seconds until ``key``'s bucket holds ``cost`` tokens, 0 if it does now; nothing is taken"""
+        bucket = self._bucket(key, rate, burst, time.monotonic() if now is None else now)
+        if bucket[0] >= cost:
+            return 0.0
+        return (cost - bucket[0]) / rate if rate else float("inf")
+
+    def take(self, key, rate, burst, cost=1, now=None):
+        """Take ``cost`` tokens from ``key``'s bucket; seconds until they would be there, 0 if taken"""
+        bucket = self._bucket(key, rate, burst, time.monotonic() if now is None else now)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate if rate else float("inf")
+
+    def debit(self, key, amount, now=None):
+        """Remove tokens taken elsewhere from ``key``'s bucket, if this process has one"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._refill(bucket, time.monotonic() if now is None else now)
+            bucket[0] = max(0.0, bucket[0] - amount)
+
+    async def run(self):
+        pass
+
+
+class StorageRateLimitStore(MemoryRateLimitStore):
+    """Token buckets shared between processes through a ``rate_limits`` collection
+
+    Requests are still checked against the buckets in memory. Every ``interval``
+    each process adds what it took since the last sync to its own per-key totals
+    in the collection and debits its buckets by what the other processes took,
+    so limits hold across processes with a lag of about one interval.
+    """
+
+    def __init__(self, collection, interval=1.0, retention=600, max_keys=100000):
+        super().__init__(max_keys)
+        self.collection = collection
+        self.interval = interval
+        self.retention = retention
+        self.origin = str(uuid.uuid4())
+        self._taken = {}
+        # (origin, key) -> [total already debited, wall time it was last seen]
+        self._seen = {}
+
+    def take(self, key, rate, burst, cost=1, now=None):
+        retry_after = super().take(key, rate, burst, cost, now)
+        if not retry_after:
+            self._taken[key] = self._taken.get(key, 0) + cost
+        return retry_after
+
+    async def sync(self, since):
+        now = time.time()
+        if self._taken:
+            taken, self._taken = self._taken, {}
+            try:
+                await self.collection.bulk_write([
+                    UpdateOne({"origin": self.origin, "key": key}, {"$inc": {"taken": amount}, "$set": {"ts": now}}, upsert=True)
+                    for key, amount in taken.items()
+                ], ordered=False)
+            except Exception:
+                for key, amount in taken.items():
+                    self._taken[key] = self._taken.get(key, 0) + amount
+                raise
+        totals = await self.collection.find(
+            {"ts": {"$gt": since - self.interval}, "origin": {"$ne": self.origin}}, {"_id": 0}
+        ).to_list(None)
+        for total in totals:
+            seen = self._seen.get((total["origin"], total["key"]))
+            if seen is None:
+                # Totals are cumulative; only what is taken after we first see one is debited
+                self._seen[(total["origin"], total["key"])] = [total["taken"], now]
+                continue
+            # A total below what we saw was deleted as idle and started again from zero
+            taken = total["taken"] - seen[0] if total["taken"] >= seen[0] else total["taken"]
+            if taken:
+                self.debit(total["key"], taken)
+            seen[0], seen[1] = total["taken"], now
+        return now
+
+    async def run(self):
+        last_sync = time.time()
+        last_cleanup = last_sync
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                last_sync = await self.sync(last_sync)
+                if last_sync - last_cleanup > self.retention:
+                    last_cleanup = last_sync
+                    await self.collection.delete_many({"ts": {"$lt": last_cleanup - self.retention}})
+                    self._seen = {k: v for k, v in self._seen.items() if v[1] >= last_cleanup - self.retention}
+            except Exception as e:
+                logger.error(f"Error syncing rate limits: {str(e)}")
+
+
+def create_rate_limit_store(db, name=None):
+    name = name or os.environ.get('RATE_LIMIT_STORE', 'memory')
+    if name == "memory":
+        return MemoryRateLimitStore()
+    if name == "storage":
+        return StorageRateLimitStore(db.rate_limits, interval=float(os.environ.get('RATE_LIMIT_SYNC_SECONDS', 1)))
+    raise ValueError(f"Unknown rate limit store: {name}")
+
+
+def check_rate_limits(classes, limits):
+    """Raise ValueError if a cost class needs more tokens than an enabled limit's burst can ever hold"""
+    for name, cost in classes.items():
+        for rate, burst in limits:
+            if rate and cost.tokens > burst:
+                raise ValueError(f"Cost class {name} takes {cost.tokens} tokens but the rate limit burst is {burst}")
+
+
+def bearer_token(scope):
+    """The token in the request's Authorization header, if it is a bearer token"""
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+
+def route_template(router, scope):
+    """Path template of the route that will handle the request, matched the way the router does"""
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying per-user/per-address rate limits and per-cost-class concurrency limits
+
+    ``route_classes`` maps "METHOD /path/template" to a cost class name; other
+    routes are "default". ``identify(scope)`` returns the caller's user id or None.
+    Rate limits are (tokens per second, burst); a rate of 0 turns that limit off.
+    """
+
+    def __init__(self, app, router, classes, route_classes, store, identify, user_limit=(0, 0), ip_limit=(0, 0),
+                 exempt=(), metrics=None):
+        self.app = app
+        self.router = router
+        self.classes = classes
+        self.route_classes = route_classes
+        self.store = store
+        self.identify = identify
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.exempt = set(exempt)
+        self.metrics = metrics
+        self.limiters = {
+            name: ConcurrencyLimiter(cost.concurrency, cost.max_wait, cost.max_queue) for name, cost in classes.items()
+        }
+        self._last_warning = {}
+
+    async def reject(self, send, status, retry_after, detail, route, reason):
+        if self.metrics is not None:
+            self.metrics.http_rejected.inc(route or "unmatched", reason)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"retry-after", str(math.ceil(retry_after)).encode())],
+        })
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        route = route_template(self.router, scope)
+        name = self.route_classes.get(f"{scope['method']} {route}", "default")
+        cost = self.classes[name]
+
+        user_id = self.identify(scope)
+        client = scope.get("client")
+        checks = [("user", f"user:{user_id}", self.user_limit)] if user_id else []
+        checks.append(("ip", f"ip:{client[0] if client else 'unknown'}", self.ip_limit))
+        checks = [(kind, key, rate, burst) for kind, key, (rate, burst) in checks if rate]
+        # Charged only once every bucket has the tokens, so a rejection costs the caller nothing
+        for kind, key, rate, burst in checks:
+            retry_after = self.store.wait(key, rate, burst, cost.tokens)
+            if retry_after:
+                await self.reject(send, 429, retry_after, "Too many requests", route, f"rate_limited_{kind}")
+                return
+        for _, key, rate, burst in checks:
+            self.store.take(key, rate, burst, cost.tokens)
+
+        limiter = self.limiters[name]
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            # Once per class every 10 seconds; the rejected counter has the full picture
+            now = time.monotonic()
+            if now - self._last_warning.get(name, 0) > 10:
+                self._last_warning[name] = now
+                logger.warning(
+                    f"Shedding {name} requests such as {scope['method']} {route}: "
+                    f"{limiter.active} running, queue delay {limiter.queue_delay:.2f}s"
+                )
+            await self.reject(send, 503, e.retry_after, "Server is busy, please retry shortly", route, "overloaded")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Slow MongoDB query log. A command listener on the Motor client picks out reads
+# and writes slower than a threshold and hands them over through a deque (pymongo
+# calls listeners on Motor's worker threads). On the event loop they are grouped
+# by shape, the command with every value replaced by "?", and a background task
+# explains each new shape once so the report can show its plan and flag
+# collection scans.
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Keys whose values describe the query's structure rather than its data
+STRUCTURE_KEYS = {"sort", "projection", "hint", "fields"}
+# Driver and session fields that are neither part of the shape nor accepted inside explain
+DRIVER_KEYS = {
+    "lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern", "writeConcern",
+    "autocommit", "startTransaction", "apiVersion", "apiStrict", "apiDeprecationErrors", "comment", "maxTimeMS",
+}
+
+
+def query_shape(value):
+    """``value`` with every literal replaced by "?"; lists of literals collapse to one "?" """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            if isinstance(item, (dict, list, tuple)):
+                shape = query_shape(item)
+                # Batched writes repeat one statement shape; keep each distinct shape once
+                if shape not in shapes:
+                    shapes.append(shape)
+        return shapes or "?"
+    return "?"
+
+
+def command_shape(command_name, command):
+    shape = {}
+    for key, value in command.items():
+        if key in DRIVER_KEYS:
+            continue
+        if key == command_name:
+            shape[key] = value
+        elif key in STRUCTURE_KEYS:
+            shape[key] = dict(value) if isinstance(value, dict) else value
+        else:
+            shape[key] = query_shape(value)
+    return shape
+
+
+def explainable_command(command_name, command):
+    """The command as it can be sent inside explain: driver fields dropped, one write statement"""
+    explained = {key: value for key, value in command.items() if key not in DRIVER_KEYS}
+    for statements in ("updates", "deletes"):
+        if statements in explained:
+            explained[statements] = list(explained[statements])[:1]
+    return explained
+
+
+def plan_stages(explain):
+    """Stage names of every winning plan in an explain result (find, count or aggregate)"""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "stage" and in_plan and isinstance(value, str):
+                    stages.append(value)
+                else:
+                    walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold, maxlen=10000):
+        self.threshold = threshold
+        self._started = {}
+        self.slow = deque(maxlen=maxlen)
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            self._started[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        seconds = event.duration_micros / 1e6
+        if started is not None and seconds >= self.threshold:
+            self.slow.append((event.command_name, *started, seconds))
+
+    def failed(self, event):
+        self._started.pop((event.connection_id, event.request_id), None)
+
+
+class SlowQueryLog:
+    """Slow queries grouped by shape, each shape explained once in the background"""
+
+    def __init__(self, threshold_ms=100, max_shapes=500):
+        self.listener = SlowQueryListener(threshold_ms / 1000)
+        self.max_shapes = max_shapes
+        self.shapes = {}
+        self._unexplained = deque()
+
+    def collect(self):
+        slow = self.listener.slow
+        while slow:
+            command_name, database_name, command, seconds = slow.popleft()
+            shape = command_shape(command_name, command)
+            key = json.dumps(shape, sort_keys=True, default=str)
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    continue
+                entry = self.shapes[key] = {
+                    "collection": command.get(command_name),
+                    "command": command_name,
+                    "shape": shape,
+                    "count": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "plan": None,
+                    "collscan": None,
+                }
+                self._unexplained.append((entry, database_name, explainable_command(command_name, command)))
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    async def explain_pending(self, client):
+        while self._unexplained:
+            entry, database_name, command = self._unexplained.popleft()
+            try:
+                explain = await client[database_name].command({"explain": command, "verbosity": "queryPlanner"})
+            except Exception as e:
+                logger.error(f"Error explaining {entry['command']} on {entry['collection']}: {str(e)}")
+                entry["plan"] = []
+                continue
+            entry["plan"] = plan_stages(explain)
+            entry["collscan"] = "COLLSCAN" in entry["plan"]
+            if entry["collscan"]:
+                logger.warning(f"Slow {entry['command']} on {entry['collection']} scans the collection: {json.dumps(entry['shape'], default=str)}")
+
+    async def run(self, client, interval=10):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.collect()
+                await self.explain_pending(client)
+            except Exception as e:
+                logger.error(f"Error processing slow queries: {str(e)}")
+
+    def report(self, limit=20):
+        """Query shapes by total slow time, highest first"""
+        self.collect()
+        entries = sorted(self.shapes.values(), key=lambda entry: entry["total_seconds"], reverse=True)[:limit]
+        return [
+            {
+                "collection": entry["collection"],
+                "command": entry["command"],
+                "shape": json.loads(json.dumps(entry["shape"], default=str)),
+                "count": entry["count"],
+                "total_ms": round(entry["total_seconds"] * 1000, 1),
+                "avg_ms": round(entry["total_seconds"] * 1000 / entry["count"], 1),
+                "max_ms": round(entry["max_seconds"] * 1000, 1),
+                "plan": entry["plan"],
+                "collscan": entry["collscan"],
+            }
+            for entry in entries
+        ]
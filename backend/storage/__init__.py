@@ -0,0 +1,25 @@
+import os
+from pathlib import Path
+
+from .base import Storage
+from .memory import MemoryStorage
+
+
+def create_storage(backend=None, **mongo_options):
+    """Build the storage engine selected by STORAGE_BACKEND (mongo, sqlite or memory)
+
+    ``mongo_options`` are passed to the Motor client and ignored by the other backends.
+    """
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'mongo')).lower()
+    if backend == 'mongo':
+        from .mongo import MongoStorage
+        return MongoStorage(os.environ['MONGO_URL'], os.environ['DB_NAME'], **mongo_options)
+    if backend == 'sqlite':
+        from .sqlite import SqliteStorage
+        return SqliteStorage(os.environ.get('SQLITE_PATH', Path(__file__).parent.parent / 'dreams.db'))
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+__all__ = ["Storage", "MemoryStorage", "create_storage"]
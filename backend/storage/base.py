@@ -0,0 +1,227 @@
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .ops import round_trip
+from .query import normalize_sort, project
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids = {}
+        self.acknowledged = True
+
+
+def decode_write(op):
+    """Turn a pymongo bulk operation into (kind, filter, document, upsert)"""
+    # pymongo keeps the operation arguments in private slots; they have been stable since 3.0,
+    # and tests/storage fails if an upgrade moves them
+    if isinstance(op, InsertOne):
+        return "insert", None, op._doc, False
+    if isinstance(op, (UpdateOne, ReplaceOne)):
+        return "update_one", op._filter, op._doc, op._upsert
+    if isinstance(op, UpdateMany):
+        return "update_many", op._filter, op._doc, op._upsert
+    if isinstance(op, DeleteOne):
+        return "delete_one", op._filter, None, False
+    if isinstance(op, DeleteMany):
+        return "delete_many", op._filter, None, False
+    raise TypeError(f"Unsupported bulk operation: {op!r}")
+
+
+# MongoDB command names for each decoded write, so round trips read the same on every backend
+WRITE_COMMANDS = {
+    "insert": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "delete_one": "delete",
+    "delete_many": "delete",
+}
+
+
+def index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def normalize_index_keys(keys, direction=1):
+    if isinstance(keys, str):
+        return [(keys, direction)]
+    return list(keys)
+
+
+class Cursor:
+    """Motor-style cursor; the query runs when the results are first awaited"""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    async def to_list(self, length=None):
+        limit = self._limit
+        if length:
+            limit = min(limit, length) if limit else length
+        with round_trip("find"):
+            return await self._collection._find(self._query, self._projection, self._sort, self._skip, limit)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self.to_list(None):
+            yield doc
+
+
+class Collection:
+    """Shared Motor-compatible surface; backends implement the underscored primitives"""
+
+    def __init__(self, name):
+        self.name = name
+
+    async def bulk_write(self, requests, ordered=True):
+        with round_trip("bulkWrite"):
+            result, errors = await self._bulk_write([decode_write(op) for op in requests], ordered)
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors,
+                "writeConcernErrors": [],
+                "nInserted": result.inserted_count,
+                "nUpserted": result.upserted_count,
+                "nMatched": result.matched_count,
+                "nModified": result.modified_count,
+                "nRemoved": result.deleted_count,
+                "upserted": [{"index": i, "_id": _id} for i, _id in result.upserted_ids.items()],
+            })
+        return result
+
+    async def _write_one(self, op):
+        write = decode_write(op)
+        with round_trip(WRITE_COMMANDS[write[0]]):
+            result, errors = await self._bulk_write([write], True)
+        if errors:
+            raise DuplicateKeyError(errors[0]["errmsg"], errors[0]["code"])
+        return result
+
+    def find(self, query=None, projection=None):
+        return Cursor(self, query, projection)
+
+    async def find_one(self, query=None, projection=None):
+        with round_trip("find"):
+            docs = await self._find(query or {}, projection, [], 0, 1)
+        return docs[0] if docs else None
+
+    async def insert_one(self, document):
+        await self._write_one(InsertOne(document))
+        return InsertOneResult(document.get("_id"))
+
+    async def insert_many(self, documents, ordered=True):
+        await self.bulk_write([InsertOne(d) for d in documents], ordered=ordered)
+        return InsertManyResult([d.get("_id") for d in documents])
+
+    async def update_one(self, query, update, upsert=False):
+        result = await self._write_one(UpdateOne(query, update, upsert=upsert))
+        return UpdateResult(result.matched_count, result.modified_count, result.upserted_ids.get(0))
+
+    async def update_many(self, query, update, upsert=False):
+        result = await self._write_one(UpdateMany(query, update, upsert=upsert))
+        return UpdateResult(result.matched_count, result.modified_count, result.upserted_ids.get(0))
+
+    async def replace_one(self, query, replacement, upsert=False):
+        result = await self._write_one(ReplaceOne(query, replacement, upsert=upsert))
+        return UpdateResult(result.matched_count, result.modified_count, result.upserted_ids.get(0))
+
+    async def delete_one(self, query):
+        result = await self._write_one(DeleteOne(query))
+        return DeleteResult(result.deleted_count)
+
+    async def delete_many(self, query):
+        result = await self._write_one(DeleteMany(query))
+        return DeleteResult(result.deleted_count)
+
+    async def find_one_and_delete(self, query, projection=None):
+        """Delete the first match and return it; of concurrent callers only one gets a given document
+
+        Not atomic as on MongoDB: this is a find and then a delete by ``_id``, so the
+        returned copy can miss an update that landed in between.
+        """
+        while True:
+            doc = await self.find_one(query)
+            if doc is None:
+                return None
+            if (await self.delete_one({"_id": doc["_id"]})).deleted_count:
+                return project(doc, projection)
+            # Another caller deleted it first; look for the next match
+
+
+class Storage:
+    """Repository for the API's collections (users, dreams, user_settings, achievements, ...)
+
+    Collections are reached as attributes, the same way routes used the Motor database.
+    """
+
+    name = "base"
+
+    def collection(self, name):
+        raise NotImplementedError
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.collection(name)
+
+    def __getitem__(self, name):
+        return self.collection(name)
+
+    async def search_dreams(self, user_id, text, limit=20):
+        raise NotImplementedError
+
+    async def ping(self):
+        return True
+
+    def close(self):
+        pass
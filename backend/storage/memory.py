@@ -0,0 +1,244 @@
+import copy
+import itertools
+
+from pymongo.errors import DuplicateKeyError
+
+from .base import BulkWriteResult, Collection, Storage, index_name, normalize_index_keys
+from .ops import round_trip
+from .query import apply_update, equality_fields, get_path, matches, project, sort_documents, _MISSING
+
+
+def _index_values(value):
+    if value is _MISSING:
+        return [None]
+    if isinstance(value, list):
+        return [v for v in value if not isinstance(v, (dict, list))] or [None]
+    if isinstance(value, dict):
+        return []
+    return [value]
+
+
+def _lookup_values(condition):
+    """Values an indexed equality/$in condition can match, or None if it needs a scan"""
+    if isinstance(condition, dict):
+        if set(condition) == {"$in"}:
+            values = condition["$in"]
+        elif set(condition) == {"$eq"}:
+            values = [condition["$eq"]]
+        else:
+            return None
+    else:
+        values = [condition]
+    if any(isinstance(v, (dict, list)) for v in values):
+        return None
+    return values
+
+
+class MemoryCollection(Collection):
+    def __init__(self, name):
+        super().__init__(name)
+        self._docs = {}
+        self._ids = itertools.count(1)
+        self._indexes = {}  # field -> value -> set of _id
+        self._unique = {}  # index name -> (fields, key -> _id)
+
+    # ---- indexes ----
+
+    async def create_index(self, keys, unique=False, name=None, **kwargs):
+        keys = normalize_index_keys(keys)
+        name = name or index_name(keys)
+        for field, _ in keys:
+            if field not in self._indexes and field != "_id":
+                entries = self._indexes[field] = {}
+                for _id, doc in self._docs.items():
+                    for value in _index_values(get_path(doc, field)):
+                        entries.setdefault(value, set()).add(_id)
+        if unique and name not in self._unique:
+            fields = [field for field, _ in keys]
+            owners = {}
+            for _id, doc in self._docs.items():
+                key = self._unique_key(fields, doc)
+                if key in owners:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+                owners[key] = _id
+            self._unique[name] = (fields, owners)
+        return name
+
+    @staticmethod
+    def _unique_key(fields, doc):
+        key = []
+        for field in fields:
+            value = get_path(doc, field)
+            value = None if value is _MISSING else value
+            key.append(repr(value) if isinstance(value, (dict, list)) else value)
+        return tuple(key)
+
+    def _check_unique(self, doc, _id):
+        for name, (fields, owners) in self._unique.items():
+            owner = owners.get(self._unique_key(fields, doc))
+            if owner is not None and owner != _id:
+                return f"E11000 duplicate key error collection: {self.name} index: {name}"
+        return None
+
+    def _add(self, _id, doc):
+        self._docs[_id] = doc
+        for field, entries in self._indexes.items():
+            for value in _index_values(get_path(doc, field)):
+                entries.setdefault(value, set()).add(_id)
+        for fields, owners in self._unique.values():
+            owners[self._unique_key(fields, doc)] = _id
+
+    def _remove(self, _id):
+        doc = self._docs.pop(_id)
+        for field, entries in self._indexes.items():
+            for value in _index_values(get_path(doc, field)):
+                ids = entries.get(value)
+                if ids:
+                    ids.discard(_id)
+                    if not ids:
+                        del entries[value]
+        for fields, owners in self._unique.values():
+            owners.pop(self._unique_key(fields, doc), None)
+        return doc
+
+    # ---- reads ----
+
+    def _select(self, query):
+        candidates = None
+        for field, condition in query.items():
+            if field == "_id":
+                values = _lookup_values(condition)
+                if values is not None:
+                    candidates = [v for v in values if v in self._docs]
+                    break
+            elif field in self._indexes:
+                values = _lookup_values(condition)
+                if values is not None:
+                    ids = set()
+                    for value in values:
+                        ids.update(self._indexes[field].get(value, ()))
+                    candidates = sorted(ids)
+                    break
+        if candidates is None:
+            docs = self._docs.values()
+        else:
+            docs = (self._docs[_id] for _id in candidates)
+        return [doc for doc in docs if matches(doc, query)]
+
+    async def _find(self, query, projection, sort, skip, limit):
+        docs = self._select(query)
+        if sort:
+            sort_documents(docs, sort)
+        docs = docs[skip:skip + limit] if limit else docs[skip:]
+        return [copy.deepcopy(project(doc, projection)) for doc in docs]
+
+    async def count_documents(self, query, **kwargs):
+        with round_trip("count"):
+            return len(self._select(query))
+
+    async def estimated_document_count(self):
+        with round_trip("count"):
+            return len(self._docs)
+
+    # ---- writes ----
+
+    def _insert(self, document):
+        doc = copy.deepcopy(document)
+        _id = doc.get("_id")
+        if _id is None:
+            _id = next(self._ids)
+            while _id in self._docs:
+                _id = next(self._ids)
+            doc["_id"] = _id
+        elif _id in self._docs:
+            return None, f"E11000 duplicate key error collection: {self.name} index: _id_"
+        error = self._check_unique(doc, _id)
+        if error:
+            return None, error
+        self._add(_id, doc)
+        document["_id"] = _id
+        return _id, None
+
+    def _update(self, query, update, upsert, multi):
+        targets = self._select(query)
+        if not multi:
+            targets = targets[:1]
+        modified = 0
+        for current in targets:
+            doc = copy.deepcopy(current)
+            apply_update(doc, update)
+            if doc == current:
+                continue
+            error = self._check_unique(doc, current["_id"])
+            if error:
+                return len(targets), modified, None, error
+            self._remove(current["_id"])
+            self._add(doc["_id"], doc)
+            modified += 1
+        if targets or not upsert:
+            return len(targets), modified, None, None
+        has_operators = any(k.startswith("$") for k in update)
+        doc = copy.deepcopy(equality_fields(query)) if has_operators else {}
+        apply_update(doc, update, inserting=True)
+        _id, error = self._insert(doc)
+        return 0, 0, _id, error
+
+    def _delete(self, query, multi):
+        targets = self._select(query)
+        if not multi:
+            targets = targets[:1]
+        for doc in targets:
+            self._remove(doc["_id"])
+        return len(targets)
+
+    async def _bulk_write(self, writes, ordered):
+        result = BulkWriteResult()
+        errors = []
+        for index, (kind, query, document, upsert) in enumerate(writes):
+            error = None
+            if kind == "insert":
+                _id, error = self._insert(document)
+                if not error:
+                    result.inserted_count += 1
+            elif kind in ("update_one", "update_many"):
+                matched, modified, upserted_id, error = self._update(query, document, upsert, kind == "update_many")
+                result.matched_count += matched
+                result.modified_count += modified
+                if upserted_id is not None:
+                    result.upserted_count += 1
+                    result.upserted_ids[index] = upserted_id
+            else:
+                result.deleted_count += self._delete(query, kind == "delete_many")
+            if error:
+                errors.append({"index": index, "code": 11000, "errmsg": error})
+                if ordered:
+                    break
+        return result, errors
+
+
+class MemoryStorage(Storage):
+    """Process-local storage for tests, benchmarks and throwaway demo instances"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._collections = {}
+
+    def collection(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    async def search_dreams(self, user_id, text, limit=20):
+        with round_trip("find"):
+            return self._search(user_id, text, limit)
+
+    def _search(self, user_id, text, limit):
+        terms = text.lower().split()
+        results = []
+        for dream in self.collection("dreams")._select({"user_id": user_id}):
+            haystack = f"{dream.get('title', '')} {dream.get('description', '')}".lower()
+            if terms and all(term in haystack for term in terms):
+                results.append(dream)
+        sort_documents(results, [("date", -1)])
+        return [project(copy.deepcopy(d), {"_id": 0}) for d in results[:limit]]
@@ -0,0 +1,41 @@
+import re
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .base import Storage
+from .ops import CommandCounter
+
+
+class MongoStorage(Storage):
+    """MongoDB through Motor; collections are the Motor collections themselves"""
+
+    name = "mongo"
+
+    def __init__(self, url, db_name, **client_options):
+        # Every command is counted towards the round trips of the request that issued it
+        client_options["event_listeners"] = [*client_options.get("event_listeners", []), CommandCounter()]
+        self.client = AsyncIOMotorClient(url, **client_options)
+        self.database = self.client[db_name]
+
+    def collection(self, name):
+        return self.database[name]
+
+    async def search_dreams(self, user_id, text, limit=20):
+        terms = text.split()
+        if not terms:
+            return []
+        query = {"user_id": user_id, "$and": [
+            {"$or": [
+                {"title": {"$regex": re.escape(term), "$options": "i"}},
+                {"description": {"$regex": re.escape(term), "$options": "i"}}
+            ]}
+            for term in terms
+        ]}
+        return await self.database.dreams.find(query, {"_id": 0}).sort("date", -1).to_list(limit)
+
+    async def ping(self):
+        await self.client.admin.command("ping")
+        return True
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,92 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Round trips to the database made by the current request (or any other tracked
+# block). The tracker is a contextvar, so concurrent requests each see their own;
+# Motor copies the context into its worker threads, so the command listener below
+# records into the tracker of the request that issued the command.
+
+_current = contextvars.ContextVar("db_ops", default=None)
+
+
+class DbOps:
+    def __init__(self, parent=None):
+        # (command, seconds); list.append is atomic, so worker threads can record without a lock
+        self.commands = []
+        # Trackers nest (a test around a request, the request itself); outer ones see everything
+        self.parent = parent
+
+    def record(self, command, seconds):
+        ops = self
+        while ops is not None:
+            ops.commands.append((command, seconds))
+            ops = ops.parent
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.commands)
+
+    def summary(self):
+        counts = {}
+        for command, _ in self.commands:
+            counts[command] = counts.get(command, 0) + 1
+        return ", ".join(f"{command}={count}" for command, count in sorted(counts.items()))
+
+
+@contextmanager
+def track_db_ops():
+    ops = DbOps(_current.get())
+    token = _current.set(ops)
+    try:
+        yield ops
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_db_ops(limit, label="block"):
+    """Fail when the block makes more than ``limit`` database round trips"""
+    with track_db_ops() as ops:
+        yield ops
+    if ops.count > limit:
+        raise AssertionError(f"{label} made {ops.count} database round trips, expected at most {limit} ({ops.summary()})")
+
+
+def record_db_op(command, seconds):
+    ops = _current.get()
+    if ops is not None:
+        ops.record(command, seconds)
+
+
+@contextmanager
+def round_trip(command):
+    """Time one database call made by a backend that has no command monitoring of its own"""
+    ops = _current.get()
+    if ops is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ops.record(command, time.perf_counter() - start)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """pymongo listener recording each command into the issuing request's tracker"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_db_op(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record_db_op(event.command_name, event.duration_micros / 1e6)
@@ -0,0 +1,234 @@
+import copy
+import re
+
+# Evaluation of the MongoDB query/update subset the API uses, shared by the
+# embedded backends so they behave like Motor for the routes in server.py.
+
+_MISSING = object()
+
+
+def get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _candidates(value):
+    # A condition on an array field matches the array itself or any element
+    if value is _MISSING:
+        return [None]
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _comparable(a, b):
+    if a is None or b is None:
+        return False
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return True
+    return type(a) is type(b)
+
+
+def _match_operator(value, op, arg):
+    if op == "$eq":
+        return any(c == arg for c in _candidates(value))
+    if op == "$ne":
+        return not any(c == arg for c in _candidates(value))
+    if op == "$in":
+        return any(c == a for c in _candidates(value) for a in arg)
+    if op == "$nin":
+        return not any(c == a for c in _candidates(value) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for c in _candidates(value):
+            if not _comparable(c, arg):
+                continue
+            if (op == "$gt" and c > arg) or (op == "$gte" and c >= arg) \
+                    or (op == "$lt" and c < arg) or (op == "$lte" and c <= arg):
+                return True
+        return False
+    if op == "$regex":
+        pattern = arg if hasattr(arg, "search") else re.compile(arg)
+        return any(isinstance(c, str) and pattern.search(c) for c in _candidates(value))
+    if op == "$size":
+        return isinstance(value, list) and len(value) == arg
+    if op == "$not":
+        return not _match_condition(value, arg)
+    raise ValueError(f"Unsupported query operator: {op}")
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        if "$regex" in condition:
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            condition = dict(condition)
+            condition["$regex"] = re.compile(condition["$regex"], flags)
+            condition.pop("$options", None)
+        return all(_match_operator(value, op, arg) for op, arg in condition.items())
+    return _match_operator(value, "$eq", condition)
+
+
+def matches(doc, query):
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, q) for q in condition):
+                return False
+        elif not _match_condition(get_path(doc, key), condition):
+            return False
+    return True
+
+
+def equality_fields(query):
+    """Top-level equality conditions of a filter, used to seed upserted documents"""
+    fields = {}
+    for key, condition in (query or {}).items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if "$eq" in condition:
+                fields[key] = condition["$eq"]
+        else:
+            fields[key] = condition
+    return fields
+
+
+def apply_update(doc, update, inserting=False):
+    if not any(k.startswith("$") for k in update):
+        # Replacement document
+        replacement = copy.deepcopy(update)
+        if "_id" in doc:
+            replacement["_id"] = doc["_id"]
+        doc.clear()
+        doc.update(replacement)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            if op == "$set":
+                set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op == "$inc":
+                current = get_path(doc, path)
+                set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op in ("$max", "$min"):
+                current = get_path(doc, path)
+                if current is _MISSING or (op == "$max" and arg > current) or (op == "$min" and arg < current):
+                    set_path(doc, path, arg)
+            elif op in ("$push", "$addToSet"):
+                current = get_path(doc, path)
+                items = list(current) if isinstance(current, list) else []
+                values = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                for value in values:
+                    if op == "$push" or value not in items:
+                        items.append(copy.deepcopy(value))
+                set_path(doc, path, items)
+            elif op == "$pull":
+                current = get_path(doc, path)
+                if isinstance(current, list):
+                    set_path(doc, path, [v for v in current if not _match_condition(v, arg)])
+            else:
+                raise ValueError(f"Unsupported update operator: {op}")
+
+
+def project(doc, projection):
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and any(fields.values()):
+        result = {}
+        for path in fields:
+            value = get_path(doc, path)
+            if value is not _MISSING:
+                set_path(result, path, value)
+    else:
+        result = copy.copy(doc)
+        for path in fields:
+            unset_path(result, path)
+    if include_id and "_id" in doc:
+        result["_id"] = doc["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+
+def _type_rank(value):
+    # BSON comparison order for the types the API stores
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    return 9
+
+
+class _SortKey:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        a, b = self.value, other.value
+        ra, rb = _type_rank(a), _type_rank(b)
+        if ra != rb:
+            return ra < rb
+        if ra == 1:
+            return False
+        return a < b
+
+    def __eq__(self, other):
+        return not self < other and not other < self
+
+
+def normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return list(key_or_list)
+
+
+def sort_documents(docs, sort_spec):
+    # Stable sorts applied from the least significant key
+    for key, direction in reversed(sort_spec):
+        docs.sort(key=lambda d: _SortKey(get_path(d, key)), reverse=direction < 0)
+    return docs
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import DuplicateKeyError
+
+from .base import BulkWriteResult, Collection, Storage, index_name, normalize_index_keys
+from .ops import round_trip
+from .query import apply_update, equality_fields, get_path, matches, project, sort_documents
+
+# Documents are stored as JSON text, one table per collection. Indexed fields get
+# expression indexes on json_extract() so equality/range filters and sorts on them
+# run in SQLite; anything else is evaluated in Python on the narrowed rows.
+# Sorts done in SQL follow SQLite's order, which matches BSON's for null, missing,
+# numbers and strings but puts booleans among the numbers (as 0/1) and objects and
+# arrays among the strings (as JSON text); the API only sorts on fields holding one
+# scalar type. tests/storage checks these semantics against the memory backend.
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+_INDEXED_PATH = re.compile(r"json_extract\(doc, '\$\.([A-Za-z0-9_.]+)'\)")
+_SCALARS = (str, int, float, bool)
+
+# Full-text indexed fields per collection
+FTS_FIELDS = {"dreams": ("title", "description")}
+
+
+def _field_expr(field):
+    if field == "_id":
+        return "_id"
+    if not _FIELD.match(field):
+        raise ValueError(f"Unsupported field name: {field}")
+    return f"json_extract(doc, '$.{field}')"
+
+
+def _compile_condition(expr, condition, params):
+    if isinstance(condition, _SCALARS):
+        params.append(condition)
+        return f"{expr} = ?"
+    if condition is None:
+        return f"{expr} IS NULL"
+    if not isinstance(condition, dict) or not condition:
+        return None
+    clauses = []
+    for op, arg in condition.items():
+        if op in ("$eq", "$gt", "$gte", "$lt", "$lte") and isinstance(arg, _SCALARS):
+            sql_op = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+            clauses.append(f"{expr} {sql_op} ?")
+            params.append(arg)
+        elif op == "$in" and all(isinstance(v, _SCALARS) for v in arg):
+            if not arg:
+                clauses.append("0")
+            else:
+                clauses.append(f"{expr} IN ({', '.join('?' * len(arg))})")
+                params.extend(arg)
+        else:
+            return None
+    return " AND ".join(clauses)
+
+
+class SqliteCollection(Collection):
+    def __init__(self, storage, name):
+        if not _NAME.match(name):
+            raise ValueError(f"Unsupported collection name: {name}")
+        super().__init__(name)
+        self._storage = storage
+        self._ready = False
+        self._indexed = {"_id"}
+        self._array_fields = set()
+        self._fts = FTS_FIELDS.get(name)
+
+    # ---- schema ----
+
+    def _ensure(self, conn):
+        if self._ready:
+            return
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.name}" (_id INTEGER PRIMARY KEY AUTOINCREMENT, doc TEXT NOT NULL)')
+        if self._fts:
+            columns = ", ".join(self._fts)
+            conn.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.name}_fts" USING fts5({columns}, tokenize="porter unicode61")')
+        for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (self.name,)):
+            self._indexed.update(_INDEXED_PATH.findall(sql))
+        for (field,) in conn.execute("SELECT field FROM _array_fields WHERE collection = ?", (self.name,)):
+            self._array_fields.add(field)
+        self._ready = True
+
+    def _note_arrays(self, conn, doc):
+        # Array-valued fields can't be matched with a plain SQL comparison
+        for field in self._indexed:
+            if field not in self._array_fields and isinstance(get_path(doc, field), list):
+                self._array_fields.add(field)
+                conn.execute("INSERT OR IGNORE INTO _array_fields (collection, field) VALUES (?, ?)", (self.name, field))
+
+    async def create_index(self, keys, unique=False, name=None, **kwargs):
+        keys = normalize_index_keys(keys)
+        name = f"{self.name}_{name or index_name(keys)}".replace(".", "_")
+        return await self._storage.run(self._create_index_sync, keys, unique, name)
+
+    def _create_index_sync(self, keys, unique, name):
+        conn = self._storage.conn
+        self._ensure(conn)
+        columns = ", ".join(f"{_field_expr(field)}{' DESC' if direction == -1 else ''}" for field, direction in keys)
+        try:
+            conn.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ON "{self.name}" ({columns})')
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name} ({e})", 11000)
+        for field, _ in keys:
+            if field == "_id" or field in self._indexed:
+                continue
+            self._indexed.add(field)
+            row = conn.execute(f"SELECT 1 FROM \"{self.name}\" WHERE json_type(doc, '$.{field}') = 'array' LIMIT 1").fetchone()
+            if row:
+                self._array_fields.add(field)
+                conn.execute("INSERT OR IGNORE INTO _array_fields (collection, field) VALUES (?, ?)", (self.name, field))
+        return name
+
+    # ---- reads ----
+
+    def _compile(self, query):
+        clauses, params, complete = [], [], True
+        for field, condition in query.items():
+            if field not in self._indexed or field in self._array_fields:
+                complete = False
+                continue
+            sql = _compile_condition(_field_expr(field), condition, params)
+            if sql is None:
+                complete = False
+            else:
+                clauses.append(sql)
+        where = " AND ".join(clauses) or "1"
+        return where, params, complete
+
+    @staticmethod
+    def _load(row):
+        doc = json.loads(row[1])
+        doc["_id"] = row[0]
+        return doc
+
+    def _find_sync(self, query, projection, sort, skip, limit):
+        conn = self._storage.conn
+        self._ensure(conn)
+        where, params, complete = self._compile(query)
+        sql = f'SELECT _id, doc FROM "{self.name}" WHERE {where}'
+        if complete:
+            if sort:
+                order = ", ".join(f"{_field_expr(f)} {'DESC' if d < 0 else 'ASC'}" for f, d in sort)
+                sql += f" ORDER BY {order}, _id"
+            if limit or skip:
+                sql += " LIMIT ? OFFSET ?"
+                params = params + [limit or -1, skip]
+            docs = [self._load(row) for row in conn.execute(sql, params)]
+        else:
+            docs = [doc for doc in map(self._load, conn.execute(sql, params)) if matches(doc, query)]
+            if sort:
+                sort_documents(docs, sort)
+            docs = docs[skip:skip + limit] if limit else docs[skip:]
+        return [project(doc, projection) for doc in docs]
+
+    async def _find(self, query, projection, sort, skip, limit):
+        return await self._storage.run(self._find_sync, query, projection, sort, skip, limit)
+
+    def _count_sync(self, query):
+        conn = self._storage.conn
+        self._ensure(conn)
+        where, params, complete = self._compile(query)
+        if complete:
+            return conn.execute(f'SELECT COUNT(*) FROM "{self.name}" WHERE {where}', params).fetchone()[0]
+        rows = conn.execute(f'SELECT _id, doc FROM "{self.name}" WHERE {where}', params)
+        return sum(1 for doc in map(self._load, rows) if matches(doc, query))
+
+    async def count_documents(self, query, **kwargs):
+        with round_trip("count"):
+            return await self._storage.run(self._count_sync, query)
+
+    async def estimated_document_count(self):
+        with round_trip("count"):
+            return await self._storage.run(self._count_sync, {})
+
+    # ---- writes ----
+
+    def _index_text(self, conn, _id, doc):
+        if self._fts:
+            conn.execute(f'DELETE FROM "{self.name}_fts" WHERE rowid = ?', (_id,))
+            values = [str(doc.get(field) or "") for field in self._fts]
+            conn.execute(f'INSERT INTO "{self.name}_fts" (rowid, {", ".join(self._fts)}) VALUES (?, {", ".join("?" * len(values))})', [_id] + values)
+
+    def _insert_sync(self, conn, document):
+        body = {k: v for k, v in document.items() if k != "_id"}
+        try:
+            if document.get("_id") is not None:
+                cursor = conn.execute(f'INSERT INTO "{self.name}" (_id, doc) VALUES (?, ?)', (document["_id"], json.dumps(body)))
+            else:
+                cursor = conn.execute(f'INSERT INTO "{self.name}" (doc) VALUES (?)', (json.dumps(body),))
+        except sqlite3.IntegrityError as e:
+            return None, f"E11000 duplicate key error collection: {self.name} ({e})"
+        _id = cursor.lastrowid
+        document["_id"] = _id
+        self._note_arrays(conn, body)
+        self._index_text(conn, _id, body)
+        return _id, None
+
+    def _select_for_write(self, conn, query, multi):
+        where, params, complete = self._compile(query)
+        sql = f'SELECT _id, doc FROM "{self.name}" WHERE {where} ORDER BY _id'
+        if complete and not multi:
+            sql += " LIMIT 1"
+        docs = [doc for doc in map(self._load, conn.execute(sql, params)) if matches(doc, query)]
+        return docs if multi else docs[:1]
+
+    def _update_sync(self, conn, query, update, upsert, multi):
+        targets = self._select_for_write(conn, query, multi)
+        modified = 0
+        for current in targets:
+            doc = json.loads(json.dumps(current))
+            apply_update(doc, update)
+            if doc == current:
+                continue
+            body = {k: v for k, v in doc.items() if k != "_id"}
+            try:
+                conn.execute(f'UPDATE "{self.name}" SET doc = ? WHERE _id = ?', (json.dumps(body), current["_id"]))
+            except sqlite3.IntegrityError as e:
+                return len(targets), modified, None, f"E11000 duplicate key error collection: {self.name} ({e})"
+            self._note_arrays(conn, body)
+            self._index_text(conn, current["_id"], body)
+            modified += 1
+        if targets or not upsert:
+            return len(targets), modified, None, None
+        has_operators = any(k.startswith("$") for k in update)
+        doc = json.loads(json.dumps(equality_fields(query))) if has_operators else {}
+        apply_update(doc, update, inserting=True)
+        _id, error = self._insert_sync(conn, doc)
+        return 0, 0, _id, error
+
+    def _delete_sync(self, conn, query, multi):
+        ids = [doc["_id"] for doc in self._select_for_write(conn, query, multi)]
+        for _id in ids:
+            conn.execute(f'DELETE FROM "{self.name}" WHERE _id = ?', (_id,))
+            if self._fts:
+                conn.execute(f'DELETE FROM "{self.name}_fts" WHERE rowid = ?', (_id,))
+        return len(ids)
+
+    def _bulk_write_sync(self, writes, ordered):
+        conn = self._storage.conn
+        self._ensure(conn)
+        result = BulkWriteResult()
+        errors = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for index, (kind, query, document, upsert) in enumerate(writes):
+                error = None
+                if kind == "insert":
+                    _id, error = self._insert_sync(conn, document)
+                    if not error:
+                        result.inserted_count += 1
+                elif kind in ("update_one", "update_many"):
+                    matched, modified, upserted_id, error = self._update_sync(conn, query, document, upsert, kind == "update_many")
+                    result.matched_count += matched
+                    result.modified_count += modified
+                    if upserted_id is not None:
+                        result.upserted_count += 1
+                        result.upserted_ids[index] = upserted_id
+                else:
+                    result.deleted_count += self._delete_sync(conn, query, kind == "delete_many")
+                if error:
+                    errors.append({"index": index, "code": 11000, "errmsg": error})
+                    if ordered:
+                        break
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Like MongoDB, writes before a failed ordered operation stay applied
+        conn.execute("COMMIT")
+        return result, errors
+
+    async def _bulk_write(self, writes, ordered):
+        return await self._storage.run(self._bulk_write_sync, writes, ordered)
+
+
+class SqliteStorage(Storage):
+    """Embedded single-file storage for single-node deployments"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = str(path)
+        # One connection owned by one thread keeps SQLite access serialized off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._collections = {}
+        self.conn = self._executor.submit(self._connect).result()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("CREATE TABLE IF NOT EXISTS _array_fields (collection TEXT NOT NULL, field TEXT NOT NULL, PRIMARY KEY (collection, field))")
+        return conn
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def collection(self, name):
+        if name not in self._collections:
+            self._collections[name] = SqliteCollection(self, name)
+        return self._collections[name]
+
+    def _search_sync(self, user_id, text, limit):
+        dreams = self.collection("dreams")
+        dreams._ensure(self.conn)
+        terms = re.findall(r"\w+", text)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = self.conn.execute(
+            'SELECT d._id, d.doc FROM dreams_fts JOIN dreams d ON d._id = dreams_fts.rowid '
+            "WHERE dreams_fts MATCH ? AND json_extract(d.doc, '$.user_id') = ? "
+            'ORDER BY bm25(dreams_fts) LIMIT ?',
+            (match, user_id, limit)
+        )
+        return [project(SqliteCollection._load(row), {"_id": 0}) for row in rows]
+
+    async def search_dreams(self, user_id, text, limit=20):
+        with round_trip("find"):
+            return await self.run(self._search_sync, user_id, text, limit)
+
+    async def ping(self):
+        return await self.run(lambda: self.conn.execute("SELECT 1").fetchone() is not None)
+
+    def close(self):
+        self._executor.submit(self.conn.close).result()
+        self._executor.shutdown()
@@ -0,0 +1,162 @@
+import hashlib
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Trending items over sliding windows of hourly buckets. Each bucket holds a
+# count-min sketch; every window keeps the running sum of its buckets plus a small
+# candidate set of its current heaviest hitters, so reads never touch the buckets.
+
+WINDOWS = {"24h": 24, "7d": 24 * 7}
+
+
+class SlidingTopK:
+    def __init__(self, windows=WINDOWS, width=1024, depth=4, k=20):
+        self.windows = dict(windows)
+        self.span = max(self.windows.values())
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self._rows = np.arange(depth)
+        self._buckets = np.zeros((self.span, depth, width), dtype=np.int32)
+        self._bucket_hours = np.full(self.span, -1, dtype=np.int64)
+        self._totals = {name: np.zeros((depth, width), dtype=np.int64) for name in self.windows}
+        self._candidates = {name: {} for name in self.windows}
+        self._ranked = {name: None for name in self.windows}
+        self._hour = None
+        self._cells = {}
+
+    def _columns(self, item):
+        columns = self._cells.get(item)
+        if columns is None:
+            digest = hashlib.blake2b(item.encode(), digest_size=4 * self.depth).digest()
+            columns = np.frombuffer(digest, dtype=np.uint32) % self.width
+            if len(self._cells) > 100000:
+                self._cells.clear()
+            self._cells[item] = columns
+        return columns
+
+    def _estimate(self, name, item):
+        return int(self._totals[name][self._rows, self._columns(item)].min())
+
+    def advance(self, hour):
+        """Move the window edge forward to ``hour``, expiring buckets that fall out of each window"""
+        if self._hour is None or hour - self._hour >= self.span:
+            self._buckets[:] = 0
+            self._bucket_hours[:] = -1
+            for name in self.windows:
+                self._totals[name][:] = 0
+                self._candidates[name].clear()
+                self._ranked[name] = None
+            self._hour = hour
+            return
+        if hour <= self._hour:
+            return
+        while self._hour < hour:
+            self._hour += 1
+            for name, hours in self.windows.items():
+                leaving = self._hour - hours
+                slot = leaving % self.span
+                if self._bucket_hours[slot] == leaving:
+                    self._totals[name] -= self._buckets[slot]
+            slot = self._hour % self.span
+            self._buckets[slot] = 0
+            self._bucket_hours[slot] = self._hour
+        # Estimates only shrink on expiry; refresh the candidates against the new totals
+        for name in self.windows:
+            candidates = self._candidates[name]
+            for item in list(candidates):
+                estimate = self._estimate(name, item)
+                if estimate > 0:
+                    candidates[item] = estimate
+                else:
+                    del candidates[item]
+            self._ranked[name] = None
+
+    def add(self, item, timestamp, delta=1):
+        hour = int(timestamp // 3600)
+        self.advance(hour)
+        age = self._hour - hour
+        if age < 0 or age >= self.span:
+            return
+        slot = hour % self.span
+        if self._bucket_hours[slot] != hour:
+            self._buckets[slot] = 0
+            self._bucket_hours[slot] = hour
+        columns = self._columns(item)
+        self._buckets[slot][self._rows, columns] += delta
+        for name, hours in self.windows.items():
+            if age < hours:
+                self._totals[name][self._rows, columns] += delta
+                self._offer(name, item)
+
+    def _offer(self, name, item):
+        candidates = self._candidates[name]
+        estimate = self._estimate(name, item)
+        if item in candidates or len(candidates) < self.k:
+            if estimate > 0:
+                candidates[item] = estimate
+            else:
+                candidates.pop(item, None)
+        else:
+            weakest = min(candidates, key=candidates.get)
+            if estimate > candidates[weakest]:
+                del candidates[weakest]
+                candidates[item] = estimate
+            else:
+                return
+        self._ranked[name] = None
+
+    def top(self, name, now=None):
+        self.advance(int((now or time.time()) // 3600))
+        ranked = self._ranked[name]
+        if ranked is None:
+            ranked = self._ranked[name] = sorted(self._candidates[name].items(), key=lambda x: (-x[1], x[0]))
+        return ranked
+
+
+class TrendingService:
+    """Trending tags and themes across publicly shared dreams"""
+
+    def __init__(self, width=1024, depth=4, k=20):
+        self.tags = SlidingTopK(width=width, depth=depth, k=k)
+        self.themes = SlidingTopK(width=width, depth=depth, k=k)
+
+    def record(self, dream, delta=1):
+        timestamp = _timestamp(dream.get("shared_at"))
+        if timestamp is None:
+            return
+        for tag in _names(dream.get("tags", [])):
+            self.tags.add(tag, timestamp, delta)
+        for theme in _names(dream.get("themes", [])):
+            self.themes.add(theme, timestamp, delta)
+
+    def top(self, window, limit=10):
+        return {
+            "tags": [{"name": n, "count": c} for n, c in self.tags.top(window)[:limit]],
+            "themes": [{"name": n, "count": c} for n, c in self.themes.top(window)[:limit]],
+        }
+
+    def rebuild(self, dreams):
+        fresh = TrendingService(self.tags.width, self.tags.depth, self.tags.k)
+        now = time.time()
+        fresh.tags.advance(int(now // 3600))
+        fresh.themes.advance(int(now // 3600))
+        for dream in dreams:
+            fresh.record(dream)
+        self.tags, self.themes = fresh.tags, fresh.themes
+
+
+def _names(values):
+    """Distinct trimmed, lowercased names, so "Flying" and "flying " count as one"""
+    return {value.strip().lower() for value in values if value.strip()}
+
+
+def _timestamp(iso):
+    if not iso:
+        return None
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except ValueError:
+        return None
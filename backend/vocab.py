@@ -0,0 +1,90 @@
+import bisect
+import heapq
+
+from cache import LRUCache
+
+KINDS = ("tag", "theme")
+
+
+class PrefixIndex:
+    """Sorted term list with frequencies; a prefix lookup is a bisected slice"""
+
+    def __init__(self):
+        self._keys = []
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, term, delta=1):
+        count = self._counts.get(term, 0) + delta
+        if count > 0:
+            if term not in self._counts:
+                bisect.insort(self._keys, (term.lower(), term))
+            self._counts[term] = count
+        elif term in self._counts:
+            del self._counts[term]
+            key = (term.lower(), term)
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def suggest(self, prefix, limit=10):
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + "\uffff",)) if prefix else len(self._keys)
+        matches = self._keys[start:end]
+        best = heapq.nsmallest(limit, matches, key=lambda key: (-self._counts[key[1]], key))
+        return [{"name": term, "count": self._counts[term]} for _, term in best]
+
+
+class UserVocabulary:
+    """A user's tags and themes, each as a prefix index"""
+
+    def __init__(self, dreams=()):
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        for dream in dreams:
+            self.apply(dream)
+
+    def apply(self, dream, delta=1):
+        for kind, field in (("tag", "tags"), ("theme", "themes")):
+            for term in set(dream.get(field, [])):
+                self.indexes[kind].add(term, delta)
+
+    def suggest(self, kind, prefix, limit=10):
+        return self.indexes[kind].suggest(prefix, limit)
+
+
+class VocabularyCache:
+    """LRU of per-user vocabularies, kept current by applying each dream write"""
+
+    def __init__(self, maxsize=1000, ttl=None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._loading = {}
+
+    async def get(self, user_id, load):
+        vocabulary = self._cache.get(user_id)
+        if vocabulary is not None:
+            return vocabulary
+        # Writes landing while the load is in flight mark it stale; a stale result
+        # still answers this request but is not cached
+        load_state = {"stale": False}
+        self._loading.setdefault(user_id, []).append(load_state)
+        try:
+            vocabulary = UserVocabulary(await load())
+            if not load_state["stale"]:
+                self._cache.set(user_id, vocabulary)
+        finally:
+            self._loading[user_id].remove(load_state)
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+        return vocabulary
+
+    def apply(self, user_id, before, after):
+        for load_state in self._loading.get(user_id, ()):
+            load_state["stale"] = True
+        vocabulary = self._cache.get(user_id)
+        if vocabulary is None:
+            return
+        if before:
+            vocabulary.apply(before, -1)
+        if after:
+            vocabulary.apply(after)
@@ -12,8 +12,8 @@ class DreamJournalAPITester:
         self.tests_passed = 0
         self.created_dream_id = None
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
-        """Run a single API test"""
+    def run_test(self, name, method, endpoint, expected_status, data=None, headers=None, max_db_ops=None):
+        """Run a single API test, optionally failing when it takes more than max_db_ops database round trips"""
         url = f"{self.base_url}/{endpoint}"
         test_headers = {'Content-Type': 'application/json'}
         
@@ -38,6 +38,11 @@ class DreamJournalAPITester:
                 response = requests.delete(url, headers=test_headers, timeout=30)
 
             success = response.status_code == expected_status
+            if success and max_db_ops is not None:
+                db_ops = int(response.headers.get('X-DB-Ops', -1))
+                if not 0 <= db_ops <= max_db_ops:
+                    print(f"❌ Failed - Made {db_ops} database round trips, budget is {max_db_ops}")
+                    return False, {}
             if success:
                 self.tests_passed += 1
                 print(f"✅ Passed - Status: {response.status_code}")
@@ -181,7 +186,8 @@ class DreamJournalAPITester:
             "Get All Dreams",
             "GET",
             "dreams",
-            200
+            200,
+            max_db_ops=4
         )
         
         return success and isinstance(response, list)
@@ -196,7 +202,8 @@ class DreamJournalAPITester:
             "Get Dream by ID",
             "GET",
             f"dreams/{self.created_dream_id}",
-            200
+            200,
+            max_db_ops=3
         )
         
         return success and response.get('id') == self.created_dream_id
@@ -250,7 +257,8 @@ class DreamJournalAPITester:
             "Get User Stats",
             "GET",
             "stats",
-            200
+            200,
+            max_db_ops=12
         )
         
         expected_fields = ['total_dreams', 'dreams_this_week', 'top_tags', 'top_themes', 'current_streak', 'longest_streak']
@@ -423,7 +431,8 @@ class DreamJournalAPITester:
             "Get Public Dreams",
             "GET",
             "public/dreams?limit=10",
-            200
+            200,
+            max_db_ops=2
         )
         
         self.token = original_token
@@ -439,7 +448,8 @@ class DreamJournalAPITester:
             "Get Achievements",
             "GET",
             "achievements",
-            200
+            200,
+            max_db_ops=30
         )
         
         expected_fields = ['achievements', 'total_unlocked', 'total_achievements']
@@ -1,3 +1,5 @@
+import { useEffect } from 'react';
+import axios from 'axios';
 import { Outlet, NavLink, useNavigate } from 'react-router-dom';
 import { useAuth } from '@/context/AuthContext';
 import { Home, BookOpen, PlusCircle, LogOut, Moon, User, Calendar, Brain, Globe, Settings, Trophy } from 'lucide-react';
@@ -10,11 +12,54 @@ import {
   DropdownMenuTrigger,
 } from '@/components/ui/dropdown-menu';
 import TwinklingStars from '@/components/TwinklingStars';
+import { toast } from 'sonner';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
 
 const Layout = () => {
-  const { user, logout } = useAuth();
+  const { user, token, logout, getAuthHeaders } = useAuth();
   const navigate = useNavigate();
 
+  // Live events from the server. EventSource cannot send headers, so it opens with a
+  // short-lived stream token; once that has expired a dropped stream fails to reconnect
+  // on its own, and a new token is fetched for it.
+  useEffect(() => {
+    if (!token) return;
+    let source = null;
+    let retry = null;
+    let stopped = false;
+
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${API_URL}/events/token`, null, getAuthHeaders());
+        if (stopped) return;
+        source = new EventSource(`${API_URL}/events?token=${encodeURIComponent(response.data.token)}`);
+        source.addEventListener('achievement_unlocked', (e) => {
+          const ach = JSON.parse(e.data);
+          toast.success(`${ach.icon} Achievement Unlocked: ${ach.name}!`, {
+            description: ach.description,
+            duration: 5000
+          });
+        });
+        source.onerror = () => {
+          if (source.readyState === EventSource.CLOSED && !stopped) {
+            retry = setTimeout(connect, 5000);
+          }
+        };
+      } catch (error) {
+        // A rejected login token will not get better by retrying
+        if (!stopped && error.response?.status !== 401) retry = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, [token]);
+
   const handleLogout = () => {
     logout();
     navigate('/login');
@@ -5,7 +5,6 @@ import axios from 'axios';
 import { format } from 'date-fns';
 import { PlusCircle, BookOpen, TrendingUp, Sparkles, ChevronRight, Flame, Calendar, Brain, Download, Trophy } from 'lucide-react';
 import { Button } from '@/components/ui/button';
-import { toast } from 'sonner';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
 
@@ -14,32 +13,17 @@ const Dashboard = () => {
   const [stats, setStats] = useState(null);
   const [recentDreams, setRecentDreams] = useState([]);
   const [loading, setLoading] = useState(true);
-  const [achievementStats, setAchievementStats] = useState({ total_unlocked: 0, total_achievements: 0 });
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [statsRes, dreamsRes, achievementsRes] = await Promise.all([
+        // Newly unlocked achievements arrive as live events (see Layout)
+        const [statsRes, dreamsRes] = await Promise.all([
           axios.get(`${API_URL}/stats`, getAuthHeaders()),
-          axios.get(`${API_URL}/dreams`, getAuthHeaders()),
-          axios.get(`${API_URL}/achievements/check`, getAuthHeaders())
+          axios.get(`${API_URL}/dreams`, getAuthHeaders())
         ]);
         setStats(statsRes.data);
         setRecentDreams(dreamsRes.data.slice(0, 3));
-        setAchievementStats({
-          total_unlocked: achievementsRes.data.total_unlocked,
-          total_achievements: achievementsRes.data.total_achievements
-        });
-        
-        // Show toast for newly unlocked achievements
-        if (achievementsRes.data.newly_unlocked?.length > 0) {
-          achievementsRes.data.newly_unlocked.forEach(ach => {
-            toast.success(`${ach.icon} Achievement Unlocked: ${ach.name}!`, {
-              description: ach.description,
-              duration: 5000
-            });
-          });
-        }
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
       } finally {
@@ -146,14 +130,14 @@ const Dashboard = () => {
               <div>
                 <h3 className="font-medium text-white group-hover:text-amber-300 transition-colors">Achievements</h3>
                 <p className="text-sm text-slate-400">
-                  {achievementStats.total_unlocked} of {achievementStats.total_achievements} unlocked
+                  {stats?.achievements_unlocked || 0} of {stats?.total_achievements || 0} unlocked
                 </p>
               </div>
             </div>
             <div className="flex items-center gap-3">
               <div className="text-right">
                 <span className="text-2xl font-serif text-amber-400">
-                  {Math.round((achievementStats.total_unlocked / achievementStats.total_achievements) * 100)}%
+                  {stats?.total_achievements ? Math.round((stats.achievements_unlocked / stats.total_achievements) * 100) : 0}%
                 </span>
               </div>
               <ChevronRight className="w-5 h-5 text-slate-600 group-hover:text-amber-400 transition-colors" />
@@ -36,6 +36,7 @@ const DreamForm = () => {
   const [tags, setTags] = useState([]);
   const [themes, setThemes] = useState([]);
   const [newTag, setNewTag] = useState('');
+  const [tagSuggestions, setTagSuggestions] = useState([]);
   const [isLucid, setIsLucid] = useState(false);
 
   useEffect(() => {
@@ -61,9 +62,29 @@ const DreamForm = () => {
     }
   }, [id, isEditing, getAuthHeaders, navigate]);
 
-  const handleAddTag = () => {
-    if (newTag.trim() && !tags.includes(newTag.trim())) {
-      setTags([...tags, newTag.trim()]);
+  useEffect(() => {
+    const prefix = newTag.trim();
+    if (!prefix) {
+      setTagSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API_URL}/tags/suggest`, {
+          ...getAuthHeaders(),
+          params: { prefix, kind: 'tag', limit: 6 }
+        });
+        setTagSuggestions(response.data.suggestions.map(s => s.name));
+      } catch (error) {
+        setTagSuggestions([]);
+      }
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [newTag, getAuthHeaders]);
+
+  const handleAddTag = (tag = newTag) => {
+    if (tag.trim() && !tags.includes(tag.trim())) {
+      setTags([...tags, tag.trim()]);
       setNewTag('');
     }
   };
@@ -104,8 +125,12 @@ const DreamForm = () => {
         await axios.put(`${API_URL}/dreams/${id}`, dreamData, getAuthHeaders());
         toast.success('Dream updated successfully');
       } else {
-        await axios.post(`${API_URL}/dreams`, dreamData, getAuthHeaders());
-        toast.success('Dream recorded successfully');
+        const response = await axios.post(`${API_URL}/dreams`, dreamData, getAuthHeaders());
+        if (response.data.possible_duplicate_of) {
+          toast.warning('Dream recorded, but it looks very similar to one you already have');
+        } else {
+          toast.success('Dream recorded successfully');
+        }
       }
       navigate('/dreams');
     } catch (error) {
@@ -212,7 +237,7 @@ const DreamForm = () => {
             />
             <Button
               type="button"
-              onClick={handleAddTag}
+              onClick={() => handleAddTag()}
               variant="outline"
               className="border-white/20 text-white hover:bg-white/10 rounded-xl"
               data-testid="add-tag-button"
@@ -220,6 +245,21 @@ const DreamForm = () => {
               <Plus className="w-4 h-4" />
             </Button>
           </div>
+          {tagSuggestions.some(s => !tags.includes(s)) && (
+            <div className="flex flex-wrap gap-2" data-testid="tag-suggestions">
+              {tagSuggestions.filter(s => !tags.includes(s)).map((suggestion) => (
+                <button
+                  key={suggestion}
+                  type="button"
+                  onClick={() => handleAddTag(suggestion)}
+                  className="px-3 py-1 rounded-full text-xs border border-white/10 text-slate-400 hover:border-purple-500/50 hover:text-white transition-all"
+                  data-testid={`tag-suggestion-${suggestion}`}
+                >
+                  {suggestion}
+                </button>
+              ))}
+            </div>
+          )}
           {tags.length > 0 && (
             <div className="flex flex-wrap gap-2" data-testid="tags-list">
               {tags.map((tag, i) => (
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useAuth } from '@/context/AuthContext';
 import axios from 'axios';
-import { TrendingUp, Brain, MessageCircle, BarChart3, Sparkles } from 'lucide-react';
+import { TrendingUp, Brain, MessageCircle, BarChart3, Sparkles, Heart } from 'lucide-react';
 import { Progress } from '@/components/ui/progress';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
@@ -167,6 +167,48 @@ const PatternAnalysis = () => {
         )}
       </section>
 
+      {/* Emotional Tone */}
+      {analysis.emotional_tone?.length > 0 && (
+        <section className="glass rounded-2xl p-6 md:p-8">
+          <div className="flex items-center gap-3 mb-6">
+            <div className="w-10 h-10 rounded-full bg-rose-500/20 flex items-center justify-center">
+              <Heart className="w-5 h-5 text-rose-400" />
+            </div>
+            <div>
+              <h2 className="font-serif text-xl text-white">Emotional Tone</h2>
+              <p className="text-sm text-slate-400">How your dreams have felt month by month</p>
+            </div>
+          </div>
+
+          <div className="space-y-3" data-testid="emotional-tone">
+            {analysis.emotional_tone.map(item => {
+              const [year, month] = item.month.split('-');
+              const monthName = new Date(parseInt(year), parseInt(month) - 1).toLocaleDateString('en-US', { month: 'short', year: 'numeric' });
+              const positive = item.valence >= 0;
+
+              return (
+                <div key={item.month} className="flex items-center gap-4">
+                  <span className="text-sm text-slate-400 w-24">{monthName}</span>
+                  <div className="flex-1 h-8 bg-slate-800/30 rounded-lg overflow-hidden flex">
+                    <div className="w-1/2 flex justify-end">
+                      {!positive && (
+                        <div className="h-full bg-rose-500/50" style={{ width: `${Math.abs(item.valence) * 100}%` }} />
+                      )}
+                    </div>
+                    <div className="w-1/2">
+                      {positive && (
+                        <div className="h-full bg-emerald-500/50" style={{ width: `${item.valence * 100}%` }} />
+                      )}
+                    </div>
+                  </div>
+                  <span className="text-sm text-slate-300 w-20 capitalize">{item.dominant_emotion || '—'}</span>
+                </div>
+              );
+            })}
+          </div>
+        </section>
+      )}
+
       {/* Theme Evolution */}
       {analysis.theme_trends.length > 0 && (
         <section className="glass rounded-2xl p-6 md:p-8">
@@ -77,7 +77,8 @@ const Settings = () => {
     try {
       await axios.put(`${API_URL}/settings`, {
         reminder_enabled: settings.reminder_enabled,
-        reminder_time: settings.reminder_time
+        reminder_time: settings.reminder_time,
+        reminder_timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
       }, getAuthHeaders());
       toast.success('Settings saved!');
     } catch (error) {
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# The app runs in this process on in-memory storage with the offline LLM stand-in;
+# these are set before server is imported because it reads them at import time.
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ['LLM_PROVIDER'] = 'fake'
+os.environ['ADMISSION_CONTROL'] = '0'
+os.environ.setdefault('JWT_SECRET', 'api-tests-only-' + 'x' * 32)
+
+import server  # noqa: E402
+from storage.ops import assert_max_db_ops  # noqa: E402
+
+
+class Api:
+    """The app behind an in-process client; requests run one at a time on a private event loop"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+        self.lifespan = server.app.router.lifespan_context(server.app)
+        self.run(self.lifespan.__aenter__())
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def request(self, method, url, max_db_ops=None, token=None, **kwargs):
+        """Send a request that must succeed, within ``max_db_ops`` database round trips if given"""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+        async def send():
+            if max_db_ops is None:
+                return await self.client.request(method, url, headers=headers, **kwargs)
+            with assert_max_db_ops(max_db_ops, f"{method} {url}"):
+                return await self.client.request(method, url, headers=headers, **kwargs)
+
+        response = self.run(send())
+        assert response.status_code < 400, f"{method} {url}: {response.status_code} {response.text}"
+        return response
+
+    def close(self):
+        self.run(self.client.aclose())
+        self.run(self.lifespan.__aexit__(None, None, None))
+        self.loop.close()
+
+
+@pytest.fixture(scope="session")
+def api():
+    api = Api()
+    yield api
+    api.close()
+
+
+@pytest.fixture(scope="module")
+def journal(api, request):
+    """A user with a small fixed journal, a few of its dreams shared"""
+    email = f"{request.module.__name__.rsplit('.', 1)[-1]}@example.com"
+    token = api.request("POST", "/api/auth/register", json={"email": email, "password": "pw", "name": "Tester"}).json()["access_token"]
+    dreams = []
+    for i in range(12):
+        dreams.append(api.request("POST", "/api/dreams", token=token, json={
+            "title": f"Dream {i}",
+            "description": f"I was flying over the ocean, chapter {i}",
+            "date": f"2025-01-{i + 1:02d}",
+            "tags": ["sky", "sea"] if i % 2 else ["house"],
+            "themes": ["Flying"] if i % 3 else ["Water"],
+            "is_lucid": i % 4 == 0,
+        }).json())
+    share_ids = [api.request("POST", f"/api/dreams/{dream['id']}/share", token=token).json()["share_id"] for dream in dreams[:3]]
+    return {"token": token, "dreams": dreams, "share_ids": share_ids}
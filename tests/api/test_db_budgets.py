@@ -0,0 +1,54 @@
+# Database round trips per request for the hot routes, on in-memory storage. Each
+# budget is what the route needs today; a change that adds a query per dream or per
+# result (an N+1) goes over it and fails here instead of in production.
+#
+#   python -m pytest tests/api
+
+
+def test_dream_list(api, journal):
+    response = api.request("GET", "/api/dreams", max_db_ops=2, token=journal["token"])
+    assert len(response.json()) == len(journal["dreams"])
+
+
+def test_dream_get(api, journal):
+    dream_id = journal["dreams"][0]["id"]
+    assert api.request("GET", f"/api/dreams/{dream_id}", max_db_ops=2, token=journal["token"]).json()["id"] == dream_id
+
+
+def test_stats(api, journal):
+    stats = api.request("GET", "/api/stats", max_db_ops=9, token=journal["token"]).json()
+    assert stats["total_dreams"] == len(journal["dreams"])
+
+
+def test_sync(api, journal):
+    full = api.request("GET", "/api/sync", max_db_ops=4, token=journal["token"]).json()
+    assert len(full["dreams"]) == len(journal["dreams"])
+    delta = api.request("GET", "/api/sync", max_db_ops=5, token=journal["token"], params={"since": full["cursor"]}).json()
+    assert delta["deleted_dreams"] == []
+
+
+def test_batch(api, journal):
+    dreams = journal["dreams"]
+    operations = [
+        {"op": "create", "idempotency_key": f"budget-create-{i}", "data": {"title": f"Queued {i}", "description": "Offline", "date": "2025-02-01"}}
+        for i in range(5)
+    ] + [
+        {"op": "update", "idempotency_key": "budget-update", "dream_id": dreams[5]["id"], "data": {"title": "Edited offline"}},
+        {"op": "delete", "idempotency_key": "budget-delete", "dream_id": dreams[6]["id"]},
+    ]
+    # Independent of the number of operations (one bulk write per collection); most of it is
+    # the achievement recalculation, which writes each achievement whose progress moved
+    results = api.request("POST", "/api/dreams/batch", max_db_ops=30, token=journal["token"], json={"operations": operations}).json()["results"]
+    assert [r["status"] for r in results] == ["applied"] * len(operations)
+    replay = api.request("POST", "/api/dreams/batch", max_db_ops=3, token=journal["token"], json={"operations": operations}).json()["results"]
+    assert [r["status"] for r in replay] == ["duplicate"] * len(operations)
+
+
+def test_public_feed(api, journal):
+    recent = api.request("GET", "/api/public/dreams", max_db_ops=0).json()
+    assert {d["share_id"] for d in recent} >= set(journal["share_ids"])
+    api.request("GET", "/api/public/dreams", max_db_ops=2, params={"sort": "views"})
+    share_url = f"/api/public/dream/{journal['share_ids'][0]}"
+    api.request("GET", share_url, max_db_ops=2)
+    api.request("GET", share_url, max_db_ops=0)
+    api.request("GET", "/api/public/trending", max_db_ops=0)
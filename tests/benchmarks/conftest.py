@@ -0,0 +1,173 @@
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from datagen import JournalGenerator  # noqa: E402
+
+# Microbenchmarks for the pure compute paths in analytics.py, run on fixed
+# synthetic journals. Each benchmark measures one call under tracemalloc for its
+# peak allocation and checks it against baseline.json (BENCHMARK_MEMORY_TOLERANCE,
+# default 1.25x plus 64 KiB), which holds on any machine. The 100k-dream journals
+# and the timings are opt-in: with BENCHMARK_FULL=1 each benchmark also times a
+# number of rounds with the garbage collector off, as timeit does (keeping the
+# fastest and the median), and the fastest round must stay within
+# BENCHMARK_TOLERANCE (default 2.0x) of the baseline, which was recorded on one
+# machine, so compare on similar hardware.
+#
+#   python -m pytest tests/benchmarks                      # memory peaks, 10 and 1k dreams
+#   BENCHMARK_FULL=1 python -m pytest tests/benchmarks     # also 100k dreams and timings
+#   BENCHMARK_SAVE=1 python -m pytest tests/benchmarks     # record a new baseline (full run)
+#
+# Benchmarks missing from the baseline are reported but not checked.
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+SIZES = {"10": 10, "1k": 1000, "100k": 100000}
+LARGE_SIZES = {"100k"}
+FULL = bool(os.environ.get('BENCHMARK_FULL') or os.environ.get('BENCHMARK_SAVE'))
+SEED = 48
+END_DATE = date(2025, 6, 30)
+# Rounds stop after this much time, but never before MIN_ROUNDS unless one call takes longer
+ROUND_BUDGET_SECONDS = 0.5
+MIN_ROUNDS = 3
+MAX_ROUNDS = 200
+MEMORY_SLACK_BYTES = 64 * 1024
+
+_results = {}
+
+
+def load_baseline():
+    if BASELINE_PATH.is_file():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def build_journal(base, size):
+    """``size`` dreams: ``base`` followed by copies of it moved further back in time"""
+    span = (END_DATE - date.fromisoformat(base[-1]["date"])).days + 1
+    dreams = []
+    for copy in range(-(-size // len(base))):
+        shift = timedelta(days=copy * span)
+        for dream in base:
+            dreams.append({**dream, "date": (date.fromisoformat(dream["date"]) - shift).isoformat()})
+    return dreams[:size]
+
+
+def size_params():
+    """The journal sizes to parametrize over; the large ones are skipped unless BENCHMARK_FULL is set"""
+    return [
+        pytest.param(label, marks=pytest.mark.skipif(not FULL and label in LARGE_SIZES, reason="set BENCHMARK_FULL=1"))
+        for label in SIZES
+    ]
+
+
+@pytest.fixture(scope="session")
+def journals():
+    base = JournalGenerator(SEED, END_DATE, 1000).user(0, "bench")[1]
+    return {label: build_journal(base, size) for label, size in SIZES.items() if FULL or label not in LARGE_SIZES}
+
+
+class Benchmark:
+    def __init__(self, name, baseline):
+        self.name = name
+        self.baseline = baseline
+
+    def __call__(self, fn, *args):
+        """Benchmark ``fn(*args)`` and return its result"""
+        start = time.perf_counter()
+        result = fn(*args)  # warm-up
+        times = self.time_rounds(fn, args, time.perf_counter() - start) if FULL else []
+
+        tracemalloc.start()
+        try:
+            fn(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        measured = {"peak_kib": round(peak / 1024, 1)}
+        if times:
+            measured = {
+                "min_ms": round(min(times) * 1000, 4),
+                "median_ms": round(statistics.median(times) * 1000, 4),
+                "rounds": len(times),
+                **measured,
+            }
+        _results[self.name] = measured
+        self.check(measured)
+        return result
+
+    @staticmethod
+    def time_rounds(fn, args, warmup_seconds):
+        min_rounds = MIN_ROUNDS if warmup_seconds < ROUND_BUDGET_SECONDS else 1
+        times = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            while len(times) < min_rounds or (len(times) < MAX_ROUNDS and time.perf_counter() - started < ROUND_BUDGET_SECONDS):
+                start = time.perf_counter()
+                fn(*args)
+                times.append(time.perf_counter() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return times
+
+    def check(self, measured):
+        if os.environ.get('BENCHMARK_SAVE') or self.name not in self.baseline:
+            return
+        expected = self.baseline[self.name]
+        tolerance = float(os.environ.get('BENCHMARK_TOLERANCE', '2.0'))
+        memory_tolerance = float(os.environ.get('BENCHMARK_MEMORY_TOLERANCE', '1.25'))
+        time_limit = expected["min_ms"] * tolerance
+        memory_limit = expected["peak_kib"] * memory_tolerance + MEMORY_SLACK_BYTES / 1024
+        problems = []
+        if "min_ms" in measured and measured["min_ms"] > time_limit:
+            problems.append(f"{measured['min_ms']:.3f} ms > {time_limit:.3f} ms ({tolerance}x baseline {expected['min_ms']} ms)")
+        if measured["peak_kib"] > memory_limit:
+            problems.append(f"peak {measured['peak_kib']} KiB > {memory_limit:.1f} KiB (baseline {expected['peak_kib']} KiB)")
+        if problems:
+            pytest.fail(f"{self.name} regressed: {'; '.join(problems)}")
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    return load_baseline()
+
+
+@pytest.fixture
+def benchmark(request, baseline):
+    # Test name without the module, e.g. "test_streaks[1k]"
+    return Benchmark(request.node.name, baseline)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if os.environ.get('BENCHMARK_SAVE') and _results:
+        saved = {**load_baseline(), **_results}
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(saved.items())), indent=2) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(f"{'name':<40} {'min ms':>12} {'median ms':>12} {'rounds':>7} {'peak KiB':>10}")
+    for name, result in sorted(_results.items()):
+        if "min_ms" in result:
+            timing = f"{result['min_ms']:>12.3f} {result['median_ms']:>12.3f} {result['rounds']:>7}"
+        else:
+            timing = f"{'-':>12} {'-':>12} {'-':>7}"
+        terminalreporter.write_line(f"{name:<40} {timing} {result['peak_kib']:>10.1f}")
+    if os.environ.get('BENCHMARK_SAVE'):
+        terminalreporter.write_line(f"baseline saved to {BASELINE_PATH}")
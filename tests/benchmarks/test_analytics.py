@@ -0,0 +1,83 @@
+import pytest
+
+from analytics import (
+    pack_texts, symbol_counts, word_counts, text_patterns, journal_streaks, top_counts, distinct_count,
+    achievement_progress, month_buckets, ACHIEVEMENTS, DREAM_SYMBOLS, STOP_WORDS
+)
+
+from .conftest import END_DATE, SIZES, size_params
+
+sizes = pytest.mark.parametrize("size", size_params())
+
+
+def all_progress(dreams, longest_streak):
+    """What calculate_achievements derives from the fetched dreams, for every achievement"""
+    totals = {
+        "dreams": len(dreams),
+        "longest_streak": longest_streak,
+        "lucid": sum(dream["is_lucid"] for dream in dreams),
+        "insights": sum(dream["ai_insight"] is not None for dream in dreams),
+        "shared": sum(dream["is_public"] for dream in dreams),
+        "themes": distinct_count(dreams, "themes"),
+        "tags": distinct_count(dreams, "tags"),
+    }
+    return {ach["id"]: achievement_progress(ach["id"], totals) for ach in ACHIEVEMENTS}
+
+
+@sizes
+def test_streaks(benchmark, journals, size):
+    dates = [dream["date"] for dream in journals[size]]
+    streaks = benchmark(journal_streaks, dates, END_DATE, None)
+    assert 1 <= streaks["current"] <= streaks["longest"]
+
+
+@sizes
+def test_streaks_with_freeze(benchmark, journals, size):
+    dates = [dream["date"] for dream in journals[size]]
+    streaks = benchmark(journal_streaks, dates, END_DATE, "2025-06-29")
+    assert streaks["current"] >= 1
+
+
+@sizes
+def test_top_tags(benchmark, journals, size):
+    top = benchmark(top_counts, journals[size], "tags", 5)
+    assert [count for _, count in top] == sorted((count for _, count in top), reverse=True)
+
+
+@sizes
+def test_symbol_matching(benchmark, journals, size):
+    buffer, offsets = pack_texts([f"{dream['description']} {dream['title']}" for dream in journals[size]])
+    counts = benchmark(symbol_counts, buffer, offsets, DREAM_SYMBOLS)
+    assert set(counts) == set(DREAM_SYMBOLS)
+    assert max(counts.values()) <= len(journals[size])
+
+
+@sizes
+def test_word_counts(benchmark, journals, size):
+    buffer, _ = pack_texts([dream["description"] for dream in journals[size]])
+    words = benchmark(word_counts, buffer, STOP_WORDS, 15)
+    assert len(words) == 15
+
+
+@sizes
+def test_text_patterns(benchmark, journals, size):
+    descriptions, description_offsets = pack_texts([dream["description"] for dream in journals[size]])
+    titles, title_offsets = pack_texts([dream["title"] for dream in journals[size]])
+    result = benchmark(
+        text_patterns, descriptions, description_offsets, titles, title_offsets, DREAM_SYMBOLS, STOP_WORDS, 15
+    )
+    assert set(result) == {"symbol_counts", "common_words"}
+
+
+@sizes
+def test_achievement_progress(benchmark, journals, size):
+    progress = benchmark(all_progress, journals[size], 12)
+    assert progress["first_dream"] == progress["dreams_10"] == SIZES[size]
+    assert progress["streak_7"] == 12
+
+
+@sizes
+def test_month_buckets(benchmark, journals, size):
+    months = benchmark(month_buckets, journals[size])
+    assert list(months) == sorted(months)
+    assert sum(bucket["count"] for bucket in months.values()) == SIZES[size]
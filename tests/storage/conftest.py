@@ -0,0 +1,39 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from storage.memory import MemoryStorage  # noqa: E402
+from storage.sqlite import SqliteStorage  # noqa: E402
+
+# The embedded backends stand in for MongoDB, so each scenario runs on both of them
+# and must give the same answer, which the tests also hold against Mongo's.
+
+BACKENDS = {
+    "memory": lambda tmp_path: MemoryStorage(),
+    "sqlite": lambda tmp_path: SqliteStorage(tmp_path / "parity.db"),
+}
+
+
+@pytest.fixture
+def everywhere(tmp_path):
+    """Run ``scenario(storage)`` on every embedded backend and return the one result they agree on"""
+
+    def run(scenario):
+        results = {}
+        for name, build in BACKENDS.items():
+            storage = build(tmp_path)
+            try:
+                results[name] = asyncio.run(scenario(storage))
+            finally:
+                storage.close()
+        first, *others = results.values()
+        for name, result in results.items():
+            assert result == first, f"{name} differs from memory: {result!r} != {first!r}"
+        return first
+
+    return run
@@ -0,0 +1,274 @@
+import asyncio
+
+import pytest
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from storage.base import decode_write
+
+# Indexed fields are filtered and sorted in SQL on SQLite and through the field
+# indexes in memory; unindexed ones are matched in Python. Both paths must agree.
+indexed = pytest.mark.parametrize("indexed", [False, True], ids=["scan", "indexed"])
+
+DOCS = [
+    {"n": 1, "name": "alpha", "tags": ["sky", "sea"], "score": 3.5, "flag": True, "meta": {"depth": 2}},
+    {"n": 2, "name": "Beta", "tags": ["sea"], "score": 7, "flag": False, "meta": {"depth": 5}},
+    {"n": 3, "name": "gamma", "tags": [], "score": None, "meta": {"depth": 2}},
+    {"n": 4, "name": "delta", "tags": ["house"], "flag": True},
+    {"n": 5, "name": "epsilon", "tags": ["sky"], "score": 7, "flag": False, "meta": {"depth": 9}},
+]
+
+
+async def seed(storage, indexed, fields=("n", "name", "tags", "score", "flag", "meta.depth")):
+    collection = storage.items
+    if indexed:
+        for field in fields:
+            await collection.create_index(field)
+    await collection.insert_many([dict(doc) for doc in DOCS])
+    return collection
+
+
+async def names(collection, query, sort=("n", 1)):
+    docs = await collection.find(query, {"_id": 0, "name": 1}).sort(*sort).to_list(None)
+    return [doc["name"] for doc in docs]
+
+
+QUERIES = [
+    ({"n": 2}, ["Beta"]),
+    ({"n": {"$eq": 2}}, ["Beta"]),
+    ({"n": {"$ne": 2}}, ["alpha", "gamma", "delta", "epsilon"]),
+    ({"n": {"$gt": 2, "$lte": 4}}, ["gamma", "delta"]),
+    ({"n": {"$gte": 4}}, ["delta", "epsilon"]),
+    ({"n": {"$lt": 2}}, ["alpha"]),
+    ({"n": {"$in": [1, 5, 9]}}, ["alpha", "epsilon"]),
+    ({"n": {"$in": []}}, []),
+    ({"n": {"$nin": [1, 5]}}, ["Beta", "gamma", "delta"]),
+    ({"score": 7}, ["Beta", "epsilon"]),
+    # Missing fields match null, and comparisons never match across types
+    ({"score": None}, ["gamma", "delta"]),
+    ({"score": {"$exists": False}}, ["delta"]),
+    ({"score": {"$exists": True}}, ["alpha", "Beta", "gamma", "epsilon"]),
+    ({"score": {"$gt": 3}}, ["alpha", "Beta", "epsilon"]),
+    ({"name": {"$gt": "c"}}, ["gamma", "delta", "epsilon"]),
+    ({"flag": True}, ["alpha", "delta"]),
+    ({"flag": {"$ne": True}}, ["Beta", "gamma", "epsilon"]),
+    # Conditions on arrays match any element
+    ({"tags": "sea"}, ["alpha", "Beta"]),
+    ({"tags": {"$in": ["house", "sky"]}}, ["alpha", "delta", "epsilon"]),
+    ({"tags": {"$nin": ["sea"]}}, ["gamma", "delta", "epsilon"]),
+    ({"tags": {"$size": 0}}, ["gamma"]),
+    ({"tags": ["sea"]}, ["Beta"]),
+    ({"meta.depth": 2}, ["alpha", "gamma"]),
+    ({"meta.depth": {"$gt": 4}}, ["Beta", "epsilon"]),
+    ({"name": {"$regex": "^b", "$options": "i"}}, ["Beta"]),
+    ({"name": {"$regex": "ta$"}}, ["Beta", "delta"]),
+    ({"n": {"$not": {"$gt": 2}}}, ["alpha", "Beta"]),
+    ({"$or": [{"n": 1}, {"tags": "house"}]}, ["alpha", "delta"]),
+    ({"$or": [{"n": {"$in": [2, 3]}}, {"score": {"$gte": 7}}]}, ["Beta", "gamma", "epsilon"]),
+    ({"$and": [{"tags": "sky"}, {"flag": False}]}, ["epsilon"]),
+    ({"$nor": [{"flag": True}, {"score": None}]}, ["Beta", "epsilon"]),
+    ({"flag": False, "n": {"$in": [1, 2, 5]}}, ["Beta", "epsilon"]),
+]
+
+
+@indexed
+@pytest.mark.parametrize("query,expected", QUERIES, ids=[str(q) for q, _ in QUERIES])
+def test_query_operators(everywhere, indexed, query, expected):
+    async def scenario(storage):
+        collection = await seed(storage, indexed)
+        return await names(collection, query), await collection.count_documents(query)
+
+    assert everywhere(scenario) == (expected, len(expected))
+
+
+@indexed
+def test_projections(everywhere, indexed):
+    async def scenario(storage):
+        collection = await seed(storage, indexed)
+        return [
+            await collection.find_one({"n": 1}, {"_id": 0, "name": 1, "meta.depth": 1}),
+            await collection.find_one({"n": 1}, {"_id": 0, "tags": 0, "meta": 0, "score": 0}),
+            sorted(await collection.find_one({"n": 1}, {"name": 1})),
+            await collection.find_one({"n": 9}, {"_id": 0}),
+        ]
+
+    assert everywhere(scenario) == [
+        {"name": "alpha", "meta": {"depth": 2}},
+        {"n": 1, "name": "alpha", "flag": True},
+        ["_id", "name"],
+        None,
+    ]
+
+
+@indexed
+def test_sort_across_types(everywhere, indexed):
+    async def scenario(storage):
+        collection = storage.mixed
+        if indexed:
+            await collection.create_index("v")
+        values = [3, "b", None, 1.5, "a", 2, "B", -1]
+        await collection.insert_many([{"i": i, "v": v} for i, v in enumerate(values)])
+        await collection.insert_one({"i": len(values)})
+        ascending = await collection.find({}, {"_id": 0, "i": 1}).sort("v", 1).to_list(None)
+        descending = await collection.find({}, {"_id": 0, "i": 1}).sort("v", -1).to_list(None)
+        return [d["i"] for d in ascending], [d["i"] for d in descending]
+
+    ascending, descending = everywhere(scenario)
+    # BSON order: null and missing < numbers < strings (binary); ties keep insertion order.
+    # Booleans and objects are left out: SQLite sorts those among numbers and strings.
+    assert ascending == [2, 8, 7, 3, 5, 0, 6, 4, 1]
+    assert descending == [1, 4, 6, 0, 5, 3, 7, 2, 8]
+
+
+@indexed
+def test_sort_skip_limit(everywhere, indexed):
+    async def scenario(storage):
+        collection = await seed(storage, indexed)
+        page = await collection.find({}, {"_id": 0, "name": 1}).sort([("score", -1), ("n", 1)]).skip(1).limit(3).to_list(None)
+        capped = await collection.find({"flag": {"$exists": True}}, {"_id": 0, "n": 1}).sort("n", -1).to_list(2)
+        return [d["name"] for d in page], [d["n"] for d in capped]
+
+    assert everywhere(scenario) == (["epsilon", "alpha", "gamma"], [5, 4])
+
+
+@indexed
+def test_updates_and_upserts(everywhere, indexed):
+    async def scenario(storage):
+        collection = await seed(storage, indexed)
+        outcomes = []
+        result = await collection.update_one({"n": 1}, {"$set": {"meta.depth": 3}, "$inc": {"score": 1}, "$unset": {"flag": ""}})
+        outcomes.append((result.matched_count, result.modified_count, result.upserted_id is None))
+        result = await collection.update_one({"n": 1}, {"$set": {"meta.depth": 3}})
+        outcomes.append((result.matched_count, result.modified_count))
+        result = await collection.update_many({"tags": "sky"}, {"$addToSet": {"tags": "moon"}, "$max": {"score": 5}})
+        outcomes.append((result.matched_count, result.modified_count))
+        await collection.update_one({"n": 2}, {"$push": {"tags": {"$each": ["a", "sea"]}}})
+        await collection.update_one({"n": 2}, {"$pull": {"tags": "a"}})
+        # Upserts seed the new document from the filter's equality conditions
+        result = await collection.update_one(
+            {"n": 6, "name": {"$eq": "zeta"}, "score": {"$gt": 1}},
+            {"$set": {"flag": True}, "$setOnInsert": {"tags": []}, "$inc": {"hits": 1}},
+            upsert=True
+        )
+        outcomes.append((result.matched_count, result.upserted_id is not None))
+        await collection.update_one({"n": 6}, {"$setOnInsert": {"tags": ["ignored"]}, "$inc": {"hits": 1}}, upsert=True)
+        result = await collection.replace_one({"n": 7}, {"n": 7, "name": "eta"}, upsert=True)
+        outcomes.append((result.matched_count, result.upserted_id is not None))
+        await collection.replace_one({"n": 4}, {"n": 4, "name": "DELTA"})
+        result = await collection.update_one({"n": 99}, {"$set": {"x": 1}})
+        outcomes.append((result.matched_count, result.upserted_id))
+        docs = await collection.find({}, {"_id": 0}).sort("n", 1).to_list(None)
+        return outcomes, docs
+
+    outcomes, docs = everywhere(scenario)
+    assert outcomes == [(1, 1, True), (1, 0), (2, 2), (0, True), (0, True), (0, None)]
+    assert docs[0] == {"n": 1, "name": "alpha", "tags": ["sky", "sea", "moon"], "score": 5, "meta": {"depth": 3}}
+    assert docs[1]["tags"] == ["sea", "sea"]
+    assert docs[3] == {"n": 4, "name": "DELTA"}
+    assert docs[5] == {"n": 6, "name": "zeta", "flag": True, "tags": [], "hits": 2}
+    assert docs[6] == {"n": 7, "name": "eta"}
+
+
+def test_unique_indexes(everywhere):
+    async def scenario(storage):
+        collection = storage.users
+        await collection.create_index("email", unique=True)
+        await collection.create_index([("user_id", 1), ("key", 1)], unique=True)
+        outcomes = []
+        await collection.insert_one({"email": "a@x", "user_id": "u1", "key": "k"})
+        for doc in ({"email": "a@x"}, {"email": "b@x", "user_id": "u1", "key": "k"}):
+            try:
+                await collection.insert_one(doc)
+                outcomes.append("inserted")
+            except DuplicateKeyError as e:
+                outcomes.append(e.code)
+        # Same user, other key; other user, same key
+        await collection.insert_many([{"email": "c@x", "user_id": "u1", "key": "k2"}, {"email": "d@x", "user_id": "u2", "key": "k"}])
+        try:
+            await collection.update_one({"email": "c@x"}, {"$set": {"email": "a@x"}})
+            outcomes.append("updated")
+        except DuplicateKeyError as e:
+            outcomes.append(e.code)
+        try:
+            await collection.create_index("user_id", unique=True)
+            outcomes.append("indexed")
+        except DuplicateKeyError as e:
+            outcomes.append(e.code)
+        outcomes.append(await collection.count_documents({}))
+        return outcomes
+
+    assert everywhere(scenario) == [11000, 11000, 11000, 11000, 3]
+
+
+@pytest.mark.parametrize("ordered", [True, False], ids=["ordered", "unordered"])
+def test_bulk_write_errors(everywhere, ordered):
+    async def scenario(storage):
+        collection = storage.dreams
+        await collection.create_index("id", unique=True)
+        await collection.insert_one({"id": "a", "v": 0})
+        try:
+            await collection.bulk_write([
+                InsertOne({"id": "b", "v": 1}),
+                InsertOne({"id": "a", "v": 1}),
+                UpdateOne({"id": "b"}, {"$set": {"v": 2}}),
+                UpdateOne({"id": "c"}, {"$set": {"v": 3}}, upsert=True),
+                InsertOne({"id": "c", "v": 4}),
+                DeleteOne({"id": "missing"}),
+            ], ordered=ordered)
+            details = None
+        except BulkWriteError as e:
+            details = {
+                "indexes": [error["index"] for error in e.details["writeErrors"]],
+                "codes": [error["code"] for error in e.details["writeErrors"]],
+                "counts": [e.details[k] for k in ("nInserted", "nUpserted", "nMatched", "nModified", "nRemoved")],
+                "upserted": [u["index"] for u in e.details["upserted"]],
+            }
+        docs = await collection.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        return details, docs
+
+    details, docs = everywhere(scenario)
+    if ordered:
+        # Writes before the failed one stay applied; nothing after it runs
+        assert details == {"indexes": [1], "codes": [11000], "counts": [1, 0, 0, 0, 0], "upserted": []}
+        assert docs == [{"id": "a", "v": 0}, {"id": "b", "v": 1}]
+    else:
+        assert details == {"indexes": [1, 4], "codes": [11000, 11000], "counts": [1, 1, 1, 1, 0], "upserted": [3]}
+        assert docs == [{"id": "a", "v": 0}, {"id": "b", "v": 2}, {"id": "c", "v": 3}]
+
+
+def test_bulk_write_result(everywhere):
+    async def scenario(storage):
+        collection = storage.items
+        await collection.insert_many([{"k": i, "v": 0} for i in range(4)])
+        result = await collection.bulk_write([
+            UpdateMany({"k": {"$lt": 2}}, {"$inc": {"v": 1}}),
+            ReplaceOne({"k": 3}, {"k": 3, "v": 9}),
+            UpdateOne({"k": 8}, {"$set": {"v": 8}}, upsert=True),
+            DeleteOne({"k": 2}),
+        ], ordered=False)
+        return [result.matched_count, result.modified_count, result.upserted_count, sorted(result.upserted_ids), result.deleted_count]
+
+    assert everywhere(scenario) == [3, 3, 1, [2], 1]
+
+
+def test_find_one_and_delete(everywhere):
+    async def scenario(storage):
+        collection = await seed(storage, True)
+        first = await collection.find_one_and_delete({"tags": "sky"}, {"_id": 0, "name": 1})
+        missing = await collection.find_one_and_delete({"n": 42})
+        # Two callers racing for the same document: only one of them gets it
+        raced = await asyncio.gather(*(collection.find_one_and_delete({"n": 2}, {"_id": 0, "n": 1}) for _ in range(2)))
+        return first, missing, sorted(raced, key=lambda d: d is None), await collection.count_documents({})
+
+    assert everywhere(scenario) == ({"name": "alpha"}, None, [{"n": 2}, None], 3)
+
+
+def test_decode_write():
+    # The embedded backends read pymongo's bulk operations through their private slots
+    assert decode_write(InsertOne({"a": 1})) == ("insert", None, {"a": 1}, False)
+    assert decode_write(UpdateOne({"a": 1}, {"$set": {"b": 2}}, upsert=True)) == ("update_one", {"a": 1}, {"$set": {"b": 2}}, True)
+    assert decode_write(UpdateMany({"a": 1}, {"$set": {"b": 2}})) == ("update_many", {"a": 1}, {"$set": {"b": 2}}, False)
+    assert decode_write(ReplaceOne({"a": 1}, {"b": 2})) == ("update_one", {"a": 1}, {"b": 2}, False)
+    assert decode_write(DeleteOne({"a": 1})) == ("delete_one", {"a": 1}, None, False)
+    with pytest.raises(TypeError):
+        decode_write({"insertOne": {}})